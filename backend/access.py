@@ -0,0 +1,122 @@
+"""Per-request authorization facts.
+
+Class routes used to chain get_class / teacher_in_class / student_in_class /
+get_user_by_id, each with its own pool checkout and commit. AccessContext
+resolves everything a route needs about a (class, problem, student) triple in
+one query on the request's cursor and caches it for the request's lifetime.
+The query runs as a prepared statement (backend/queries.py).
+"""
+from backend import queries
+from backend.db import DB
+
+_FACTS = queries.register("access_facts", """
+    SELECT
+        c.id, c.code, c.name, c.description, c.created_by, c.created_at,
+        EXISTS (
+            SELECT 1 FROM class_teachers WHERE class_id=%(cid)s AND teacher_id=%(uid)s
+        ) AS viewer_teaches_class,
+        EXISTS (
+            SELECT 1 FROM class_students WHERE class_id=%(cid)s AND student_id=%(uid)s
+        ) AS viewer_in_class,
+        EXISTS (
+            SELECT 1 FROM class_students WHERE class_id=%(cid)s AND student_id=%(sid)s
+        ) AS student_in_class,
+        su.id, su.email, su.role, su.username,
+        EXISTS (
+            SELECT 1 FROM class_problems WHERE problem_id=%(pid)s
+        ) AS problem_in_any_class,
+        EXISTS (
+            SELECT 1 FROM class_problems WHERE class_id=%(cid)s AND problem_id=%(pid)s
+        ) AS class_has_problem,
+        EXISTS (
+            SELECT 1
+            FROM class_problems cp
+            JOIN class_teachers ct ON ct.class_id = cp.class_id
+            WHERE cp.problem_id=%(pid)s AND ct.teacher_id=%(uid)s
+        ) AS viewer_teaches_problem,
+        EXISTS (
+            SELECT 1
+            FROM class_problems cp
+            JOIN class_students cs ON cs.class_id = cp.class_id
+            WHERE cp.problem_id=%(pid)s AND cs.student_id=%(uid)s
+        ) AS viewer_studies_problem,
+        EXISTS (
+            SELECT 1 FROM teacher_students WHERE teacher_id=%(uid)s AND student_id=%(sid)s
+        ) OR EXISTS (
+            SELECT 1
+            FROM class_teachers ct
+            JOIN class_students cs ON cs.class_id = ct.class_id
+            WHERE ct.teacher_id=%(uid)s AND cs.student_id=%(sid)s
+        ) AS viewer_teaches_student
+    FROM (SELECT 1) AS one
+    LEFT JOIN classes c ON c.id = %(cid)s AND c.deleted_at IS NULL
+    LEFT JOIN users su ON su.id = %(sid)s
+""")
+
+
+def load_access_facts(user_id: int, *, class_id: int | None = None, problem_id: int | None = None,
+                      student_id: int | None = None, cur=None) -> dict:
+    with DB(cur) as cur:
+        queries.execute(cur, _FACTS, {"uid": user_id, "cid": class_id, "pid": problem_id, "sid": student_id})
+        r = cur.fetchone()
+    return {
+        "class": None if r[0] is None else {
+            "id": r[0],
+            "code": r[1],
+            "name": r[2],
+            "description": r[3],
+            "created_by": r[4],
+            "created_at": r[5],
+        },
+        "viewer_teaches_class": r[6],
+        "viewer_in_class": r[7],
+        "student_in_class": r[8],
+        "student": None if r[9] is None else {
+            "id": r[9],
+            "email": r[10],
+            "role": r[11],
+            "username": r[12],
+        },
+        "problem_in_any_class": r[13],
+        "class_has_problem": r[14],
+        "viewer_teaches_problem": r[15],
+        "viewer_studies_problem": r[16],
+        "viewer_teaches_student": r[17],
+    }
+
+
+class AccessContext:
+    """Authorization facts for the current user, cached per (class, problem, student)."""
+
+    def __init__(self, me, cur):
+        self.me = me
+        self.cur = cur
+        self._cache: dict[tuple, dict] = {}
+
+    def facts(self, *, class_id: int | None = None, problem_id: int | None = None,
+              student_id: int | None = None) -> dict:
+        key = (class_id, problem_id, student_id)
+        if key not in self._cache:
+            self._cache[key] = load_access_facts(
+                self.me.id, class_id=class_id, problem_id=problem_id, student_id=student_id, cur=self.cur,
+            )
+        return self._cache[key]
+
+    def can_view_problem(self, facts: dict) -> bool:
+        """Mirror of the old problem_class_ids + *_has_problem_access chain."""
+        if not facts["problem_in_any_class"]:
+            return True
+        if self.me.role == "admin":
+            return True
+        if self.me.role == "teacher":
+            return facts["viewer_teaches_problem"]
+        if self.me.role == "student":
+            return facts["viewer_studies_problem"]
+        return False
+
+    def can_access_student(self, student_id: int) -> bool:
+        if self.me.id == student_id or self.me.role == "admin":
+            return True
+        if self.me.role != "teacher":
+            return False
+        return self.facts(student_id=student_id)["viewer_teaches_student"]
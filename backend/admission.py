@@ -0,0 +1,126 @@
+"""Admission control for POST /submissions.
+
+Checked inside the request's transaction, before the submission row is
+inserted:
+
+1. queue backpressure: while the oldest queued submission has waited longer
+   than OJ_ADMIT_MAX_QUEUE_AGE_S, new submissions are refused until the
+   workers catch up;
+2. token buckets per user and per class (each class the user studies in that
+   has the problem), kept in rate_buckets so the limits hold across API
+   workers. A bucket refills at `per_min / 60` tokens a second up to `burst`;
+3. at most OJ_ADMIT_MAX_PENDING queued/running submissions per user.
+
+Taking a token is one UPSERT that locks the bucket row until commit, so the
+user's bucket also serializes that user's concurrent submits for the pending
+check. A refusal raises Rejected and the request's transaction rolls back,
+so no bucket is charged for a submission that was not accepted. Call admit()
+as the last step before the INSERT (after any syntax pre-check): the class
+buckets are shared by the whole class, so whatever runs between the take and
+the commit is serialized across every submit in that class.
+Admins are not limited. Setting a burst / cap / age to 0 disables that check.
+"""
+import math
+import os
+import time
+
+from backend.db import DB
+
+USER_BURST = float(os.getenv("OJ_ADMIT_USER_BURST", "10"))
+USER_PER_MIN = float(os.getenv("OJ_ADMIT_USER_PER_MIN", "6"))
+CLASS_BURST = float(os.getenv("OJ_ADMIT_CLASS_BURST", "300"))
+CLASS_PER_MIN = float(os.getenv("OJ_ADMIT_CLASS_PER_MIN", "120"))
+MAX_PENDING = int(os.getenv("OJ_ADMIT_MAX_PENDING", "3"))
+MAX_QUEUE_AGE_S = float(os.getenv("OJ_ADMIT_MAX_QUEUE_AGE_S", "120"))
+QUEUE_CHECK_S = 2.0     # 큐 나이는 프로세스마다 이 간격으로만 다시 조회
+BACKPRESSURE_RETRY_S = 10
+PENDING_RETRY_S = 5
+
+
+class Rejected(Exception):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, int(retry_after))
+
+
+_TAKE_SQL = """
+  INSERT INTO rate_buckets AS b (key, tokens, updated_at)
+  VALUES (%(key)s, %(burst)s - 1, NOW())
+  ON CONFLICT (key) DO UPDATE
+    SET tokens = LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s) - 1,
+        updated_at = NOW()
+    WHERE LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * %(rate)s) >= 1
+  RETURNING tokens
+"""
+
+
+def take_token(cur, key: str, burst: float, per_min: float):
+    """Take one token from bucket `key`. Returns None on success, else seconds until one is available."""
+    rate = per_min / 60.0
+    cur.execute(_TAKE_SQL, {"key": key, "burst": burst, "rate": rate})
+    if cur.fetchone():
+        return None
+    # 거절된 경우만 한 번 더 읽어서 다음 토큰까지 남은 시간 계산
+    cur.execute("""
+      SELECT LEAST(%s, tokens + EXTRACT(EPOCH FROM NOW() - updated_at) * %s)
+      FROM rate_buckets WHERE key=%s
+    """, (burst, rate, key))
+    tokens = float(cur.fetchone()[0])
+    return math.ceil((1 - tokens) / rate) if rate > 0 else 3600
+
+
+_queue_age = (0.0, 0.0)  # (조회 시각 monotonic, 가장 오래된 queued 나이 초)
+
+
+def oldest_queued_age(cur) -> float:
+    global _queue_age
+    checked, age = _queue_age
+    now = time.monotonic()
+    if now - checked < QUEUE_CHECK_S:
+        return age
+    cur.execute("""
+      SELECT EXTRACT(EPOCH FROM NOW() - created_at)
+      FROM submissions WHERE status='queued'
+      ORDER BY id LIMIT 1
+    """)
+    row = cur.fetchone()
+    age = float(row[0]) if row else 0.0
+    _queue_age = (now, age)
+    return age
+
+
+def admit(user_id: int, role: str, problem_id: int, cur=None):
+    """Raise Rejected if this user may not submit to problem_id right now."""
+    if role == "admin":
+        return
+    with DB(cur) as cur:
+        if MAX_QUEUE_AGE_S > 0 and oldest_queued_age(cur) > MAX_QUEUE_AGE_S:
+            raise Rejected("Judge queue is backed up, try again shortly", BACKPRESSURE_RETRY_S)
+
+        buckets = []
+        if USER_BURST > 0:
+            buckets.append((f"user:{user_id}", USER_BURST, USER_PER_MIN, "Too many submissions"))
+        if CLASS_BURST > 0:
+            cur.execute("""
+              SELECT cp.class_id
+              FROM class_problems cp
+              JOIN class_students cs ON cs.class_id = cp.class_id AND cs.student_id = %s
+              WHERE cp.problem_id = %s
+              ORDER BY cp.class_id
+            """, (user_id, problem_id))
+            # 항상 user -> class id 순서로 잠가서 교착을 피한다
+            buckets += [(f"class:{r[0]}", CLASS_BURST, CLASS_PER_MIN, "Too many submissions in this class")
+                        for r in cur.fetchall()]
+        for key, burst, per_min, detail in buckets:
+            wait = take_token(cur, key, burst, per_min)
+            if wait is not None:
+                raise Rejected(detail, wait)
+
+        if MAX_PENDING > 0:
+            cur.execute("""
+              SELECT COUNT(*) FROM submissions
+              WHERE user_id=%s AND status IN ('queued','running')
+            """, (user_id,))
+            if cur.fetchone()[0] >= MAX_PENDING:
+                raise Rejected(f"At most {MAX_PENDING} submissions may be waiting for a result", PENDING_RETRY_S)
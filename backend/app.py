@@ -1,5 +1,6 @@
 # backend/app.py (중요 부분만 발췌/추가)
 import os
+import base64
 import json
 import sys
 import csv
@@ -8,37 +9,59 @@ import logging
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 import secrets
+import zlib
+
+import httpx
 
 # Ensure project root on sys.path so "backend" package can be imported when running from backend/
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from fastapi import FastAPI, Depends, HTTPException, status, Header, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Header, UploadFile, File, Form, BackgroundTasks, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
 
-from backend import logic
+from backend import admission, hashing, logic, instrumentation, queries, scoreboard
 
 from backend.auth import (
     create_access_token,
     decode_access_token,
     get_user_by_email,
     get_user_by_id,
-    verify_password,
+    update_password_hash,
     create_user_with_verify,
     consume_verify_token,
 )
+from backend.access import AccessContext, load_access_facts
+from backend.db import DB, PoolError, ReadDB, replica_pool, set_writer
+from backend.responses import CompressionMiddleware, FastJSONResponse, json_response
 from backend.emailer import send_verify_email, SMTPConfigError, is_smtp_configured
-from backend.schemas import SubmissionCreate, ProblemCreate  # import early for type usage
+from backend.schemas import (  # import early for type usage
+    SubmissionCreate, RunCreate, ProblemCreate, Language, PYTHON_TIER_PATTERN, CHECKER_PATTERN, check_checker_source,
+    check_interactor_source, TestcaseGroupsIn, SCHEDULE_PATTERN, python_syntax_error, ContestCreate, normalize_tags,
+)
 
 logger = logging.getLogger(__name__)
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
+# 1이면 클래스/문제 삭제는 표시(deleted_at)만 하고 실제 삭제는 응답 후 백그라운드에서 수행
+DEFERRED_DELETES = os.getenv("OJ_DEFERRED_DELETES", "0") == "1"
+# 1이면 Python 제출의 문법 에러를 제출 시점에 compile_error로 바로 확정 (워커를 거치지 않음)
+SYNTAX_PRECHECK = os.getenv("OJ_SYNTAX_PRECHECK", "1") == "1"
+# 샘플/직접 입력 실행 레인 (judge/run_server.py). 채점 큐를 거치지 않고 아무것도 저장하지 않는다
+RUN_SERVER_URL = os.getenv("OJ_RUN_SERVER_URL", "http://127.0.0.1:8100/run")
+RUN_TOKEN = os.getenv("JUDGE_RUN_TOKEN", "")
+# 실행 서버 응답 대기 상한 (케이스 최대 5개 x 2초 + 컴파일). 연결은 1초 안에 안 되면 바로 503
+RUN_CLIENT_TIMEOUT = httpx.Timeout(float(os.getenv("OJ_RUN_TIMEOUT_S", "15")), connect=1.0)
+# 워커와 같은 값: 하트비트가 이보다 오래되면 죽은 워커로 본다
+WORKER_DEAD_AFTER_S = float(os.getenv("WORKER_DEAD_AFTER_S", "30"))
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="OJ Backend (MVP)")
+app = FastAPI(title="OJ Backend (MVP)", default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +74,7 @@ app.add_middleware(
     allow_methods=["*"],   # OPTIONS 포함
     allow_headers=["*"],   # Authorization, Content-Type 등
 )
+app.add_middleware(CompressionMiddleware)  # OJ_COMPRESS_MIN_BYTES 이상인 JSON 응답만 (backend/responses.py)
 # ---------- 인증 스키마 ----------
 class RegisterIn(BaseModel):
     email: EmailStr
@@ -117,16 +141,21 @@ def ensure_role(me: MeOut, allowed: set[str]):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
 
-def can_access_student(me: MeOut, student_id: int) -> bool:
-    if me.id == student_id:
-        return True
-    if me.role == "admin":
-        return True
-    if me.role == "teacher" and logic.teacher_can_access_student(me.id, student_id):
-        return True
-    return False
+def get_db(request: Request):
+    """Request-scoped cursor: one pool checkout and one transaction for the whole request.
+
+    At most POSTGRES_POOL_MAX requests hold one at a time; the rest wait up to
+    POSTGRES_POOL_WAIT_S for a connection, then get 503. The connection is held from
+    dependency resolution until the response is built, so a handler using it (directly or via get_current_user/get_access) must only do DB work and
+    short CPU work: no HTTP calls, password hashing, SMTP, sleeps or large upload parsing.
+    Routes that wait on something else take no get_db and open a short DB() themselves
+    (api_run, api_register, api_login, the testcase uploads).
 
-def get_current_user(authorization: str | None = Header(default=None)) -> MeOut:
+    Non-GET requests record the caller's write position for read-your-writes on the replica."""
+    with DB(track_writes=request.method not in ("GET", "HEAD")) as cur:
+        yield cur
+
+def get_current_user(authorization: str | None = Header(default=None), cur=Depends(get_db)) -> MeOut:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     token = authorization.split(" ", 1)[1]
@@ -134,16 +163,46 @@ def get_current_user(authorization: str | None = Header(default=None)) -> MeOut:
     if not data:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    row = get_user_by_email(data.email)
+    row = get_user_by_email(data.email, cur=cur)
     if not row or row[0] != data.user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     uid, email, _, role, username, is_verified = row
+    set_writer(cur, uid)
     return MeOut(id=uid, email=email, username=username, role=role, is_verified=is_verified)
 
-def get_optional_user(authorization: str | None = Header(default=None)) -> MeOut | None:
+def get_optional_user(authorization: str | None = Header(default=None), cur=Depends(get_db)) -> MeOut | None:
     if not authorization:
         return None
-    return get_current_user(authorization=authorization)
+    return get_current_user(authorization=authorization, cur=cur)
+
+def get_access(me: MeOut = Depends(get_current_user), cur=Depends(get_db)) -> AccessContext:
+    return AccessContext(me, cur)
+
+def _read_cursor(me: MeOut | None, cur):
+    if replica_pool is None:
+        yield cur
+        return
+    with ReadDB(user_id=me.id if me else None, fallback=cur) as rcur:
+        yield rcur
+
+def get_read_db(me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
+    """Cursor for heavy read-only queries: the replica (POSTGRES_REPLICA_DSN) once it has
+    replayed the caller's own writes, else the request's primary cursor. Authorization
+    facts stay on the primary cursor."""
+    yield from _read_cursor(me, cur)
+
+def get_public_read_db(me: MeOut | None = Depends(get_optional_user), cur=Depends(get_db)):
+    yield from _read_cursor(me, cur)
+
+def require_class_teacher(access: AccessContext, class_id: int, **ids) -> dict:
+    """Role check + class existence + teacher membership in one round trip; returns the access facts."""
+    ensure_role(access.me, {"teacher", "admin"})
+    facts = access.facts(class_id=class_id, **ids)
+    if not facts["class"]:
+        raise HTTPException(status_code=404, detail="Class not found")
+    if access.me.role == "teacher" and not facts["viewer_teaches_class"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return facts
 
 def _format_sample_value(raw: str) -> tuple[str, bool]:
     try:
@@ -216,6 +275,11 @@ def _parse_csv_testcases(content: bytes):
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Line {line_no}: timeout_ms/points must be integers")
         is_public = _str_to_bool(row.get("is_public"), default=False)
+        group_raw = (row.get("group") or "").strip()
+        try:
+            group = int(group_raw) if group_raw else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Line {line_no}: group must be an integer")
 
         cases.append(
             {
@@ -225,6 +289,7 @@ def _parse_csv_testcases(content: bytes):
                 "timeout_ms": timeout_ms,
                 "points": points,
                 "is_public": is_public,
+                "group": group,
             }
         )
 
@@ -242,10 +307,12 @@ def build_verify_url(token: str) -> str:
     return f"{base}/auth/verify?token={token}"
 
 @app.post("/auth/register")
-def api_register(inp: RegisterIn):
-    if get_user_by_email(inp.email):
+async def api_register(inp: RegisterIn):
+    # async: 해시(프로세스 풀)를 기다리는 동안 DB 연결도 threadpool 스레드도 잡지 않는다 (api_login과 같은 방식)
+    if await run_in_threadpool(get_user_by_email, inp.email):
         raise HTTPException(status_code=409, detail="Email already registered")
-    uid, token, exp = create_user_with_verify(inp.email, inp.username, inp.password)
+    pwd_hash = await hashing.hash_password_async(inp.password)
+    uid, token, exp = await run_in_threadpool(create_user_with_verify, inp.email, inp.username, pwd_hash)
     verify_url = build_verify_url(token)
 
     smtp_configured = is_smtp_configured()
@@ -253,7 +320,7 @@ def api_register(inp: RegisterIn):
 
     if smtp_configured:
         try:
-            send_verify_email(inp.email, verify_url)
+            await run_in_threadpool(send_verify_email, inp.email, verify_url)
         except SMTPConfigError as cfg_err:
             logger.error("SMTP configuration error: %s", cfg_err)
             smtp_error = cfg_err
@@ -294,34 +361,117 @@ def api_verify(token: str):
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     return {"detail": "Email verified. You can now login."}
 
+@app.on_event("shutdown")
+def stop_hash_pool():
+    hashing.shutdown()
+
+@app.exception_handler(hashing.HashBusy)
+def hash_busy_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(PoolError)
+def pool_exhausted_handler(request, exc):
+    # POSTGRES_POOL_WAIT_S 동안 연결이 하나도 돌아오지 않았다
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again"}, headers={"Retry-After": "1"})
+
 @app.post("/auth/login", response_model=TokenOut)
-def api_login(inp: LoginIn):
-    row = get_user_by_email(inp.email)
-    if not row or not verify_password(inp.password, row[2]):
+async def api_login(inp: LoginIn):
+    # async: 해시 검증(프로세스 풀)을 기다리는 동안 threadpool 스레드를 잡고 있지 않는다
+    row = await run_in_threadpool(get_user_by_email, inp.email)
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await hashing.verify_and_update_async(inp.password, row[2])
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     # row: id, email, pwd_hash, role, username, is_verified
     if not row[5]:
         raise HTTPException(status_code=401, detail="Email not verified")
+    if new_hash:  # OJ_PWD_PBKDF2_ROUNDS가 올라갔으면 이번 로그인에서 새 비용으로 교체
+        await run_in_threadpool(update_password_hash, row[0], new_hash)
     token = create_access_token(row[0], row[1], os.getenv("JWT_SECRET", "dev-secret"), int(os.getenv("JWT_EXPIRE_MINUTES","60")))
     return TokenOut(access_token=token)
 
 @app.get("/me", response_model=MeOut)
 def api_me(me: MeOut = Depends(get_current_user)):
-    # get_current_user를 username/is_verified까지 채우도록 살짝 수정
-    # (간단히 다시 조회)
-    row = get_user_by_email(me.email)
-    return MeOut(id=row[0], email=row[1], username=row[4], role=row[3], is_verified=row[5])
+    # get_current_user가 이미 username/is_verified까지 채워서 돌려준다
+    return me
 
 # ---------- 제출 생성 라우트 수정 ----------
 
 @app.post("/submissions")
-def api_create_submission(data: SubmissionCreate, me: MeOut = Depends(get_current_user)):
-    sid = logic.create_submission(me.id, data)   # ← 더 이상 FAKE_USER_ID 안 씀
+def api_create_submission(data: SubmissionCreate, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
+    compile_output = None
+    if SYNTAX_PRECHECK and data.language in ("python", "pypy"):
+        compile_output = python_syntax_error(data.source_code)
+    # 토큰은 INSERT 직전에: admit이 잠근 rate_buckets 행(반 전체 공유)은 커밋까지 잡혀 있으니 그 사이에 컴파일하지 않는다
+    try:
+        admission.admit(me.id, me.role, data.problem_id, cur=cur)
+    except admission.Rejected as e:
+        raise HTTPException(status_code=429, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    sid = logic.create_submission(me.id, data, compile_output, cur=cur)   # ← 더 이상 FAKE_USER_ID 안 씀
+    if sid is None:
+        raise HTTPException(status_code=400, detail=f"Language '{data.language}' is not allowed for this problem")
     # 즉시 상태 반환(프론트 폴링용)
-    return {"submission_id": sid, "status": "queued"}
+    return {"submission_id": sid, "status": "compile_error" if compile_output else "queued"}
+
+def _run_problem(data: RunCreate, authorization: str | None) -> dict:
+    """인증 + 문제 + 접근 권한을 짧은 checkout 하나로. 실행 서버를 부르기 전에 연결을 돌려준다"""
+    with DB() as cur:
+        me = get_current_user(authorization=authorization, cur=cur)
+        prob = logic.get_run_problem(data.problem_id, cur=cur)
+        if not prob:
+            raise HTTPException(status_code=404, detail="Problem not found")
+        facts = load_access_facts(me.id, problem_id=data.problem_id, cur=cur)
+        if facts["problem_in_any_class"] and not AccessContext(me, cur).can_view_problem(facts):
+            raise HTTPException(status_code=403, detail="Forbidden")
+    return prob
+
+@app.post("/run")
+async def api_run(data: RunCreate, authorization: str | None = Header(default=None)):
+    """공개 샘플(또는 stdin)로 바로 실행. 채점 큐와 분리된 실행 서버로 넘기고 결과는 저장하지 않는다.
+
+    async + get_db 없음: 실행 서버를 기다리는 동안 DB 연결도 threadpool 스레드도 잡지 않는다"""
+    prob = await run_in_threadpool(_run_problem, data, authorization)
+    if data.language not in prob["languages"]:
+        raise HTTPException(status_code=400, detail=f"Language '{data.language}' is not allowed for this problem")
+    if prob["interactor_source"]:
+        raise HTTPException(status_code=400, detail="Interactive problems can only be submitted")
+
+    if data.stdin is not None:
+        cases = [{"input_text": data.stdin, "expected_text": None}]
+    elif prob["samples"]:
+        cases = prob["samples"]
+    else:
+        raise HTTPException(status_code=400, detail="This problem has no public samples; provide stdin")
+    if data.language in ("python", "pypy") and SYNTAX_PRECHECK:
+        compile_output = await run_in_threadpool(python_syntax_error, data.source_code)
+        if compile_output:
+            return {"status": "compile_error", "compile_output": compile_output, "results": []}
+
+    try:
+        async with httpx.AsyncClient(timeout=RUN_CLIENT_TIMEOUT) as client:
+            resp = await client.post(RUN_SERVER_URL, json={
+                "language": data.language,
+                "python_tier": data.python_tier or prob["python_tier"],
+                "source_code": data.source_code,
+                "checker": prob["checker"],
+                "checker_args": prob["checker_args"],
+                "checker_source": prob["checker_source"],
+                "cases": cases,
+            }, headers={"X-Run-Token": RUN_TOKEN})
+    except httpx.HTTPError:
+        resp = None
+    # 실행 서버가 꽉 찼거나 내려가 있으면 기다리게 하지 않고 바로 돌려보낸다
+    if resp is None or resp.status_code == 503:
+        raise HTTPException(status_code=503, detail="Run lane is busy, try again", headers={"Retry-After": "1"})
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail="Run failed")
+    out = resp.json()
+    for case, result in zip(cases, out["results"]):
+        result["idx"] = case.get("idx")
+    return out
 
 # ---------- 문제 목록 및 상세 ----------
-from backend.db import DB
 from typing import List
 
 class Problem(BaseModel):
@@ -333,17 +483,58 @@ class Problem(BaseModel):
 @app.get("/problems", response_model=List[Problem])
 def list_problems():
     """모든 문제 목록 (공개)"""
-    with DB() as cur:
+    with ReadDB() as cur:
         cur.execute("""
             SELECT id, slug, title, difficulty
             FROM problems p
             WHERE NOT EXISTS (
                 SELECT 1 FROM class_problems cp WHERE cp.problem_id = p.id
-            )
+            ) AND p.deleted_at IS NULL
             ORDER BY id
         """)
         rows = cur.fetchall()
-        return [Problem(id=r[0], slug=r[1], title=r[2], difficulty=r[3]) for r in rows]
+        return json_response([{"id": r[0], "slug": r[1], "title": r[2], "difficulty": r[3]} for r in rows])
+
+def _encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        rank, pid = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(rank), int(pid)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# /problems/{pid} 보다 먼저 선언해야 "search"가 pid로 잡히지 않는다
+@app.get("/problems/search")
+def search_problems(
+    q: str | None = Query(default=None, max_length=200),
+    difficulty: list[str] | None = Query(default=None),
+    tag: list[str] | None = Query(default=None),
+    solved: bool | None = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: str | None = None,
+    me: MeOut | None = Depends(get_optional_user),
+    rcur=Depends(get_public_read_db),
+):
+    """공개 문제 검색: 제목/slug/지문 검색, 난이도·태그·풀이 여부 패싯, 키셋 페이지네이션.
+
+    total/facets는 첫 페이지(cursor 없음)에만 들어 있다."""
+    if difficulty and not set(difficulty) <= {"easy", "medium", "hard"}:
+        raise HTTPException(status_code=400, detail="Unknown difficulty")
+    if solved is not None and not me:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    try:
+        tags = normalize_tags(tag)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = logic.search_problems(
+        q=q, difficulties=difficulty, tags=tags, solved=solved, user_id=me.id if me else None,
+        limit=limit, after=_decode_cursor(cursor) if cursor else None, with_facets=not cursor, cur=rcur,
+    )
+    after = result.pop("next")
+    result["next_cursor"] = _encode_cursor(after) if after else None
+    return json_response(result)
 
 
 class ProblemDetail(Problem):
@@ -351,146 +542,205 @@ class ProblemDetail(Problem):
     public_samples: list[dict]
     expects_json: bool = False
     starter_code: str | None = None
+    languages: list[str] = ["python"]
+    python_tier: str = "cpython"
+    tags: list[str] = []
 
 class ProblemUpdateIn(BaseModel):
     title: str | None = None
     difficulty: str | None = Field(default=None, pattern="^(easy|medium|hard)$")
     statement_md: str | None = None
     starter_code: str | None = None
+    languages: list[Language] | None = Field(default=None, min_length=1)
+    python_tier: str | None = Field(default=None, pattern=PYTHON_TIER_PATTERN)
+    checker: str | None = Field(default=None, pattern=CHECKER_PATTERN)
+    checker_args: dict | None = None
+    checker_source: str | None = None
+    interactor_source: str | None = None  # "" 이면 인터랙티브 해제
+    turn_timeout_ms: int | None = Field(default=None, gt=0)
+    schedule: str | None = Field(default=None, pattern=SCHEDULE_PATTERN)
+    tags: list[str] | None = Field(default=None, max_length=20)  # [] = 태그 모두 제거
+
+    _check_source = field_validator("checker_source")(check_checker_source)
+    _check_interactor = field_validator("interactor_source")(check_interactor_source)
+    _normalize_tags = field_validator("tags")(normalize_tags)
 
     @model_validator(mode="after")
     def at_least_one(cls, values):
-        if not any(values.__dict__.values()):
+        if not any(v or v == [] for v in values.__dict__.values()):
             raise ValueError("At least one field must be provided")
         return values
 
 @app.get("/problems/{pid}", response_model=ProblemDetail)
-def get_problem(pid: int, me: MeOut | None = Depends(get_optional_user)):
+def get_problem(
+    pid: int, me: MeOut | None = Depends(get_optional_user), cur=Depends(get_db), rcur=Depends(get_public_read_db),
+):
     """특정 문제 상세 (공개 + 공개 샘플만)"""
-    with DB() as cur:
-        cur.execute(
-            "SELECT id, slug, title, difficulty, statement_md, starter_code FROM problems WHERE id=%s",
-            (pid,),
-        )
-        r = cur.fetchone()
-        if not r:
-            raise HTTPException(status_code=404, detail="Problem not found")
+    rcur.execute(
+        "SELECT id, slug, title, difficulty, statement_md, starter_code, languages, python_tier, tags FROM problems WHERE id=%s AND deleted_at IS NULL",
+        (pid,),
+    )
+    r = rcur.fetchone()
+    if not r:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    facts = load_access_facts(me.id if me else None, problem_id=pid, cur=cur)
+    if facts["problem_in_any_class"]:
+        if not me:
+            raise HTTPException(status_code=401, detail="Authentication required")
+        if not AccessContext(me, cur).can_view_problem(facts):
+            raise HTTPException(status_code=403, detail="Forbidden")
 
-        class_ids = logic.problem_class_ids(pid)
-        if class_ids:
-            if not me:
-                raise HTTPException(status_code=401, detail="Authentication required")
-            allowed = False
-            if me.role == "admin":
-                allowed = True
-            elif me.role == "teacher" and logic.teacher_has_problem_access(me.id, pid):
-                allowed = True
-            elif me.role == "student" and logic.student_has_problem_access(me.id, pid):
-                allowed = True
-            if not allowed:
-                raise HTTPException(status_code=403, detail="Forbidden")
-
-        cur.execute(
-            """
-            SELECT idx, input_text, expected_text
-            FROM testcases
-            WHERE problem_id=%s AND is_public=true
-            ORDER BY idx
-            """,
-            (pid,),
-        )
-        samples_db = cur.fetchall()
-        samples: list[dict] = []
-        expects_json = False
-        for t in samples_db:
-            input_text = t[1]
-            expected_text = t[2]
-            rendered_input, was_json_in = _format_sample_value(input_text)
-            rendered_expected, was_json_out = _format_sample_value(expected_text)
-            if was_json_in or was_json_out:
-                expects_json = True
-            samples.append({
-                "idx": t[0],
-                "input_text": rendered_input,
-                "expected_text": rendered_expected,
-            })
-
-        return ProblemDetail(
-            id=r[0],
-            slug=r[1],
-            title=r[2],
-            difficulty=r[3],
-            statement_md=r[4],
-            public_samples=samples,
-            expects_json=expects_json,
-            starter_code=r[5],
-        )
+    rcur.execute(
+        """
+        SELECT idx, input_text, expected_text
+        FROM testcases
+        WHERE problem_id=%s AND is_public=true
+        ORDER BY idx
+        """,
+        (pid,),
+    )
+    samples_db = rcur.fetchall()
+    samples: list[dict] = []
+    expects_json = False
+    for t in samples_db:
+        input_text = t[1]
+        expected_text = t[2]
+        rendered_input, was_json_in = _format_sample_value(input_text)
+        rendered_expected, was_json_out = _format_sample_value(expected_text)
+        if was_json_in or was_json_out:
+            expects_json = True
+        samples.append({
+            "idx": t[0],
+            "input_text": rendered_input,
+            "expected_text": rendered_expected,
+        })
+
+    return ProblemDetail(
+        id=r[0],
+        slug=r[1],
+        title=r[2],
+        difficulty=r[3],
+        statement_md=r[4],
+        public_samples=samples,
+        expects_json=expects_json,
+        starter_code=r[5],
+        languages=r[6],
+        python_tier=r[7],
+        tags=r[8],
+    )
 
 # ---------- 관리자/교사 기능 ----------
 @app.get("/admin/problems", response_model=List[Problem])
-def admin_list_public_problems(me: MeOut = Depends(get_current_user)):
+def admin_list_public_problems(me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"admin"})
-    probs = logic.list_problems()
-    return [Problem(**p) for p in probs]
+    return json_response(logic.list_problems(cur=cur))
 
 @app.post("/admin/problems")
-def admin_create_problem(data: ProblemCreate, me: MeOut = Depends(get_current_user)):
+def admin_create_problem(data: ProblemCreate, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"admin"})
-    pid = logic.create_problem(data, author_id=me.id)
+    pid = logic.create_problem(data, author_id=me.id, cur=cur)
     return {"problem_id": pid}
 
 @app.delete("/admin/problems/{pid}")
-def admin_delete_problem(pid: int, me: MeOut = Depends(get_current_user)):
+def admin_delete_problem(pid: int, background: BackgroundTasks, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"admin"})
-    logic.delete_problem(pid)
+    logic.delete_problem(pid, deferred=DEFERRED_DELETES, cur=cur)
+    if DEFERRED_DELETES:
+        background.add_task(logic.purge_deleted)
     return {"detail": "problem_deleted"}
 
 @app.post("/admin/teacher-assign")
-def admin_assign_teacher(payload: TeacherAssignIn, me: MeOut = Depends(get_current_user)):
+def admin_assign_teacher(payload: TeacherAssignIn, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"admin"})
     if payload.teacher_id == payload.student_id:
         raise HTTPException(status_code=400, detail="Teacher and student must be different")
-    teacher = get_user_by_id(payload.teacher_id)
+    teacher = get_user_by_id(payload.teacher_id, cur=cur)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     if teacher[3] not in ("teacher", "admin"):
         raise HTTPException(status_code=400, detail="Target user is not a teacher")
-    student = get_user_by_id(payload.student_id)
+    student = get_user_by_id(payload.student_id, cur=cur)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     if student[3] != "student":
         raise HTTPException(status_code=400, detail="Target user is not a student")
-    logic.assign_student_to_teacher(payload.teacher_id, payload.student_id)
+    logic.assign_student_to_teacher(payload.teacher_id, payload.student_id, cur=cur)
     return {"detail": "assigned"}
 
+@app.get("/admin/queries")
+def admin_query_stats(me: MeOut = Depends(get_current_user)):
+    """Calls and time of the prepared hot statements in this API process."""
+    ensure_role(me, {"admin"})
+    return {"prepared": queries.PREPARE, "statements": queries.stats()}
+
+@app.get("/admin/workers")
+def admin_list_workers(me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
+    """Judge fleet: per-worker state and busy slots, plus totals over live workers."""
+    ensure_role(me, {"admin"})
+    workers = logic.list_workers(cur=cur)
+    for w in workers:
+        w["alive"] = w["state"] != "stopped" and w["heartbeat_age_s"] <= WORKER_DEAD_AFTER_S
+        w["started_at"] = _to_iso(w["started_at"])
+        w["heartbeat_at"] = _to_iso(w["heartbeat_at"])
+    live = [w for w in workers if w["alive"]]
+    slots = sum(w["slots"] for w in live if w["state"] == "active")
+    busy = sum(w["busy"] for w in live)
+    return {
+        "workers": workers,
+        "fleet": {
+            "live_workers": len(live),
+            "active_slots": slots,
+            "busy_slots": busy,
+            "utilization": busy / slots if slots else None,
+            **logic.queue_stats(cur=cur),
+        },
+    }
+
+@app.post("/admin/workers/{worker_id}/drain")
+def admin_drain_worker(worker_id: str, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
+    ensure_role(me, {"admin"})
+    if not logic.set_worker_state(worker_id, "draining", cur=cur):
+        raise HTTPException(status_code=404, detail="Worker not found")
+    return {"detail": "worker_draining"}
+
+@app.post("/admin/workers/{worker_id}/resume")
+def admin_resume_worker(worker_id: str, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
+    ensure_role(me, {"admin"})
+    if not logic.set_worker_state(worker_id, "active", cur=cur):
+        raise HTTPException(status_code=404, detail="Worker not found")
+    return {"detail": "worker_resumed"}
+
 @app.get("/teacher/students/{student_id}/submissions")
-def teacher_student_submissions(student_id: int, me: MeOut = Depends(get_current_user)):
+def teacher_student_submissions(student_id: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    me = access.me
     ensure_role(me, {"teacher", "admin"})
-    student = get_user_by_id(student_id)
+    facts = access.facts(student_id=student_id)
+    student = facts["student"]
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    if student[3] != "student":
+    if student["role"] != "student":
         raise HTTPException(status_code=400, detail="Target user is not a student")
-    if me.role == "teacher" and not logic.teacher_can_access_student(me.id, student_id):
+    if me.role == "teacher" and not facts["viewer_teaches_student"]:
         raise HTTPException(status_code=403, detail="Forbidden")
-    submissions = logic.list_submissions_for_student(student_id)
-    return {
+    submissions = logic.list_submissions_for_student(student_id, cur=rcur)
+    return json_response({
         "student_id": student_id,
-        "student_email": student[1],
-        "student_username": student[4],
+        "student_email": student["email"],
+        "student_username": student["username"],
         "submissions": [_serialize_submission_dict(s) for s in submissions],
-    }
+    })
 
 @app.post("/teacher/classes")
-def teacher_create_class(data: ClassCreateIn, me: MeOut = Depends(get_current_user)):
+def teacher_create_class(data: ClassCreateIn, me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"teacher", "admin"})
     name = data.name.strip()
     if not name:
         raise HTTPException(status_code=400, detail="Class name is required")
     description = data.description.strip() if data.description else None
     owner_id = me.id
-    created = logic.create_class(name, description, owner_id)
-    cls = logic.get_class(created["id"])
+    created = logic.create_class(name, description, owner_id, cur=cur)
+    cls = logic.get_class(created["id"], cur=cur)
     return {
         "class_id": created["id"],
         "code": created["code"],
@@ -500,10 +750,10 @@ def teacher_create_class(data: ClassCreateIn, me: MeOut = Depends(get_current_us
     }
 
 @app.get("/teacher/classes")
-def teacher_list_classes(me: MeOut = Depends(get_current_user), teacher_id: int | None = None):
+def teacher_list_classes(me: MeOut = Depends(get_current_user), teacher_id: int | None = None, cur=Depends(get_db)):
     ensure_role(me, {"teacher", "admin"})
     target_teacher = teacher_id if (me.role == "admin" and teacher_id) else me.id
-    classes = logic.list_classes_for_teacher(target_teacher)
+    classes = logic.list_classes_for_teacher(target_teacher, cur=cur)
     return [
         {
             "id": c["id"],
@@ -517,15 +767,10 @@ def teacher_list_classes(me: MeOut = Depends(get_current_user), teacher_id: int
     ]
 
 @app.get("/teacher/classes/{class_id}")
-def teacher_get_class(class_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    students = logic.list_class_students(class_id)
-    teachers = logic.list_class_teachers(class_id)
+def teacher_get_class(class_id: int, access: AccessContext = Depends(get_access)):
+    cls = require_class_teacher(access, class_id)["class"]
+    students = logic.list_class_students(class_id, cur=access.cur)
+    teachers = logic.list_class_teachers(class_id, cur=access.cur)
     return {
         "id": cls["id"],
         "code": cls["code"],
@@ -537,58 +782,40 @@ def teacher_get_class(class_id: int, me: MeOut = Depends(get_current_user)):
     }
 
 @app.post("/teacher/classes/{class_id}/students")
-def teacher_add_student_to_class(class_id: int, payload: ClassStudentAddIn, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    student = get_user_by_email(payload.student_email)
+def teacher_add_student_to_class(class_id: int, payload: ClassStudentAddIn, access: AccessContext = Depends(get_access)):
+    require_class_teacher(access, class_id)
+    student = get_user_by_email(payload.student_email, cur=access.cur)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     if student[3] != "student":
         raise HTTPException(status_code=400, detail="Target user is not a student")
-    logic.add_student_to_class(class_id, student[0])
+    logic.add_student_to_class(class_id, student[0], cur=access.cur)
     return {"detail": "student_added", "student_id": student[0]}
 
 @app.post("/teacher/classes/{class_id}/teachers")
-def teacher_add_teacher_to_class(class_id: int, payload: ClassTeacherAddIn, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    teacher = get_user_by_email(payload.teacher_email)
+def teacher_add_teacher_to_class(class_id: int, payload: ClassTeacherAddIn, access: AccessContext = Depends(get_access)):
+    require_class_teacher(access, class_id)
+    teacher = get_user_by_email(payload.teacher_email, cur=access.cur)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     if teacher[3] not in ("teacher", "admin"):
         raise HTTPException(status_code=400, detail="Target user is not a teacher")
-    logic.add_teacher_to_class(class_id, teacher[0])
+    logic.add_teacher_to_class(class_id, teacher[0], cur=access.cur)
     return {"detail": "teacher_added", "teacher_id": teacher[0]}
 
 @app.delete("/teacher/classes/{class_id}")
-def teacher_delete_class(class_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    logic.delete_class(class_id)
+def teacher_delete_class(class_id: int, background: BackgroundTasks, access: AccessContext = Depends(get_access)):
+    require_class_teacher(access, class_id)
+    logic.delete_class(class_id, deferred=DEFERRED_DELETES, cur=access.cur)
+    if DEFERRED_DELETES:
+        background.add_task(logic.purge_deleted)
     return {"detail": "class_deleted"}
 
 @app.get("/teacher/classes/{class_id}/problems")
-def teacher_list_class_problems(class_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    problems = logic.list_class_problems(class_id)
-    return [
+def teacher_list_class_problems(class_id: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    require_class_teacher(access, class_id)
+    problems = logic.list_class_problems(class_id, cur=rcur)
+    return json_response([
         {
             "id": p["id"],
             "slug": p["slug"],
@@ -599,39 +826,32 @@ def teacher_list_class_problems(class_id: int, me: MeOut = Depends(get_current_u
             "assigned_by_name": p["assigned_by_name"],
         }
         for p in problems
-    ]
+    ])
 
 @app.post("/teacher/classes/{class_id}/problems")
-def teacher_add_problem_to_class(class_id: int, payload: ClassProblemAssignIn, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
+def teacher_add_problem_to_class(class_id: int, payload: ClassProblemAssignIn, access: AccessContext = Depends(get_access)):
+    me = access.me
+    require_class_teacher(access, class_id)
 
     problem_id = payload.problem_id
     if payload.new_problem:
-        problem_id = logic.create_problem(payload.new_problem, author_id=me.id)
+        problem_id = logic.create_problem(payload.new_problem, author_id=me.id, cur=access.cur)
     else:
-        prob = logic.get_problem(problem_id)
+        prob = logic.get_problem(problem_id, cur=access.cur)
         if not prob:
             raise HTTPException(status_code=404, detail="Problem not found")
 
-    logic.add_problem_to_class(class_id, problem_id, me.id)
+    logic.add_problem_to_class(class_id, problem_id, me.id, cur=access.cur)
     return {"detail": "problem_assigned", "problem_id": problem_id}
 
 @app.delete("/teacher/classes/{class_id}/problems/{problem_id}")
-def teacher_remove_problem_from_class(class_id: int, problem_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if not logic.class_has_problem(class_id, problem_id):
+def teacher_remove_problem_from_class(class_id: int, problem_id: int, background: BackgroundTasks, access: AccessContext = Depends(get_access)):
+    facts = require_class_teacher(access, class_id, problem_id=problem_id)
+    if not facts["class_has_problem"]:
         raise HTTPException(status_code=404, detail="Problem not in class")
-    logic.remove_problem_from_class(class_id, problem_id)
+    logic.remove_problem_from_class(class_id, problem_id, deferred=DEFERRED_DELETES, cur=access.cur)
+    if DEFERRED_DELETES:
+        background.add_task(logic.purge_deleted)
     return {"detail": "problem_removed"}
 
 @app.put("/teacher/classes/{class_id}/problems/{problem_id}")
@@ -639,15 +859,10 @@ def teacher_update_problem(
     class_id: int,
     problem_id: int,
     payload: ProblemUpdateIn,
-    me: MeOut = Depends(get_current_user),
+    access: AccessContext = Depends(get_access),
 ):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if not logic.class_has_problem(class_id, problem_id):
+    facts = require_class_teacher(access, class_id, problem_id=problem_id)
+    if not facts["class_has_problem"]:
         raise HTTPException(status_code=404, detail="Problem not in class")
 
     updates = {}
@@ -659,17 +874,35 @@ def teacher_update_problem(
         updates["statement_md"] = payload.statement_md
     if payload.starter_code is not None:
         updates["starter_code"] = payload.starter_code
+    if payload.languages is not None:
+        updates["languages"] = payload.languages
+    if payload.python_tier is not None:
+        updates["python_tier"] = payload.python_tier
+    if payload.checker is not None:
+        updates["checker"] = payload.checker
+    if payload.checker_args is not None:
+        updates["checker_args"] = payload.checker_args
+    if payload.checker_source is not None:
+        updates["checker_source"] = payload.checker_source
+    if payload.interactor_source is not None:
+        updates["interactor_source"] = payload.interactor_source
+    if payload.turn_timeout_ms is not None:
+        updates["turn_timeout_ms"] = payload.turn_timeout_ms
+    if payload.schedule is not None:
+        updates["schedule"] = payload.schedule
+    if payload.tags is not None:
+        updates["tags"] = payload.tags
 
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    logic.update_problem(problem_id, **updates)
+    logic.update_problem(problem_id, cur=access.cur, **updates)
     return {"detail": "problem_updated"}
 
 @app.get("/student/classes")
-def student_list_classes(me: MeOut = Depends(get_current_user)):
+def student_list_classes(me: MeOut = Depends(get_current_user), cur=Depends(get_db)):
     ensure_role(me, {"student"})
-    classes = logic.list_classes_for_student(me.id)
+    classes = logic.list_classes_for_student(me.id, cur=cur)
     return [
         {
             "id": c["id"],
@@ -682,15 +915,16 @@ def student_list_classes(me: MeOut = Depends(get_current_user)):
     ]
 
 @app.get("/student/classes/{class_id}")
-def student_get_class(class_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"student"})
-    cls = logic.get_class(class_id)
+def student_get_class(class_id: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    ensure_role(access.me, {"student"})
+    facts = access.facts(class_id=class_id)
+    cls = facts["class"]
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found")
-    if not logic.student_in_class(me.id, class_id):
+    if not facts["viewer_in_class"]:
         raise HTTPException(status_code=403, detail="Forbidden")
-    problems = logic.list_class_problems(class_id)
-    teachers = logic.list_class_teachers(class_id)
+    problems = logic.list_class_problems(class_id, cur=rcur)
+    teachers = logic.list_class_teachers(class_id, cur=rcur)
     return {
         "id": cls["id"],
         "name": cls["name"],
@@ -709,21 +943,84 @@ def student_get_class(class_id: int, me: MeOut = Depends(get_current_user)):
         ],
     }
 
+def _serialize_contest(c: dict) -> dict:
+    return {
+        "id": c["id"],
+        "class_id": c["class_id"],
+        "title": c["title"],
+        "starts_at": _to_iso(c["starts_at"]),
+        "ends_at": _to_iso(c["ends_at"]),
+        "freeze_at": _to_iso(c["freeze_at"]),
+        "unfrozen": c["unfrozen"],
+        "scoring": c["scoring"],
+        "penalty_minutes": c["penalty_minutes"],
+    }
+
+@app.post("/teacher/classes/{class_id}/contests")
+def teacher_create_contest(class_id: int, payload: ContestCreate, access: AccessContext = Depends(get_access)):
+    require_class_teacher(access, class_id)
+    contest_id = logic.create_contest(class_id, payload, access.me.id, cur=access.cur)
+    if contest_id is None:
+        raise HTTPException(status_code=400, detail="Problem is not assigned to this class")
+    return {"detail": "contest_created", "contest_id": contest_id}
+
+@app.get("/teacher/classes/{class_id}/contests")
+def teacher_list_contests(class_id: int, access: AccessContext = Depends(get_access)):
+    require_class_teacher(access, class_id)
+    return [_serialize_contest(c) for c in logic.list_contests(class_id, cur=access.cur)]
+
+@app.get("/student/classes/{class_id}/contests")
+def student_list_contests(class_id: int, access: AccessContext = Depends(get_access)):
+    ensure_role(access.me, {"student"})
+    facts = access.facts(class_id=class_id)
+    if not facts["class"]:
+        raise HTTPException(status_code=404, detail="Class not found")
+    if not facts["viewer_in_class"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return [_serialize_contest(c) for c in logic.list_contests(class_id, cur=access.cur)]
+
+@app.post("/teacher/contests/{contest_id}/unfreeze")
+def teacher_unfreeze_contest(contest_id: int, access: AccessContext = Depends(get_access)):
+    contest = logic.get_contest(contest_id, cur=access.cur)
+    if not contest:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    require_class_teacher(access, contest["class_id"])
+    logic.unfreeze_contest(contest_id, cur=access.cur)
+    return {"detail": "contest_unfrozen"}
+
+@app.get("/contests/{contest_id}/scoreboard")
+def get_contest_scoreboard(
+    contest_id: int,
+    view: str | None = None,
+    if_none_match: str | None = Header(default=None),
+    access: AccessContext = Depends(get_access),
+):
+    """Cached snapshot; clients poll with If-None-Match and get 304 until the board changes."""
+    contest = logic.get_contest(contest_id, cur=access.cur)
+    if not contest:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    facts = access.facts(class_id=contest["class_id"])
+    if not facts["class"]:
+        raise HTTPException(status_code=404, detail="Contest not found")
+    staff = access.me.role == "admin" or (access.me.role == "teacher" and facts["viewer_teaches_class"])
+    if not staff and not facts["viewer_in_class"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    # 학생은 프리즈 중이면 항상 프리즈 화면, 교사는 기본 실시간이고 ?view=frozen으로 학생 화면 확인
+    frozen = scoreboard.is_frozen(contest) and (not staff or view == "frozen")
+    etag, body = scoreboard.snapshot(contest, frozen, cur=access.cur)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    # 압축된 응답은 약한 ETag(W/...)로 나가므로 약한 비교
+    if if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/problems/{pid}/my-submissions")
-def get_my_submissions(pid: int, me: MeOut = Depends(get_current_user)):
-    class_ids = logic.problem_class_ids(pid)
-    if class_ids:
-        allowed = False
-        if me.role == "admin":
-            allowed = True
-        elif me.role == "teacher" and logic.teacher_has_problem_access(me.id, pid):
-            allowed = True
-        elif me.role == "student" and logic.student_has_problem_access(me.id, pid):
-            allowed = True
-        if not allowed:
-            raise HTTPException(status_code=403, detail="Forbidden")
-    submissions = logic.list_user_submissions_for_problem(me.id, pid, limit=15)
-    solved = logic.user_solved_problem(me.id, pid)
+def get_my_submissions(pid: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    me = access.me
+    if not access.can_view_problem(access.facts(problem_id=pid)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    submissions = logic.list_user_submissions_for_problem(me.id, pid, limit=15, cur=rcur)
+    solved = logic.user_solved_problem(me.id, pid, cur=rcur)
     return {
         "solved": solved,
         "submissions": [
@@ -738,52 +1035,70 @@ def get_my_submissions(pid: int, me: MeOut = Depends(get_current_user)):
             for s in submissions
         ],
     }
+def _store_uploaded_testcases(authorization: str | None, problem_id: int, cases, replace: bool, class_id: int | None = None):
+    """인증 + 권한 확인 + 저장을 짧은 checkout 하나로. 업로드를 읽고 CSV를 파싱하는 동안은 연결을 잡지 않는다"""
+    with DB(track_writes=True) as cur:
+        me = get_current_user(authorization=authorization, cur=cur)
+        if class_id is None:
+            ensure_role(me, {"admin"})
+        else:
+            facts = require_class_teacher(AccessContext(me, cur), class_id, problem_id=problem_id)
+            if not facts["class_has_problem"]:
+                raise HTTPException(status_code=400, detail="Problem is not assigned to this class")
+        logic.store_problem_testcases(problem_id, cases, replace_existing=replace, cur=cur)
+    return {"detail": "testcases_uploaded", "count": len(cases), "replace_existing": replace}
+
 @app.post("/teacher/classes/{class_id}/problems/{problem_id}/testcases/upload")
 async def teacher_upload_testcases(
     class_id: int,
     problem_id: int,
     replace: bool = Form(True),
     file: UploadFile = File(...),
-    me: MeOut = Depends(get_current_user),
+    authorization: str | None = Header(default=None),
 ):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if not logic.class_has_problem(class_id, problem_id):
-        raise HTTPException(status_code=400, detail="Problem is not assigned to this class")
-
-    content = await file.read()
-    cases = _parse_csv_testcases(content)
-
-    logic.store_problem_testcases(problem_id, cases, replace_existing=replace)
-    return {"detail": "testcases_uploaded", "count": len(cases), "replace_existing": replace}
+    cases = await run_in_threadpool(_parse_csv_testcases, await file.read())
+    return await run_in_threadpool(_store_uploaded_testcases, authorization, problem_id, cases, replace, class_id)
 
 @app.post("/admin/problems/{problem_id}/testcases/upload")
 async def admin_upload_testcases(
     problem_id: int,
     replace: bool = Form(True),
     file: UploadFile = File(...),
-    me: MeOut = Depends(get_current_user),
+    authorization: str | None = Header(default=None),
+):
+    cases = await run_in_threadpool(_parse_csv_testcases, await file.read())
+    return await run_in_threadpool(_store_uploaded_testcases, authorization, problem_id, cases, replace)
+
+@app.get("/teacher/classes/{class_id}/problems/{problem_id}/groups")
+def teacher_list_testcase_groups(class_id: int, problem_id: int, access: AccessContext = Depends(get_access)):
+    facts = require_class_teacher(access, class_id, problem_id=problem_id)
+    if not facts["class_has_problem"]:
+        raise HTTPException(status_code=400, detail="Problem is not assigned to this class")
+    return logic.list_testcase_groups(problem_id, cur=access.cur)
+
+@app.put("/teacher/classes/{class_id}/problems/{problem_id}/groups")
+def teacher_replace_testcase_groups(
+    class_id: int, problem_id: int, payload: TestcaseGroupsIn, access: AccessContext = Depends(get_access),
+):
+    facts = require_class_teacher(access, class_id, problem_id=problem_id)
+    if not facts["class_has_problem"]:
+        raise HTTPException(status_code=400, detail="Problem is not assigned to this class")
+    logic.replace_testcase_groups(problem_id, [g.model_dump() for g in payload.groups], cur=access.cur)
+    return {"detail": "groups_updated", "count": len(payload.groups)}
+
+@app.put("/admin/problems/{problem_id}/groups")
+def admin_replace_testcase_groups(
+    problem_id: int, payload: TestcaseGroupsIn, me: MeOut = Depends(get_current_user), cur=Depends(get_db),
 ):
     ensure_role(me, {"admin"})
-    content = await file.read()
-    cases = _parse_csv_testcases(content)
-    logic.store_problem_testcases(problem_id, cases, replace_existing=replace)
-    return {"detail": "testcases_uploaded", "count": len(cases), "replace_existing": replace}
+    logic.replace_testcase_groups(problem_id, [g.model_dump() for g in payload.groups], cur=cur)
+    return {"detail": "groups_updated", "count": len(payload.groups)}
 
 @app.get("/teacher/classes/{class_id}/submissions")
-def teacher_list_class_submissions(class_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    submissions = logic.list_class_submissions(class_id)
-    return [
+def teacher_list_class_submissions(class_id: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    require_class_teacher(access, class_id)
+    submissions = logic.list_class_submissions(class_id, cur=rcur)
+    return json_response([
         {
             "submission_id": s["submission_id"],
             "status": s["status"],
@@ -799,26 +1114,23 @@ def teacher_list_class_submissions(class_id: int, me: MeOut = Depends(get_curren
             "problem_slug": s["problem_slug"],
         }
         for s in submissions
-    ]
+    ])
 
 @app.get("/teacher/classes/{class_id}/students/{student_id}/submissions")
-def teacher_student_submissions_in_class(class_id: int, student_id: int, me: MeOut = Depends(get_current_user)):
-    ensure_role(me, {"teacher", "admin"})
-    cls = logic.get_class(class_id)
-    if not cls:
-        raise HTTPException(status_code=404, detail="Class not found")
-    if me.role == "teacher" and not logic.teacher_in_class(me.id, class_id):
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if not logic.student_in_class(student_id, class_id):
+def teacher_student_submissions_in_class(
+    class_id: int, student_id: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db),
+):
+    facts = require_class_teacher(access, class_id, student_id=student_id)
+    if not facts["student_in_class"]:
         raise HTTPException(status_code=403, detail="Student not in class")
-    student = get_user_by_id(student_id)
+    student = facts["student"]
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    submissions = logic.list_class_submissions_for_student(class_id, student_id)
-    return {
+    submissions = logic.list_class_submissions_for_student(class_id, student_id, cur=rcur)
+    return json_response({
         "student_id": student_id,
-        "student_email": student[1],
-        "student_username": student[4],
+        "student_email": student["email"],
+        "student_username": student["username"],
         "class_id": class_id,
         "submissions": [
             {
@@ -835,7 +1147,7 @@ def teacher_student_submissions_in_class(class_id: int, student_id: int, me: MeO
             }
             for s in submissions
         ],
-    }
+    })
 # ---------- 제출 조회/결과 ----------
 from datetime import timezone
 
@@ -870,42 +1182,59 @@ def _serialize_submission_dict(d: dict):
     }
 
 @app.get("/submissions/{sid}")
-def api_get_submission(sid: int, me: MeOut = Depends(get_current_user)):
-    with DB() as cur:
-        cur.execute("""
-            SELECT id, status, score, time_ms, created_at, finished_at, user_id
-            FROM submissions
-            WHERE id=%s
-        """, (sid,))
-        r = cur.fetchone()
-        if not r:
-            raise HTTPException(status_code=404, detail="Submission not found")
-        owner_id = r[6]
-        if not can_access_student(me, owner_id):
-            raise HTTPException(status_code=403, detail="Forbidden")
-        return _row_to_submission(r)
+def api_get_submission(sid: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    r = logic.get_submission_status(sid, cur=rcur)
+    if not r and rcur is not access.cur:
+        # 복제본에 아직 없는 제출 (다른 사용자가 방금 낸 것)은 primary에서 다시 찾는다
+        r = logic.get_submission_status(sid, cur=access.cur)
+    if not r:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    owner_id = r[6]
+    if not access.can_access_student(owner_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {**_row_to_submission(r), "language": r[7], "compile_output": r[8]}
 
 @app.get("/submissions/{sid}/results")
-def api_get_submission_results(sid: int, me: MeOut = Depends(get_current_user)):
-    with DB() as cur:
+def api_get_submission_results(sid: int, access: AccessContext = Depends(get_access), rcur=Depends(get_read_db)):
+    with DB(rcur) as cur:
         # 권한 체크
+        rr = logic.get_submission_status(sid, cur=cur)
+        if not rr and cur is not access.cur:
+            rr = logic.get_submission_status(sid, cur=access.cur)
+        if not rr:
+            raise HTTPException(status_code=404, detail="Submission not found")
+        owner_id = rr[6]
+        if not access.can_access_student(owner_id):
+            raise HTTPException(status_code=403, detail="Forbidden")
+
+        # stdout/stderr 는 앞부분만; full_output 이 true 면 /results/{idx}/output 으로 전체 출력
+        return logic.list_submission_results(sid, cur=cur)
+
+@app.get("/submissions/{sid}/results/{idx}/output")
+def api_get_submission_output(sid: int, idx: int, access: AccessContext = Depends(get_access)):
+    """Full stdout/stderr of one testcase (kept for the first failing case only)."""
+    with DB(access.cur) as cur:
         cur.execute("SELECT user_id FROM submissions WHERE id=%s", (sid,))
         rr = cur.fetchone()
         if not rr:
             raise HTTPException(status_code=404, detail="Submission not found")
-        owner_id = rr[0]
-        if not can_access_student(me, owner_id):
+        if not access.can_access_student(rr[0]):
             raise HTTPException(status_code=403, detail="Forbidden")
 
         cur.execute("""
-            SELECT t.idx, r.verdict, r.time_ms, r.stdout, r.stderr
+            SELECT r.stdout, r.stderr, r.full_output
             FROM submission_results r
             JOIN testcases t ON r.testcase_id = t.id
-            WHERE r.submission_id = %s
-            ORDER BY t.idx
-        """, (sid,))
-        rows = cur.fetchall()
-        return [
-            {"idx": x[0], "verdict": x[1], "time_ms": x[2], "stdout": x[3], "stderr": x[4]}
-            for x in rows
-        ]
+            WHERE r.submission_id = %s AND t.idx = %s
+        """, (sid, idx))
+        row = cur.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Result not found")
+        if row[2] is None:
+            return {"idx": idx, "stdout": row[0], "stderr": row[1]}
+        full = json.loads(zlib.decompress(bytes(row[2])))
+        return {"idx": idx, "stdout": full["stdout"], "stderr": full["stderr"]}
+
+
+# 모든 라우트 선언 이후에 호출해야 프로파일 대상 라우트를 찾을 수 있다 (OJ_INSTRUMENT=1일 때만 동작)
+instrumentation.install(app)
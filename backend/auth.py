@@ -2,23 +2,26 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 import secrets
+from backend import hashing, queries
 from backend.db import DB  # 당신의 DB 컨텍스트 래퍼
 
-pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
 class TokenData(BaseModel):
     user_id: int
     email: EmailStr
     exp: int
 
+# 해시 계산은 별도 프로세스 풀에서 (backend/hashing.py)
 def hash_password(pw: str) -> str:
-    return pwd_ctx.hash(pw)
+    return hashing.hash_password(pw)
 
 def verify_password(pw: str, hashed: str) -> bool:
-    return pwd_ctx.verify(pw, hashed)
+    return hashing.verify_and_update(pw, hashed)[0]
+
+def update_password_hash(user_id: int, pwd_hash: str, cur=None):
+    with DB(cur) as cur:
+        cur.execute("UPDATE users SET pwd_hash=%s WHERE id=%s", (pwd_hash, user_id))
 
 def create_access_token(user_id: int, email: str, secret: str, minutes: int) -> str:
     now = datetime.now(tz=timezone.utc)
@@ -33,23 +36,20 @@ def decode_access_token(token: str, secret: str) -> Optional[TokenData]:
         return None
 
 
-def get_user_by_email(email: str):
-    with DB() as cur:
-        cur.execute("""
-            SELECT
-                id,          
-                email,        
-                pwd_hash,    
-                role,        
-                username,     
-                is_verified
-            FROM users
-            WHERE email=%s
-        """, (email,))
+# 인증된 요청마다 한 번씩 (get_current_user)
+USER_BY_EMAIL = queries.register("user_by_email", """
+    SELECT id, email, pwd_hash, role, username, is_verified
+    FROM users
+    WHERE email=%s
+""")
+
+def get_user_by_email(email: str, cur=None):
+    with DB(cur) as cur:
+        queries.execute(cur, USER_BY_EMAIL, (email,))
         return cur.fetchone()
 
-def get_user_by_id(user_id: int):
-    with DB() as cur:
+def get_user_by_id(user_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT
                 id,
@@ -63,21 +63,23 @@ def get_user_by_id(user_id: int):
         """, (user_id,))
         return cur.fetchone()
 
-def create_user_with_verify(email: str, username: str, pw_plain: str, *, ttl_minutes=30):
+def create_user_with_verify(email: str, username: str, pwd_hash: str, *, ttl_minutes=30, cur=None):
+    """Insert an unverified student. pwd_hash is computed by the caller, before any pool checkout
+    (hashing can wait in the bounded hash pool)."""
     token = secrets.token_urlsafe(32)
     expires = datetime.now(timezone.utc) + timedelta(minutes=ttl_minutes)
-    with DB() as cur:
+    with DB(cur) as cur:
         cur.execute("""
             INSERT INTO users(email, pwd_hash, role, username, is_verified, verify_token, verify_expires)
             VALUES (%s, %s, 'student', %s, false, %s, %s)
             RETURNING id
-        """, (email, hash_password(pw_plain), username, token, expires))
+        """, (email, pwd_hash, username, token, expires))
         uid = cur.fetchone()[0]
     return uid, token, expires
 
-def consume_verify_token(token: str) -> bool:
+def consume_verify_token(token: str, cur=None) -> bool:
     now = datetime.now(timezone.utc)
-    with DB() as cur:
+    with DB(cur) as cur:
         cur.execute("""
             SELECT id, verify_expires FROM users WHERE verify_token=%s
         """, (token,))
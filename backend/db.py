@@ -1,22 +1,233 @@
 import os
-from psycopg2.pool import SimpleConnectionPool
+import threading
+import time
+import psycopg2
+from psycopg2.extensions import cursor as _BaseCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from dotenv import load_dotenv
 
+from . import queries
+
 load_dotenv()
 
 PG_DSN = f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} password={os.getenv('POSTGRES_PASSWORD')} host={os.getenv('POSTGRES_HOST')} port={os.getenv('POSTGRES_PORT')}"
 
-pool = SimpleConnectionPool(minconn=1, maxconn=10, dsn=PG_DSN)
+# 요청마다 checkout 하나를 응답까지 잡는다 (app.get_db): 동시에 처리할 요청 수 = POSTGRES_POOL_MAX
+POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+POOL_WAIT_S = float(os.getenv("POSTGRES_POOL_WAIT_S", "10"))
+
+
+class BlockingPool:
+    """Thread-safe pool whose getconn waits up to wait_s for a connection to come back
+    (then raises PoolError) instead of failing as soon as maxconn are checked out."""
+    def __init__(self, minconn: int, maxconn: int, dsn: str, wait_s: float):
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn=dsn)
+        self._free = threading.BoundedSemaphore(maxconn)
+        self.wait_s = wait_s
+    def getconn(self, block=True):
+        acquired = self._free.acquire(timeout=self.wait_s) if block else self._free.acquire(blocking=False)
+        if not acquired:
+            raise PoolError("connection pool exhausted")
+        try:
+            return self._pool.getconn()
+        except BaseException:
+            self._free.release()
+            raise
+    def putconn(self, conn, close=False):
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._free.release()
+
+
+pool = BlockingPool(1, POOL_MAX, PG_DSN, POOL_WAIT_S)
+
+# 읽기 전용 복제본 (스트리밍 복제). 비어 있으면 ReadDB도 primary를 쓴다
+REPLICA_DSN = os.getenv("POSTGRES_REPLICA_DSN", "")
+replica_pool = BlockingPool(0, POOL_MAX, REPLICA_DSN, POOL_WAIT_S) if REPLICA_DSN else None
+
+# read-your-writes: 사용자별 마지막 쓰기 직후의 primary WAL 위치는 write_positions 테이블에 둔다
+# (어느 API 프로세스에서 썼든 다른 프로세스의 읽기가 본다)
+WRITE_POSITION = queries.register("write_position", "SELECT lsn::text FROM write_positions WHERE user_id = %s")
+
+# Instrumentation hooks (see backend/instrumentation.py). Empty lists cost one truthiness check.
+#   checkout_hooks: fn()                       -- called on every DB() pool checkout
+#   query_hooks:    fn(sql: str, seconds: float) -- called after every execute/executemany
+checkout_hooks = []
+query_hooks = []
+
+
+class HookedCursor(_BaseCursor):
+    def execute(self, query, vars=None):
+        if not query_hooks:
+            return super().execute(query, vars)
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _run_query_hooks(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        if not query_hooks:
+            return super().executemany(query, vars_list)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _run_query_hooks(query, time.perf_counter() - start)
+
+
+def _run_query_hooks(query, seconds):
+    sql = query.decode("utf-8", "replace") if isinstance(query, bytes) else str(query)
+    for hook in query_hooks:
+        hook(sql, seconds)
+
 
 class DB:
+    """Pool checkout + one transaction. Pass an open cursor to reuse it instead
+    (no checkout, commit/rollback left to the owner of that cursor).
+
+    track_writes: after a successful commit, record the primary's WAL position
+    for the user set with set_writer() (write_positions), so that user's ReadDB
+    reads, in any API process, wait for it."""
+    def __init__(self, cur=None, track_writes=False):
+        self.outer = cur
+        self.track_writes = track_writes
     def __enter__(self):
+        if self.outer is not None:
+            return self.outer
+        for hook in checkout_hooks:
+            hook()
         self.conn = pool.getconn()
-        self.cur = self.conn.cursor()
+        self.cur = self.conn.cursor(cursor_factory=HookedCursor)
         return self.cur
     def __exit__(self, exc_type, exc, tb):
+        if self.outer is not None:
+            return
         if exc:
             self.conn.rollback()
         else:
             self.conn.commit()
+            if self.track_writes and replica_pool is not None and getattr(self.cur, "writer_id", None):
+                _remember_write(self.cur)
+        self.cur.close()
+        pool.putconn(self.conn)
+
+
+def set_writer(cur, user_id: int):
+    """Attribute the transaction on `cur` (a DB() cursor) to user_id for read-your-writes."""
+    cur.writer_id = user_id
+
+
+def _remember_write(cur):
+    # 커밋 뒤의 insert 위치 >= 방금 커밋 레코드의 끝. 같은 사용자의 요청이 겹쳐도 큰 값을 남긴다
+    cur.execute("""
+      INSERT INTO write_positions AS w (user_id, lsn) VALUES (%s, pg_current_wal_insert_lsn())
+      ON CONFLICT (user_id) DO UPDATE SET lsn = GREATEST(w.lsn, EXCLUDED.lsn)
+    """, (cur.writer_id,))
+    cur.connection.commit()
+
+
+def _forget_write(user_id: int, replayed: str):
+    """Delete user_id's write position once the replica has replayed it.
+
+    Only that user's row, in its own short transaction: the request's transaction stays open
+    until the response is built, and a row lock held there would make concurrent readers and
+    that user's next write wait. Skipped when the pool is empty; a replayed row left behind
+    changes nothing (prune_write_positions clears those)."""
+    try:
+        conn = pool.getconn(block=False)  # 요청이 이미 연결 하나를 잡고 있다: 기다리면 교착될 수 있다
+    except PoolError:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM write_positions WHERE user_id = %s AND lsn <= %s::pg_lsn", (user_id, replayed))
+        conn.commit()
+    except psycopg2.Error:
+        conn.rollback()
+    finally:
+        pool.putconn(conn)
+
+
+def prune_write_positions() -> int:
+    """Delete every write position the replica has replayed (users who wrote and did not read
+    again). Without a replica none of them are needed."""
+    replayed = None
+    if replica_pool is not None:
+        conn = replica_pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_last_wal_replay_lsn()::text")  # 승격된 복제본이면 NULL: 모두 지운다
+                replayed = cur.fetchone()[0]
+            conn.rollback()
+        finally:
+            replica_pool.putconn(conn)
+    with DB() as cur:
+        if replayed is None:
+            cur.execute("DELETE FROM write_positions")
+        else:
+            cur.execute("DELETE FROM write_positions WHERE lsn <= %s::pg_lsn", (replayed,))
+        return cur.rowcount
+
+
+class ReadDB:
+    """Checkout for read-only work: the replica when it has replayed user_id's last
+    write (tracked by DB(track_writes=True)), else the primary. Also falls back to the
+    primary when there is no replica, or it is unreachable or no longer in recovery.
+    The transaction is always rolled back. Like DB, an open cursor is reused as is.
+
+    fallback: an open primary cursor (the request's) to use instead of checking out
+    a second primary connection when the replica cannot serve the read."""
+    def __init__(self, cur=None, user_id: int | None = None, fallback=None):
+        self.outer = cur
+        self.user_id = user_id
+        self.fallback = fallback
+    def __enter__(self):
+        if self.outer is not None:
+            return self.outer
+        replica = self._replica()
+        if replica is None and self.fallback is not None:
+            self.outer = self.fallback  # 이 트랜잭션은 fallback의 주인이 마무리한다
+            return self.outer
+        for hook in checkout_hooks:
+            hook()
+        self.pool = replica or pool
+        if self.pool is pool:
+            self.conn = pool.getconn()
+        self.cur = self.conn.cursor(cursor_factory=HookedCursor)
+        return self.cur
+    def _replica(self):
+        if replica_pool is None:
+            return None
+        need = None
+        if self.user_id is not None:
+            with DB(self.fallback) as cur:
+                queries.execute(cur, WRITE_POSITION, (self.user_id,))
+                row = cur.fetchone()
+            need = row[0] if row else None
+        try:
+            conn = replica_pool.getconn(block=False)  # 다 쓰고 있으면 기다리지 않고 primary로
+        except psycopg2.Error:
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_last_wal_replay_lsn()::text, COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, false)",
+                            (need or "0/0",))
+                replayed, caught_up = cur.fetchone()
+            conn.rollback()
+        except psycopg2.Error:
+            replica_pool.putconn(conn, close=True)  # 복제본 재시작 등으로 끊긴 연결
+            return None
+        if not caught_up:
+            replica_pool.putconn(conn)
+            return None
+        if need is not None:
+            _forget_write(self.user_id, replayed)
+        self.conn = conn
+        return replica_pool
+    def __exit__(self, exc_type, exc, tb):
+        if self.outer is not None:
+            return
+        self.conn.rollback()
         self.cur.close()
-        pool.putconn(self.conn)
\ No newline at end of file
+        self.pool.putconn(self.conn)
@@ -0,0 +1,157 @@
+"""Password hashing off the API's request threads.
+
+pbkdf2 is pure CPU work: run inline, every login ties up a threadpool thread
+and competes with all other requests for the API process's cores, so a
+class logging in at once slows down everything. Hashes are computed in a
+small process pool instead (OJ_HASH_WORKERS processes; 0 = inline). At most
+OJ_HASH_MAX_PENDING hashes may be queued or running; beyond that callers get
+HashBusy right away (the API answers 503 + Retry-After) instead of piling up.
+
+OJ_PWD_PBKDF2_ROUNDS sets the cost of new hashes. Hashes made with fewer
+rounds still verify, and verify_and_update returns a replacement hash so
+login can upgrade them transparently (lowering the setting never rehashes).
+
+This module is imported by the pool's worker processes, so it must not pull
+in backend.db (which opens connections at import time).
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+ROUNDS = int(os.getenv("OJ_PWD_PBKDF2_ROUNDS", "29000"))  # passlib 기본값
+WORKERS = int(os.getenv("OJ_HASH_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("OJ_HASH_MAX_PENDING", "32"))
+
+pwd_ctx = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=ROUNDS,
+    pbkdf2_sha256__min_rounds=ROUNDS,  # 이보다 적은 라운드의 해시는 needs_update -> 로그인 때 재해시
+)
+
+
+class HashBusy(Exception):
+    pass
+
+
+def _hash(pw: str) -> str:
+    return pwd_ctx.hash(pw)
+
+
+def _verify_and_update(pw: str, hashed: str):
+    return pwd_ctx.verify_and_update(pw, hashed)
+
+
+_pool: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+_inflight = 0
+_metrics = None
+
+
+def _get_metrics():
+    global _metrics
+    if _metrics is None:
+        from backend import instrumentation  # 부모(API) 프로세스에서만
+
+        _metrics = False
+        if instrumentation.ENABLED:
+            from prometheus_client import Counter, Gauge, Histogram
+
+            _metrics = (
+                Histogram("oj_password_hash_seconds", "Password hash time incl. pool wait", ["op"],
+                          buckets=instrumentation.LATENCY_BUCKETS),
+                Gauge("oj_password_hash_inflight", "Password hashes queued or running"),
+                Counter("oj_password_hash_rejected_total", "Password hashes refused (pool full)"),
+            )
+    return _metrics
+
+
+def _watch_parent(parent_pid: int):
+    # 풀 프로세스끼리 작업 큐 파이프를 나눠 가지므로 API가 죽어도 EOF가 오지 않는다 -> 직접 확인
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # fork는 API의 스레드/DB 커넥션까지 복제하므로 spawn
+        _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_watch_parent, initargs=(os.getpid(),))
+    return _pool
+
+
+def _submit(op: str, fn, *args) -> Future:
+    global _inflight
+    metrics = _get_metrics()
+    with _lock:
+        if _inflight >= MAX_PENDING:
+            if metrics:
+                metrics[2].inc()
+            raise HashBusy("password hashing is busy")
+        _inflight += 1
+        pool = _get_pool() if WORKERS > 0 else None
+    if metrics:
+        metrics[1].inc()
+    start = time.perf_counter()
+
+    def done(_):
+        global _inflight
+        with _lock:
+            _inflight -= 1
+        if metrics:
+            metrics[1].dec()
+            metrics[0].labels(op=op).observe(time.perf_counter() - start)
+
+    if pool is None:
+        fut = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+    else:
+        try:
+            fut = pool.submit(fn, *args)
+        except Exception:
+            done(None)
+            raise
+    fut.add_done_callback(done)
+    return fut
+
+
+def hash_password(pw: str) -> str:
+    return _submit("hash", _hash, pw).result()
+
+
+def verify_and_update(pw: str, hashed: str):
+    """(ok, new_hash or None). new_hash is set when the stored hash is below the configured cost."""
+    return _submit("verify", _verify_and_update, pw, hashed).result()
+
+
+async def hash_password_async(pw: str) -> str:
+    """Like hash_password, without holding a threadpool thread while the pool works."""
+    return await asyncio.wrap_future(_submit("hash", _hash, pw))
+
+
+async def verify_and_update_async(pw: str, hashed: str):
+    """Like verify_and_update, without holding a threadpool thread while the pool works."""
+    return await asyncio.wrap_future(_submit("verify", _verify_and_update, pw, hashed))
+
+
+
+def shutdown():
+    """Stop the pool (API shutdown; uvicorn re-raises SIGTERM, so atexit cleanup never runs)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
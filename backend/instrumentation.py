@@ -0,0 +1,220 @@
+"""Opt-in request/DB instrumentation for the API.
+
+Enable with OJ_INSTRUMENT=1. When on:
+
+- every request is timed and recorded per route template in Prometheus
+  histograms (latency, DB queries, DB time, pool checkouts), served at /metrics;
+- responses carry a `Server-Timing` header with the request's DB totals;
+- queries slower than OJ_SLOW_QUERY_MS are logged with their SQL (no params);
+- routes listed in OJ_PROFILE_ROUTES (comma-separated route templates, e.g.
+  `/teacher/classes/{class_id}/submissions`) are profiled for a sampled
+  fraction of requests (OJ_PROFILE_SAMPLE, default 0.01) with pyinstrument
+  if installed, cProfile otherwise; reports go to OJ_PROFILE_DIR.
+
+Metrics are per process; with several uvicorn workers scrape each one or
+use prometheus_client's multiprocess mode.
+"""
+import contextlib
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from pathlib import Path
+
+from backend import db
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("OJ_INSTRUMENT", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("OJ_SLOW_QUERY_MS", "200"))
+PROFILE_ROUTES = {r.strip() for r in os.getenv("OJ_PROFILE_ROUTES", "").split(",") if r.strip()}
+PROFILE_SAMPLE = float(os.getenv("OJ_PROFILE_SAMPLE", "0.01"))
+PROFILE_DIR = Path(os.getenv("OJ_PROFILE_DIR", "/tmp/oj-profiles"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "checkouts")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.checkouts = 0
+
+
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("oj_request_stats", default=None)
+_route: contextvars.ContextVar[str] = contextvars.ContextVar("oj_request_route", default="-")
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+def _on_checkout():
+    stats = _current.get()
+    if stats is not None:
+        stats.checkouts += 1
+
+
+def _on_query(sql: str, seconds: float):
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "slow query %.1fms route=%s sql=%s",
+            seconds * 1000, _route.get(), re.sub(r"\s+", " ", sql).strip()[:2000],
+        )
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware: cheaper than BaseHTTPMiddleware and keeps streaming intact."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        stats_token = _current.set(stats)
+        route_token = _route.set(scope.get("path", "-"))
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries/{stats.checkouts} checkouts"'.encode(),
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            self.metrics.observe(scope.get("method", "-"), template, status_code, elapsed, stats)
+            _route.reset(route_token)
+            _current.reset(stats_token)
+
+
+class _Metrics:
+    def __init__(self):
+        from prometheus_client import Histogram
+
+        labels = ["method", "route"]
+        self.latency = Histogram(
+            "oj_api_request_seconds", "Request latency by route", labels + ["status"], buckets=LATENCY_BUCKETS,
+        )
+        self.queries = Histogram(
+            "oj_api_db_queries_per_request", "DB statements executed per request", labels, buckets=COUNT_BUCKETS,
+        )
+        self.checkouts = Histogram(
+            "oj_api_db_checkouts_per_request", "DB() pool checkouts per request", labels, buckets=COUNT_BUCKETS,
+        )
+        self.db_seconds = Histogram(
+            "oj_api_db_seconds_per_request", "Time spent in DB statements per request", labels, buckets=LATENCY_BUCKETS,
+        )
+
+    def observe(self, method, route, status_code, elapsed, stats):
+        self.latency.labels(method=method, route=route, status=str(status_code)).observe(elapsed)
+        self.queries.labels(method=method, route=route).observe(stats.queries)
+        self.checkouts.labels(method=method, route=route).observe(stats.checkouts)
+        self.db_seconds.labels(method=method, route=route).observe(stats.db_seconds)
+
+
+# ---------- 샘플링 프로파일 ----------
+@contextlib.contextmanager
+def _profile(route_path: str):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = re.sub(r"[^A-Za-z0-9]+", "_", route_path).strip("_") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            out = PROFILE_DIR / f"{stem}-{stamp}.html"
+            out.write_text(profiler.output_html())
+            logger.info("profile saved route=%s file=%s", route_path, out)
+        return
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        out = PROFILE_DIR / f"{stem}-{stamp}.prof"
+        prof.dump_stats(out)
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(15)
+        logger.info("profile saved route=%s file=%s\n%s", route_path, out, buf.getvalue())
+
+
+def _profiled(route_path: str, fn):
+    # 프로파일러는 현재 스레드만 본다 → 엔드포인트 함수 자체를 감싸야 threadpool 안에서 측정된다
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if random.random() >= PROFILE_SAMPLE:
+                return await fn(*args, **kwargs)
+            with _profile(route_path):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if random.random() >= PROFILE_SAMPLE:
+            return fn(*args, **kwargs)
+        with _profile(route_path):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def install(app):
+    """Attach middleware, DB hooks, /metrics and route profiling. Call after all routes are declared."""
+    if not ENABLED:
+        return False
+    from fastapi.routing import APIRoute
+    from prometheus_client import make_asgi_app
+
+    db.checkout_hooks.append(_on_checkout)
+    db.query_hooks.append(_on_query)
+    app.add_middleware(InstrumentationMiddleware, metrics=_Metrics())
+    app.mount("/metrics", make_asgi_app())
+
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path in PROFILE_ROUTES:
+            # get_request_handler는 요청 시점에 dependant.call을 읽으므로 교체가 반영된다
+            route.dependant.call = _profiled(route.path, route.dependant.call)
+    missing = PROFILE_ROUTES - {getattr(r, "path", None) for r in app.routes}
+    if missing:
+        logger.warning("OJ_PROFILE_ROUTES has unknown routes: %s", ", ".join(sorted(missing)))
+    return True
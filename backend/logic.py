@@ -1,78 +1,259 @@
+import re
 import secrets
 import string
+from psycopg2.extras import Json
+from . import queries
 from .db import DB
 
-def list_problems():
-    with DB() as cur:
+def list_problems(cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT p.id, p.slug, p.title, p.difficulty
             FROM problems p
             WHERE NOT EXISTS (
                 SELECT 1 FROM class_problems cp WHERE cp.problem_id = p.id
-            )
+            ) AND p.deleted_at IS NULL
             ORDER BY p.id DESC
         """)
         return [dict(id=r[0], slug=r[1], title=r[2], difficulty=r[3]) for r in cur.fetchall()]
 
-def get_problem(pid: int):
-    with DB() as cur:
-        cur.execute("SELECT id, slug, title, difficulty, statement_md, starter_code FROM problems WHERE id=%s", (pid,))
+# 공개 카탈로그 = 어느 반에도 배정되지 않았고 삭제되지 않은 문제
+_CATALOG_SQL = """
+    WITH matches AS {{materialized}} (
+        SELECT p.id, p.slug, p.title, p.difficulty, p.tags, {solved} AS solved, {{rank}} AS rank
+        FROM problems p
+        {solved_join}
+        WHERE p.deleted_at IS NULL
+          AND NOT EXISTS (SELECT 1 FROM class_problems cp WHERE cp.problem_id = p.id)
+          AND {match}
+    )
+"""
+_SOLVED_JOIN = """
+        LEFT JOIN (
+            SELECT DISTINCT problem_id FROM submissions WHERE user_id = %(uid)s AND status = 'accepted'
+        ) s ON s.problem_id = p.id
+"""
+
+def _catalog_match(q: str | None):
+    """(rank SQL, match SQL, params) for the search text.
+
+    Matches word prefixes in title/slug/statement (search_tsv) or a title/slug
+    substring (trigram-indexed when pg_trgm is installed). Rank is a tier, not
+    ts_rank (which reads the whole statement vector of every match): 2 = title/slug
+    contains the text, 1 = title words match, 0 = statement only.
+    """
+    q = (q or "").strip()
+    if not q:
+        return "0", "TRUE", {}
+    words = re.findall(r"\w+", q.lower())[:8]
+    params = {"q_like": "%" + re.sub(r"([%_\\])", r"\\\1", q) + "%"}
+    substring = "(p.title ILIKE %(q_like)s OR p.slug ILIKE %(q_like)s)"
+    if not words:  # 기호만 있는 검색어
+        return "2", substring, params
+    params["q_ts"] = " & ".join(w + ":*" for w in words)
+    params["q_title"] = " & ".join(w + ":*A" for w in words)  # 가중치 A = 제목
+    return (
+        f"CASE WHEN {substring} THEN 2 WHEN p.search_tsv @@ to_tsquery('simple', %(q_title)s) THEN 1 ELSE 0 END",
+        f"(p.search_tsv @@ to_tsquery('simple', %(q_ts)s) OR {substring})",
+        params,
+    )
+
+def search_problems(*, q: str | None = None, difficulties: list[str] | None = None, tags: list[str] | None = None,
+                    solved: bool | None = None, user_id: int | None = None, limit: int = 50,
+                    after: tuple | None = None, with_facets: bool = True, cur=None) -> dict:
+    """One page of the public catalog, plus the total and facet counts (with_facets).
+
+    Ordered by relevance tier when q is given, else by id. `after` is the previous
+    page's `next` (keyset pagination). Each facet counts the matches under the other
+    facets' filters, so the UI can show what switching a filter yields.
+    """
+    rank, match, params = _catalog_match(q)
+    params.update(uid=user_id, difficulties=difficulties, tags=tags, solved=solved, limit=limit + 1)
+    head = _CATALOG_SQL.format(
+        match=match,
+        solved="s.problem_id IS NOT NULL" if user_id is not None else "false",
+        solved_join=_SOLVED_JOIN if user_id is not None else "",
+    )
+    f_diff = "difficulty = ANY(%(difficulties)s)" if difficulties else "TRUE"
+    f_tags = "tags @> %(tags)s::text[]" if tags else "TRUE"
+    f_solved = "solved = %(solved)s" if solved is not None else "TRUE"
+    keyset = "TRUE"
+    if after is not None:
+        params.update(after_rank=after[0], after_id=after[1])
+        keyset = "(rank < %(after_rank)s OR (rank = %(after_rank)s AND id > %(after_id)s))"
+    result = {"items": [], "next": None}
+    with DB(cur) as cur:
+        cur.execute(head.format(rank=rank, materialized="NOT MATERIALIZED") + f"""
+            SELECT id, slug, title, difficulty, tags, solved, rank
+            FROM matches
+            WHERE {f_diff} AND {f_tags} AND {f_solved} AND {keyset}
+            ORDER BY rank DESC, id
+            LIMIT %(limit)s
+        """, params)
+        rows = cur.fetchall()
+        if with_facets:
+            # 매칭은 한 번만 계산 (MATERIALIZED), 패싯마다 자기 필터만 뺀 개수
+            cur.execute(head.format(rank="0", materialized="MATERIALIZED") + f"""
+                SELECT
+                  COUNT(*) FILTER (WHERE difficulty = 'easy' AND {f_tags} AND {f_solved}),
+                  COUNT(*) FILTER (WHERE difficulty = 'medium' AND {f_tags} AND {f_solved}),
+                  COUNT(*) FILTER (WHERE difficulty = 'hard' AND {f_tags} AND {f_solved}),
+                  COUNT(*) FILTER (WHERE solved AND {f_diff} AND {f_tags}),
+                  COUNT(*) FILTER (WHERE NOT solved AND {f_diff} AND {f_tags}),
+                  COUNT(*) FILTER (WHERE {f_diff} AND {f_tags} AND {f_solved}),
+                  (SELECT COALESCE(json_agg(t ORDER BY t.count DESC, t.tag), '[]')
+                   FROM (SELECT tag, SUM(n)::int AS count
+                         -- 태그 조합별로 먼저 세면 unnest가 문제 수가 아니라 조합 수만큼만 돈다
+                         FROM (SELECT tags, COUNT(*) AS n FROM matches
+                               WHERE {f_diff} AND {f_solved} GROUP BY tags) g, unnest(g.tags) AS tag
+                         GROUP BY tag
+                         ORDER BY count DESC, tag
+                         LIMIT 50) t)
+                FROM matches
+            """, params)
+            easy, medium, hard, n_solved, n_unsolved, total, tag_counts = cur.fetchone()
+            result["total"] = total
+            result["facets"] = {"difficulty": {"easy": easy, "medium": medium, "hard": hard}, "tags": tag_counts}
+            if user_id is not None:
+                result["facets"]["solved"] = {"solved": n_solved, "unsolved": n_unsolved}
+    result["items"] = [
+        {"id": r[0], "slug": r[1], "title": r[2], "difficulty": r[3], "tags": r[4],
+         "solved": r[5] if user_id is not None else None}
+        for r in rows[:limit]
+    ]
+    # next: 다음 페이지의 after (이 페이지 마지막 항목의 rank, id)
+    if len(rows) > limit:
+        result["next"] = (rows[limit - 1][6], rows[limit - 1][0])
+    return result
+
+def get_problem(pid: int, cur=None):
+    with DB(cur) as cur:
+        cur.execute("SELECT id, slug, title, difficulty, statement_md, starter_code, languages FROM problems WHERE id=%s AND deleted_at IS NULL", (pid,))
         row = cur.fetchone()
         if not row: return None
         cur.execute("SELECT idx, input_text, expected_text FROM testcases WHERE problem_id=%s AND is_public=TRUE ORDER BY idx", (pid,))
         pub_tcs = [{"idx": r[0], "input_text": r[1], "expected_text": r[2]} for r in cur.fetchall()]
         return {
             "id": row[0], "slug": row[1], "title": row[2], "difficulty": row[3],
-            "statement_md": row[4], "starter_code": row[5], "public_samples": pub_tcs
+            "statement_md": row[4], "starter_code": row[5], "languages": row[6], "public_samples": pub_tcs
         }
 
-def create_problem(data, author_id=None):
-    with DB() as cur:
+def create_problem(data, author_id=None, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
-          INSERT INTO problems(slug, title, difficulty, statement_md, starter_code, created_by)
-          VALUES (%s,%s,%s,%s,%s,%s) RETURNING id
-        """, (data.slug, data.title, data.difficulty, data.statement_md, getattr(data, "starter_code", None), author_id))
+          INSERT INTO problems(slug, title, difficulty, statement_md, starter_code, languages, python_tier,
+                               checker, checker_args, checker_source, interactor_source, turn_timeout_ms, schedule, tags,
+                               created_by)
+          VALUES (%s,%s,%s,%s,%s,COALESCE(%s, ARRAY['python']),COALESCE(%s, 'cpython'),
+                  COALESCE(%s, 'exact'),%s,%s,%s,%s,COALESCE(%s, 'idx'),COALESCE(%s, '{}'::text[]),%s) RETURNING id
+        """, (data.slug, data.title, data.difficulty, data.statement_md, getattr(data, "starter_code", None),
+              getattr(data, "languages", None), getattr(data, "python_tier", None),
+              getattr(data, "checker", None), Json(getattr(data, "checker_args", None) or {}),
+              getattr(data, "checker_source", None), getattr(data, "interactor_source", None) or None,
+              getattr(data, "turn_timeout_ms", None), getattr(data, "schedule", None),
+              getattr(data, "tags", None), author_id))
         return cur.fetchone()[0]
 
-def add_testcase(data):
-    with DB() as cur:
+def add_testcase(data, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
           INSERT INTO testcases(problem_id, idx, input_text, expected_text, timeout_ms, points, is_public)
           VALUES (%s,%s,%s,%s,%s,%s,%s) RETURNING id
         """, (data.problem_id, data.idx, data.input_text, data.expected_text, data.timeout_ms, data.points, data.is_public))
         return cur.fetchone()[0]
 
-def create_submission(user_id: int, data):
-    with DB() as cur:
+def create_submission(user_id: int, data, compile_output: str | None = None, cur=None):
+    """Queue a submission. Returns None when the problem does not accept data.language.
+
+    With compile_output (syntax error found at submit time) the row is stored
+    already finished as compile_error and never reaches a worker.
+    """
+    with DB(cur) as cur:
         cur.execute("""
-          INSERT INTO submissions(user_id, problem_id, language, source_code)
-          VALUES (%s,%s,'python',%s) RETURNING id
-        """, (user_id, data.problem_id, data.source_code))
-        return cur.fetchone()[0]
+          INSERT INTO submissions(user_id, problem_id, language, source_code, python_tier,
+                                  status, compile_output, finished_at)
+          SELECT %(uid)s, p.id, %(lang)s, %(src)s, %(tier)s,
+                 CASE WHEN %(out)s::text IS NULL THEN 'queued' ELSE 'compile_error' END,
+                 %(out)s, CASE WHEN %(out)s::text IS NULL THEN NULL ELSE NOW() END
+          FROM problems p
+          WHERE p.id=%(pid)s AND %(lang)s = ANY(p.languages)
+          RETURNING id
+        """, {"uid": user_id, "pid": data.problem_id, "lang": data.language, "src": data.source_code,
+              "tier": getattr(data, "python_tier", None), "out": compile_output})
+        row = cur.fetchone()
+        return row[0] if row else None
 
-def get_submission(sid: int):
-    with DB() as cur:
+def get_run_problem(problem_id: int, cur=None):
+    """What the run lane needs: language/tier/checker settings and the public samples."""
+    with DB(cur) as cur:
+        cur.execute("""
+          SELECT languages, python_tier, checker, checker_args, checker_source, interactor_source
+          FROM problems WHERE id=%s AND deleted_at IS NULL
+        """, (problem_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        cur.execute("""
+          SELECT idx, input_text, expected_text, timeout_ms
+          FROM testcases WHERE problem_id=%s AND is_public=true
+          ORDER BY idx
+        """, (problem_id,))
+        samples = [{"idx": r[0], "input_text": r[1], "expected_text": r[2], "timeout_ms": r[3]} for r in cur.fetchall()]
+        return {"languages": row[0], "python_tier": row[1], "checker": row[2], "checker_args": row[3],
+                "checker_source": row[4], "interactor_source": row[5], "samples": samples}
+
+def get_submission(sid: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("SELECT id, status, score, time_ms, created_at, finished_at FROM submissions WHERE id=%s", (sid,))
         row = cur.fetchone()
         if not row: return None
         return {"id": row[0], "status": row[1], "score": row[2], "time_ms": row[3], "created_at": row[4], "finished_at": row[5]}
 
-def list_submission_results(sid: int):
-    with DB() as cur:
-        cur.execute("""
-          SELECT tr.testcase_id, tr.verdict, tr.time_ms, tr.stdout, tr.stderr, tc.idx
-          FROM submission_results tr
-          JOIN testcases tc ON tc.id = tr.testcase_id
-          WHERE tr.submission_id=%s
-          ORDER BY tc.idx
-        """, (sid,))
+# 제출 직후 클라이언트가 계속 폴링하는 조회들 (backend/queries.py)
+SUBMISSION_STATUS = queries.register("submission_status", """
+    SELECT id, status, score, time_ms, created_at, finished_at, user_id, language, compile_output
+    FROM submissions
+    WHERE id=%s
+""")
+SUBMISSION_RESULTS = queries.register("submission_results", """
+    SELECT tc.idx, tr.verdict, tr.time_ms, tr.stdout, tr.stderr, tr.tier, tr.full_output IS NOT NULL
+    FROM submission_results tr
+    JOIN testcases tc ON tc.id = tr.testcase_id
+    WHERE tr.submission_id=%s
+    ORDER BY tc.idx
+""")
+USER_PROBLEM_SUBMISSIONS = queries.register("user_problem_submissions", """
+    SELECT id, status, score, time_ms, created_at, finished_at
+    FROM submissions
+    WHERE user_id=%s AND problem_id=%s
+    ORDER BY created_at DESC
+    LIMIT %s
+""")
+USER_SOLVED_PROBLEM = queries.register("user_solved_problem", """
+    SELECT 1
+    FROM submissions
+    WHERE user_id=%s AND problem_id=%s AND status='accepted'
+    LIMIT 1
+""")
+
+def get_submission_status(sid: int, cur=None):
+    """(id, status, score, time_ms, created_at, finished_at, user_id, language, compile_output) or None."""
+    with DB(cur) as cur:
+        queries.execute(cur, SUBMISSION_STATUS, (sid,))
+        return cur.fetchone()
+
+def list_submission_results(sid: int, cur=None):
+    """Per-testcase results; stdout/stderr are previews, full_output tells whether the whole output was kept."""
+    with DB(cur) as cur:
+        queries.execute(cur, SUBMISSION_RESULTS, (sid,))
         return [
-            {"testcase_id": r[0], "verdict": r[1], "time_ms": r[2], "stdout": r[3], "stderr": r[4], "idx": r[5]}
+            {"idx": r[0], "verdict": r[1], "time_ms": r[2], "stdout": r[3], "stderr": r[4], "tier": r[5],
+             "full_output": r[6]}
             for r in cur.fetchall()
         ]
 
-def list_submissions_for_student(student_id: int):
-    with DB() as cur:
+def list_submissions_for_student(student_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
           SELECT id, problem_id, status, score, time_ms, created_at, finished_at
           FROM submissions
@@ -92,8 +273,8 @@ def list_submissions_for_student(student_id: int):
             for r in cur.fetchall()
         ]
 
-def teacher_can_access_student(teacher_id: int, student_id: int) -> bool:
-    with DB() as cur:
+def teacher_can_access_student(teacher_id: int, student_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute(
             """
             SELECT
@@ -112,8 +293,8 @@ def teacher_can_access_student(teacher_id: int, student_id: int) -> bool:
         row = cur.fetchone()
         return bool(row[0]) if row else False
 
-def assign_student_to_teacher(teacher_id: int, student_id: int):
-    with DB() as cur:
+def assign_student_to_teacher(teacher_id: int, student_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
           INSERT INTO teacher_students(teacher_id, student_id)
           VALUES (%s,%s)
@@ -124,8 +305,8 @@ def _generate_class_code() -> str:
     alphabet = string.ascii_uppercase + string.digits
     return "".join(secrets.choice(alphabet) for _ in range(6))
 
-def create_class(name: str, description: str | None, creator_id: int):
-    with DB() as cur:
+def create_class(name: str, description: str | None, creator_id: int, cur=None):
+    with DB(cur) as cur:
         code = _generate_class_code()
         while True:
             cur.execute("SELECT 1 FROM classes WHERE code=%s", (code,))
@@ -144,8 +325,8 @@ def create_class(name: str, description: str | None, creator_id: int):
         """, (class_id, creator_id))
         return {"id": class_id, "code": code}
 
-def list_classes_for_teacher(teacher_id: int):
-    with DB() as cur:
+def list_classes_for_teacher(teacher_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT c.id, c.name, c.code, c.description, c.created_at,
                    COALESCE(st.count, 0) AS student_count
@@ -156,7 +337,7 @@ def list_classes_for_teacher(teacher_id: int):
                 FROM class_students
                 GROUP BY class_id
             ) st ON st.class_id = c.id
-            WHERE ct.teacher_id=%s
+            WHERE ct.teacher_id=%s AND c.deleted_at IS NULL
             ORDER BY c.created_at DESC
         """, (teacher_id,))
         return [
@@ -171,13 +352,13 @@ def list_classes_for_teacher(teacher_id: int):
             for r in cur.fetchall()
         ]
 
-def list_classes_for_student(student_id: int):
-    with DB() as cur:
+def list_classes_for_student(student_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT c.id, c.name, c.code, c.description, c.created_at
             FROM classes c
             JOIN class_students cs ON cs.class_id = c.id
-            WHERE cs.student_id=%s
+            WHERE cs.student_id=%s AND c.deleted_at IS NULL
             ORDER BY c.created_at DESC
         """, (student_id,))
         return [
@@ -191,12 +372,12 @@ def list_classes_for_student(student_id: int):
             for r in cur.fetchall()
         ]
 
-def get_class(class_id: int):
-    with DB() as cur:
+def get_class(class_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT id, code, name, description, created_by, created_at
             FROM classes
-            WHERE id=%s
+            WHERE id=%s AND deleted_at IS NULL
         """, (class_id,))
         row = cur.fetchone()
         if not row:
@@ -210,55 +391,55 @@ def get_class(class_id: int):
             "created_at": row[5],
         }
 
-def teacher_in_class(teacher_id: int, class_id: int) -> bool:
-    with DB() as cur:
+def teacher_in_class(teacher_id: int, class_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute(
             "SELECT 1 FROM class_teachers WHERE class_id=%s AND teacher_id=%s",
             (class_id, teacher_id),
         )
         return cur.fetchone() is not None
 
-def student_in_class(student_id: int, class_id: int) -> bool:
-    with DB() as cur:
+def student_in_class(student_id: int, class_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute(
             "SELECT 1 FROM class_students WHERE class_id=%s AND student_id=%s",
             (class_id, student_id),
         )
         return cur.fetchone() is not None
 
-def add_teacher_to_class(class_id: int, teacher_id: int):
-    with DB() as cur:
+def add_teacher_to_class(class_id: int, teacher_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             INSERT INTO class_teachers(class_id, teacher_id)
             VALUES (%s,%s)
             ON CONFLICT (class_id, teacher_id) DO NOTHING
         """, (class_id, teacher_id))
 
-def add_student_to_class(class_id: int, student_id: int):
-    with DB() as cur:
+def add_student_to_class(class_id: int, student_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             INSERT INTO class_students(class_id, student_id)
             VALUES (%s,%s)
             ON CONFLICT (class_id, student_id) DO NOTHING
         """, (class_id, student_id))
 
-def class_has_problem(class_id: int, problem_id: int) -> bool:
-    with DB() as cur:
+def class_has_problem(class_id: int, problem_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute("""
             SELECT 1 FROM class_problems WHERE class_id=%s AND problem_id=%s
         """, (class_id, problem_id))
         return cur.fetchone() is not None
 
-def add_problem_to_class(class_id: int, problem_id: int, assigned_by: int | None):
-    with DB() as cur:
+def add_problem_to_class(class_id: int, problem_id: int, assigned_by: int | None, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             INSERT INTO class_problems(class_id, problem_id, assigned_by)
             VALUES (%s,%s,%s)
             ON CONFLICT (class_id, problem_id) DO NOTHING
         """, (class_id, problem_id, assigned_by))
 
-def list_class_students(class_id: int):
-    with DB() as cur:
+def list_class_students(class_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT u.id, u.email, u.username, u.is_verified
             FROM class_students cs
@@ -276,8 +457,8 @@ def list_class_students(class_id: int):
             for r in cur.fetchall()
         ]
 
-def list_class_teachers(class_id: int):
-    with DB() as cur:
+def list_class_teachers(class_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT u.id, u.email, u.username
             FROM class_teachers ct
@@ -294,8 +475,8 @@ def list_class_teachers(class_id: int):
             for r in cur.fetchall()
         ]
 
-def list_class_problems(class_id: int):
-    with DB() as cur:
+def list_class_problems(class_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT p.id, p.slug, p.title, p.difficulty, cp.assigned_at, cp.assigned_by, u.username, u.email
             FROM class_problems cp
@@ -317,8 +498,8 @@ def list_class_problems(class_id: int):
             for r in cur.fetchall()
         ]
 
-def list_class_submissions(class_id: int):
-    with DB() as cur:
+def list_class_submissions(class_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT s.id, s.status, s.score, s.time_ms, s.created_at, s.finished_at,
                    u.id, u.username, u.email,
@@ -349,8 +530,8 @@ def list_class_submissions(class_id: int):
             for r in cur.fetchall()
         ]
 
-def list_class_submissions_for_student(class_id: int, student_id: int):
-    with DB() as cur:
+def list_class_submissions_for_student(class_id: int, student_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("""
             SELECT s.id, s.problem_id, p.title, p.slug,
                    s.status, s.score, s.time_ms, s.created_at, s.finished_at,
@@ -379,14 +560,14 @@ def list_class_submissions_for_student(class_id: int, student_id: int):
             for r in cur.fetchall()
         ]
 
-def store_problem_testcases(problem_id: int, testcases: list[dict], *, replace_existing: bool):
-    with DB() as cur:
+def store_problem_testcases(problem_id: int, testcases: list[dict], *, replace_existing: bool, cur=None):
+    with DB(cur) as cur:
         if replace_existing:
             cur.execute("DELETE FROM testcases WHERE problem_id=%s", (problem_id,))
         for case in testcases:
             cur.execute("""
-                INSERT INTO testcases(problem_id, idx, input_text, expected_text, timeout_ms, points, is_public)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
+                INSERT INTO testcases(problem_id, idx, input_text, expected_text, timeout_ms, points, is_public, group_idx)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
             """, (
                 problem_id,
                 case["idx"],
@@ -395,15 +576,196 @@ def store_problem_testcases(problem_id: int, testcases: list[dict], *, replace_e
                 case["timeout_ms"],
                 case["points"],
                 case["is_public"],
+                case.get("group"),
             ))
 
-def problem_class_ids(problem_id: int):
-    with DB() as cur:
+def rebuild_testcase_stats(cur=None) -> int:
+    """Recompute testcase_stats from all of submission_results (the worker keeps it up to date incrementally)."""
+    with DB(cur) as cur:
+        cur.execute("""
+            WITH cleared AS (DELETE FROM testcase_stats)
+            INSERT INTO testcase_stats(testcase_id, runs, fails, total_ms)
+            SELECT testcase_id, COUNT(*), COUNT(*) FILTER (WHERE verdict <> 'ok'), COALESCE(SUM(time_ms), 0)
+            FROM submission_results
+            WHERE verdict NOT IN ('skipped', 'se')
+            GROUP BY testcase_id
+        """)
+        return cur.rowcount
+
+def prune_outputs(days: int, batch: int = 5000) -> int:
+    """Drop stored output of results older than `days` whose submission was superseded
+    (the same user submitted the same problem again). Runs in committed batches."""
+    total = 0
+    while True:
+        with DB() as cur:
+            cur.execute("""
+                WITH doomed AS (
+                    SELECT r.id
+                    FROM submission_results r
+                    JOIN submissions s ON s.id = r.submission_id
+                    WHERE s.finished_at < NOW() - make_interval(days => %s)
+                      AND (r.stdout IS NOT NULL OR r.stderr IS NOT NULL OR r.full_output IS NOT NULL)
+                      AND EXISTS (
+                          SELECT 1 FROM submissions n
+                          WHERE n.user_id = s.user_id AND n.problem_id = s.problem_id AND n.id > s.id
+                      )
+                    LIMIT %s
+                )
+                UPDATE submission_results r
+                SET stdout = NULL, stderr = NULL, full_output = NULL
+                FROM doomed WHERE r.id = doomed.id
+            """, (days, batch))
+            n = cur.rowcount
+        total += n
+        if n < batch:
+            return total
+
+def list_testcase_groups(problem_id: int, cur=None):
+    with DB(cur) as cur:
+        cur.execute("""
+            SELECT g.idx, g.name, g.points, g.scoring, g.depends_on,
+                   (SELECT COUNT(*) FROM testcases t WHERE t.problem_id=g.problem_id AND t.group_idx=g.idx) AS testcases
+            FROM testcase_groups g
+            WHERE g.problem_id=%s
+            ORDER BY g.idx
+        """, (problem_id,))
+        return [
+            dict(idx=r[0], name=r[1], points=r[2], scoring=r[3], depends_on=r[4], testcases=r[5])
+            for r in cur.fetchall()
+        ]
+
+def replace_testcase_groups(problem_id: int, groups: list[dict], cur=None):
+    with DB(cur) as cur:
+        cur.execute("DELETE FROM testcase_groups WHERE problem_id=%s", (problem_id,))
+        for group in groups:
+            cur.execute("""
+                INSERT INTO testcase_groups(problem_id, idx, name, points, scoring, depends_on)
+                VALUES (%s,%s,%s,%s,%s,%s)
+            """, (problem_id, group["idx"], group["name"], group["points"], group["scoring"], group["depends_on"]))
+
+_CONTEST_COLUMNS = """
+    id, class_id, title, starts_at, ends_at, freeze_at, unfrozen, scoring, penalty_minutes, version, created_at
+"""
+
+def _contest_row(r):
+    return {"id": r[0], "class_id": r[1], "title": r[2], "starts_at": r[3], "ends_at": r[4], "freeze_at": r[5],
+            "unfrozen": r[6], "scoring": r[7], "penalty_minutes": r[8], "version": r[9], "created_at": r[10]}
+
+def create_contest(class_id: int, data, creator_id: int, cur=None):
+    """Create a contest over problems of the class (labelled A, B, ... in the given order).
+
+    Returns None if a problem is not assigned to the class. Submissions already
+    made inside the window (contest created after its start) are scored right away.
+    """
+    with DB(cur) as cur:
+        cur.execute("""
+            SELECT COUNT(*) FROM class_problems WHERE class_id=%s AND problem_id = ANY(%s)
+        """, (class_id, data.problems))
+        if cur.fetchone()[0] != len(data.problems):
+            return None
+        cur.execute("""
+            INSERT INTO contests(class_id, title, starts_at, ends_at, freeze_at, scoring, penalty_minutes, created_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (class_id, data.title, data.starts_at, data.ends_at, data.freeze_at, data.scoring,
+              data.penalty_minutes, creator_id))
+        contest_id = cur.fetchone()[0]
+        cur.executemany(
+            "INSERT INTO contest_problems(contest_id, problem_id, label) VALUES (%s, %s, %s)",
+            [(contest_id, pid, chr(ord("A") + i)) for i, pid in enumerate(data.problems)],
+        )
+        rebuild_contest_scores(contest_id, cur=cur)
+        return contest_id
+
+CONTEST = queries.register("contest", f"SELECT {_CONTEST_COLUMNS} FROM contests WHERE id=%s")  # 스코어보드 폴링마다
+
+def get_contest(contest_id: int, cur=None):
+    with DB(cur) as cur:
+        queries.execute(cur, CONTEST, (contest_id,))
+        r = cur.fetchone()
+        return _contest_row(r) if r else None
+
+def list_contests(class_id: int, cur=None):
+    with DB(cur) as cur:
+        cur.execute(f"SELECT {_CONTEST_COLUMNS} FROM contests WHERE class_id=%s ORDER BY starts_at DESC", (class_id,))
+        return [_contest_row(r) for r in cur.fetchall()]
+
+def list_contest_problems(contest_id: int, cur=None):
+    with DB(cur) as cur:
+        cur.execute("""
+            SELECT cp.problem_id, cp.label, p.title
+            FROM contest_problems cp JOIN problems p ON p.id = cp.problem_id
+            WHERE cp.contest_id=%s
+            ORDER BY cp.label
+        """, (contest_id,))
+        return [{"problem_id": r[0], "label": r[1], "title": r[2]} for r in cur.fetchall()]
+
+def unfreeze_contest(contest_id: int, cur=None):
+    with DB(cur) as cur:
+        cur.execute("UPDATE contests SET unfrozen=true, version=version+1 WHERE id=%s", (contest_id,))
+
+def rebuild_contest_scores(contest_id: int | None = None, cur=None) -> int:
+    """Recompute every scoreboard cell of one contest (or all) from submissions. Returns cells recomputed."""
+    with DB(cur) as cur:
+        cur.execute("DELETE FROM contest_scores WHERE %(cid)s::bigint IS NULL OR contest_id=%(cid)s", {"cid": contest_id})
+        # 제출이 있는 (학생, 문제) 칸만 다시 계산
+        cur.execute("""
+            SELECT refresh_contest_score(c.id, st.student_id, cp.problem_id)
+            FROM contests c
+            JOIN contest_problems cp ON cp.contest_id = c.id
+            JOIN class_students st ON st.class_id = c.class_id
+            WHERE (%(cid)s::bigint IS NULL OR c.id=%(cid)s)
+              AND EXISTS (
+                SELECT 1 FROM submissions s
+                WHERE s.user_id = st.student_id AND s.problem_id = cp.problem_id
+                  AND s.created_at >= c.starts_at AND s.created_at < c.ends_at
+              )
+        """, {"cid": contest_id})
+        n = cur.rowcount
+        cur.execute("UPDATE contests SET version=version+1 WHERE %(cid)s::bigint IS NULL OR id=%(cid)s", {"cid": contest_id})
+        return n
+
+def list_workers(cur=None):
+    """Registered judge workers with the number of submissions each is judging right now."""
+    with DB(cur) as cur:
+        cur.execute("""
+            SELECT w.id, w.host, w.pid, w.slots, w.languages, w.state, w.started_at, w.heartbeat_at,
+                   EXTRACT(EPOCH FROM NOW() - w.heartbeat_at),
+                   (SELECT COUNT(*) FROM submissions s WHERE s.status='running' AND s.claimed_by = w.id)
+            FROM workers w
+            ORDER BY w.id
+        """)
+        return [
+            {"id": r[0], "host": r[1], "pid": r[2], "slots": r[3], "languages": r[4], "state": r[5],
+             "started_at": r[6], "heartbeat_at": r[7], "heartbeat_age_s": float(r[8]), "busy": r[9]}
+            for r in cur.fetchall()
+        ]
+
+def queue_stats(cur=None):
+    with DB(cur) as cur:
+        cur.execute("""
+            SELECT COUNT(*) FILTER (WHERE status='queued'),
+                   COUNT(*) FILTER (WHERE status='running'),
+                   EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE status='queued'))
+            FROM submissions
+            WHERE status IN ('queued','running')
+        """)
+        queued, running, oldest = cur.fetchone()
+        return {"queued": queued, "running": running, "oldest_queued_s": float(oldest) if oldest is not None else None}
+
+def set_worker_state(worker_id: str, state: str, cur=None) -> bool:
+    """'draining' stops the worker from claiming (in-flight work finishes); 'active' resumes it."""
+    with DB(cur) as cur:
+        cur.execute("UPDATE workers SET state=%s WHERE id=%s", (state, worker_id))
+        return cur.rowcount > 0
+
+def problem_class_ids(problem_id: int, cur=None):
+    with DB(cur) as cur:
         cur.execute("SELECT class_id FROM class_problems WHERE problem_id=%s", (problem_id,))
         return [r[0] for r in cur.fetchall()]
 
-def teacher_has_problem_access(teacher_id: int, problem_id: int) -> bool:
-    with DB() as cur:
+def teacher_has_problem_access(teacher_id: int, problem_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute("""
             SELECT 1
             FROM class_teachers ct
@@ -412,8 +774,8 @@ def teacher_has_problem_access(teacher_id: int, problem_id: int) -> bool:
         """, (teacher_id, problem_id))
         return cur.fetchone() is not None
 
-def student_has_problem_access(student_id: int, problem_id: int) -> bool:
-    with DB() as cur:
+def student_has_problem_access(student_id: int, problem_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
         cur.execute("""
             SELECT 1
             FROM class_students cs
@@ -422,58 +784,100 @@ def student_has_problem_access(student_id: int, problem_id: int) -> bool:
         """, (student_id, problem_id))
         return cur.fetchone() is not None
 
-def remove_problem_from_class(class_id: int, problem_id: int):
-    with DB() as cur:
-        cur.execute(
-            "DELETE FROM class_problems WHERE class_id=%s AND problem_id=%s",
-            (class_id, problem_id),
-        )
-        cur.execute(
-            """
-            SELECT 1
-            FROM class_problems
-            WHERE problem_id=%s
-            """,
-            (problem_id,),
-        )
-        if not cur.fetchone():
-            cur.execute(
-                "DELETE FROM submissions WHERE problem_id=%s",
-                (problem_id,),
-            )
-            cur.execute(
-                "DELETE FROM testcases WHERE problem_id=%s",
-                (problem_id,),
-            )
-            cur.execute(
-                "DELETE FROM problems WHERE id=%s",
-                (problem_id,),
+# submission_results.testcase_id는 CASCADE가 아니라서 problems를 한 문장으로 지우려면
+# 결과 행을 같은 문장의 CTE에서 먼저 지워야 한다 (FK 검사는 문장 끝에 수행됨).
+_PURGE_PROBLEMS_TAIL = """
+    , results AS (
+        DELETE FROM submission_results r
+        USING submissions s
+        WHERE r.submission_id = s.id AND s.problem_id IN (SELECT problem_id FROM doomed)
+    )
+    DELETE FROM problems WHERE id IN (SELECT problem_id FROM doomed)
+"""
+
+def remove_problem_from_class(class_id: int, problem_id: int, *, deferred: bool = False, cur=None):
+    """Unlink a problem from a class; delete it (or mark it for purge_deleted) if no class uses it anymore."""
+    params = {"cid": class_id, "pid": problem_id}
+    with DB(cur) as cur:
+        if deferred:
+            cur.execute("""
+                WITH unlinked AS (
+                    DELETE FROM class_problems WHERE class_id=%(cid)s AND problem_id=%(pid)s
+                    RETURNING problem_id
+                )
+                UPDATE problems p SET deleted_at=NOW()
+                FROM unlinked u
+                WHERE p.id = u.problem_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM class_problems o WHERE o.problem_id=u.problem_id AND o.class_id<>%(cid)s
+                  )
+            """, params)
+            return
+        cur.execute("""
+            WITH unlinked AS (
+                DELETE FROM class_problems WHERE class_id=%(cid)s AND problem_id=%(pid)s
+                RETURNING problem_id
+            ), doomed AS (
+                SELECT u.problem_id
+                FROM unlinked u
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM class_problems o WHERE o.problem_id=u.problem_id AND o.class_id<>%(cid)s
+                )
             )
+        """ + _PURGE_PROBLEMS_TAIL, params)
+
+def delete_class(class_id: int, *, deferred: bool = False, cur=None):
+    """Delete a class and every problem only it used, in one statement.
 
-def delete_class(class_id: int):
-    with DB() as cur:
-        cur.execute("SELECT problem_id FROM class_problems WHERE class_id=%s", (class_id,))
-        problem_ids = [r[0] for r in cur.fetchall()]
-        cur.execute("DELETE FROM classes WHERE id=%s", (class_id,))
-        for pid in problem_ids:
-            cur.execute(
-                "SELECT 1 FROM class_problems WHERE problem_id=%s",
-                (pid,),
+    With deferred=True the class and its orphaned problems are only marked
+    (deleted_at) and hidden; purge_deleted() removes them later.
+    """
+    params = {"cid": class_id}
+    with DB(cur) as cur:
+        if deferred:
+            cur.execute("""
+                WITH gone AS (
+                    UPDATE classes SET deleted_at=NOW() WHERE id=%(cid)s AND deleted_at IS NULL
+                )
+                UPDATE problems p SET deleted_at=NOW()
+                FROM class_problems cp
+                WHERE cp.class_id=%(cid)s AND p.id = cp.problem_id AND p.deleted_at IS NULL
+                  AND NOT EXISTS (
+                      SELECT 1
+                      FROM class_problems o
+                      JOIN classes oc ON oc.id = o.class_id
+                      WHERE o.problem_id=p.id AND o.class_id<>%(cid)s AND oc.deleted_at IS NULL
+                  )
+            """, params)
+            return
+        cur.execute("""
+            WITH doomed AS (
+                SELECT cp.problem_id
+                FROM class_problems cp
+                WHERE cp.class_id=%(cid)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM class_problems o WHERE o.problem_id=cp.problem_id AND o.class_id<>%(cid)s
+                  )
+            ), gone AS (
+                DELETE FROM classes WHERE id=%(cid)s
             )
-            if not cur.fetchone():
-                cur.execute("DELETE FROM submissions WHERE problem_id=%s", (pid,))
-                cur.execute("DELETE FROM testcases WHERE problem_id=%s", (pid,))
-                cur.execute("DELETE FROM problems WHERE id=%s", (pid,))
+        """ + _PURGE_PROBLEMS_TAIL, params)
 
-def list_user_submissions_for_problem(user_id: int, problem_id: int, limit: int = 10):
-    with DB() as cur:
+def purge_deleted(cur=None) -> int:
+    """Hard-delete soft-deleted classes and problems. Returns the number of problems removed."""
+    with DB(cur) as cur:
         cur.execute("""
-            SELECT id, status, score, time_ms, created_at, finished_at
-            FROM submissions
-            WHERE user_id=%s AND problem_id=%s
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, (user_id, problem_id, limit))
+            WITH doomed AS (
+                SELECT id AS problem_id FROM problems WHERE deleted_at IS NOT NULL
+            ), gone AS (
+                DELETE FROM classes WHERE deleted_at IS NOT NULL
+            )
+        """ + _PURGE_PROBLEMS_TAIL)
+        return cur.rowcount
+
+def list_user_submissions_for_problem(user_id: int, problem_id: int, limit: int = 10, cur=None):
+    with DB(cur) as cur:
+        queries.execute(cur, USER_PROBLEM_SUBMISSIONS, (user_id, problem_id, limit))
         return [
             {
                 "id": r[0],
@@ -486,32 +890,42 @@ def list_user_submissions_for_problem(user_id: int, problem_id: int, limit: int
             for r in cur.fetchall()
         ]
 
-def user_solved_problem(user_id: int, problem_id: int) -> bool:
-    with DB() as cur:
-        cur.execute("""
-            SELECT 1
-            FROM submissions
-            WHERE user_id=%s AND problem_id=%s AND status='accepted'
-            LIMIT 1
-        """, (user_id, problem_id))
+def user_solved_problem(user_id: int, problem_id: int, cur=None) -> bool:
+    with DB(cur) as cur:
+        queries.execute(cur, USER_SOLVED_PROBLEM, (user_id, problem_id))
         return cur.fetchone() is not None
 
-def delete_problem(problem_id: int):
-    with DB() as cur:
-        cur.execute("DELETE FROM problems WHERE id=%s", (problem_id,))
+def delete_problem(problem_id: int, *, deferred: bool = False, cur=None):
+    with DB(cur) as cur:
+        if deferred:
+            cur.execute("""
+                WITH unlinked AS (DELETE FROM class_problems WHERE problem_id=%(pid)s)
+                UPDATE problems SET deleted_at=NOW() WHERE id=%(pid)s
+            """, {"pid": problem_id})
+            return
+        cur.execute("""
+            WITH doomed AS (SELECT %(pid)s::bigint AS problem_id)
+        """ + _PURGE_PROBLEMS_TAIL, {"pid": problem_id})
 
-def update_problem(problem_id: int, **fields):
+def update_problem(problem_id: int, *, cur=None, **fields):
     if not fields:
         return
     columns = []
     params = []
-    for key in ("title", "difficulty", "statement_md", "starter_code"):
+    for key in ("title", "difficulty", "statement_md", "starter_code", "languages", "python_tier",
+                "checker", "checker_args", "checker_source", "interactor_source", "turn_timeout_ms",
+                "schedule", "tags"):
         if key in fields and fields[key] is not None:
             columns.append(f"{key}=%s")
-            params.append(fields[key])
+            if key == "checker_args":
+                params.append(Json(fields[key]))
+            elif key == "interactor_source":
+                params.append(fields[key] or None)  # 빈 문자열 = 인터랙티브 해제
+            else:
+                params.append(fields[key])
     if not columns:
         return
     columns.append("updated_at=NOW()")
     params.append(problem_id)
-    with DB() as cur:
+    with DB(cur) as cur:
         cur.execute(f"UPDATE problems SET {', '.join(columns)} WHERE id=%s", tuple(params))
@@ -0,0 +1,154 @@
+"""Operational tasks for cron / manual runs.
+
+    python -m backend.maintenance purge-deleted
+    python -m backend.maintenance rebuild-testcase-stats
+    python -m backend.maintenance prune-outputs --days 30
+    python -m backend.maintenance partition-tables
+    python -m backend.maintenance ensure-partitions --months-ahead 3
+    python -m backend.maintenance archive-partitions --before 2025-09 --dir /var/backups/oj
+    python -m backend.maintenance restore-archive FILE.csv.gz [...]
+    python -m backend.maintenance rebuild-scoreboards [--contest ID]
+    python -m backend.maintenance prune-write-positions
+
+purge-deleted: hard-deletes classes/problems soft-deleted with
+OJ_DEFERRED_DELETES=1. The API already schedules it after each delete; the
+cron run catches anything left behind by a restart.
+
+rebuild-testcase-stats: recomputes testcase_stats (failfast scheduling) from
+all stored results, e.g. after upgrading a database that already has
+submissions.
+
+prune-outputs: clears stdout/stderr/full_output of results older than --days
+whose submission has since been superseded by a newer one from the same
+user for the same problem. Each student's latest attempt keeps its output.
+Space is reused after autovacuum; run VACUUM FULL only in a maintenance window.
+
+Partitioning (see backend/partitions.py): partition-tables converts a
+database created before submissions were partitioned (one transaction,
+exclusive locks: stop the API and workers). ensure-partitions should run
+monthly from cron. archive-partitions writes each month before --before to
+<dir>/<partition>.csv.gz and drops it; restore-archive loads files back
+(submissions_* before submission_results_*).
+
+rebuild-scoreboards: recomputes contest_scores from submissions (all
+contests, or one), e.g. after a rejudge or after restoring an archive.
+
+prune-write-positions: deletes the read-your-writes positions the replica has
+already replayed (backend/db.py). Each user's own row goes at their next read;
+this clears the rows of users who wrote and did not read again. Run it from
+cron every few minutes when POSTGRES_REPLICA_DSN is set.
+"""
+import argparse
+import sys
+from datetime import date
+
+from backend import db, logic, partitions
+
+
+def cmd_purge_deleted(args) -> int:
+    n = logic.purge_deleted()
+    print(f"purged {n} problem(s)")
+    return 0
+
+
+def cmd_rebuild_testcase_stats(args) -> int:
+    n = logic.rebuild_testcase_stats()
+    print(f"rebuilt stats for {n} testcase(s)")
+    return 0
+
+
+def cmd_prune_outputs(args) -> int:
+    n = logic.prune_outputs(args.days, args.batch)
+    print(f"pruned output of {n} result(s)")
+    return 0
+
+
+def cmd_partition_tables(args) -> int:
+    n = partitions.migrate_to_partitioned(args.months_ahead)
+    print(f"copied {n} row(s) into partitioned tables")
+    return 0
+
+
+def cmd_ensure_partitions(args) -> int:
+    for name in partitions.ensure_partitions(args.months_ahead):
+        print(f"created {name}")
+    return 0
+
+
+def cmd_archive_partitions(args) -> int:
+    for path in partitions.archive_partitions(args.before, args.dir):
+        print(f"archived {path}")
+    return 0
+
+
+def cmd_restore_archive(args) -> int:
+    for path in args.files:
+        print(f"restored {path} into {partitions.restore_archive(path)}")
+    return 0
+
+
+def cmd_rebuild_scoreboards(args) -> int:
+    n = logic.rebuild_contest_scores(args.contest)
+    print(f"rebuilt {n} scoreboard cell(s)")
+    return 0
+
+
+def cmd_prune_write_positions(args) -> int:
+    n = db.prune_write_positions()
+    print(f"pruned {n} write position(s)")
+    return 0
+
+
+def _month(value: str) -> date:
+    try:
+        year, month = value.split("-")[:2]
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("purge-deleted", help="hard-delete soft-deleted classes and problems")
+    p.set_defaults(func=cmd_purge_deleted)
+
+    p = sub.add_parser("rebuild-testcase-stats", help="recompute testcase_stats from submission_results")
+    p.set_defaults(func=cmd_rebuild_testcase_stats)
+
+    p = sub.add_parser("prune-outputs", help="clear stored output of old, superseded submissions")
+    p.add_argument("--days", type=int, default=30, help="only results finished more than this many days ago")
+    p.add_argument("--batch", type=int, default=5000, help="rows per transaction")
+    p.set_defaults(func=cmd_prune_outputs)
+
+    p = sub.add_parser("partition-tables", help="convert submissions/submission_results to monthly partitions")
+    p.add_argument("--months-ahead", type=int, default=3)
+    p.set_defaults(func=cmd_partition_tables)
+
+    p = sub.add_parser("ensure-partitions", help="create upcoming monthly partitions")
+    p.add_argument("--months-ahead", type=int, default=3)
+    p.set_defaults(func=cmd_ensure_partitions)
+
+    p = sub.add_parser("archive-partitions", help="dump and drop monthly partitions older than --before")
+    p.add_argument("--before", type=_month, required=True, help="YYYY-MM; months before this are archived")
+    p.add_argument("--dir", required=True, help="directory for <partition>.csv.gz files")
+    p.set_defaults(func=cmd_archive_partitions)
+
+    p = sub.add_parser("restore-archive", help="load archived partitions back for auditing")
+    p.add_argument("files", nargs="+")
+    p.set_defaults(func=cmd_restore_archive)
+
+    p = sub.add_parser("rebuild-scoreboards", help="recompute contest_scores from submissions")
+    p.add_argument("--contest", type=int, help="only this contest")
+    p.set_defaults(func=cmd_rebuild_scoreboards)
+
+    p = sub.add_parser("prune-write-positions", help="delete read-your-writes positions the replica has replayed")
+    p.set_defaults(func=cmd_prune_write_positions)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
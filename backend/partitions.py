@@ -0,0 +1,213 @@
+"""Monthly partitions of submissions / submission_results and their archival.
+
+Both tables are range-partitioned by the submission's created_at
+(submission_results carries it as submission_created_at). Monthly
+partitions are named `<table>_pYYYYMM`; rows outside every monthly range go
+to `<table>_default`. Queries for recent data then only touch small
+partitions, and old terms can be archived one month at a time.
+
+- ensure_partitions: create this month's and the next N months' partitions
+  (cron, monthly) so the default partition stays empty.
+- archive_partitions: COPY each month older than a cutoff to
+  `<dir>/<partition>.csv.gz`, then detach and drop it.
+- restore_archive: load such a file back into its monthly partition (audit).
+- migrate_to_partitioned: one-off conversion of pre-partitioning tables.
+"""
+import gzip
+import os
+import re
+from datetime import date
+from pathlib import Path
+
+from backend.db import DB
+
+# (부모 테이블, 파티션 키). 아카이브/복원 순서: 보관은 자식 먼저, 복원은 부모 먼저
+TABLES = (("submissions", "created_at"), ("submission_results", "submission_created_at"))
+INIT_SQL = Path(__file__).resolve().parent / "sql" / "init.sql"
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(cur) -> bool:
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE relname = 'submissions' AND relnamespace = 'public'::regnamespace")
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def monthly_partitions(cur, table: str) -> dict[date, str]:
+    """Existing monthly partitions of table: {month start: partition name}."""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (table,))
+    months = {}
+    for (name,) in cur.fetchall():
+        m = _MONTH_SUFFIX.search(name)
+        if m:
+            months[date(int(m.group(1)), int(m.group(2)), 1)] = name
+    return months
+
+
+def _create_month(cur, table: str, key: str, month: date) -> str | None:
+    """Create one monthly partition. None if the default partition already holds rows in its range."""
+    name = partition_name(table, month)
+    lo, hi = month, add_months(month, 1)
+    # 기본 파티션에 같은 범위 행이 있으면 CREATE가 실패하므로 건너뛴다 (그 달은 default에 남음)
+    cur.execute(f"SELECT 1 FROM {table}_default WHERE {key} >= %s AND {key} < %s LIMIT 1", (lo, hi))
+    if cur.fetchone():
+        return None
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)", (lo, hi))
+    return name
+
+
+def ensure_partitions(months_ahead: int = 3, today: date | None = None, cur=None) -> list[str]:
+    """Create missing monthly partitions from the current month through months_ahead. Returns new names."""
+    first = month_start(today or date.today())
+    created = []
+    with DB(cur) as cur:
+        if not is_partitioned(cur):
+            raise RuntimeError("submissions is not partitioned; run `python -m backend.maintenance partition-tables` first")
+        for table, key in TABLES:
+            existing = monthly_partitions(cur, table)
+            for n in range(months_ahead + 1):
+                month = add_months(first, n)
+                if month in existing:
+                    continue
+                name = _create_month(cur, table, key, month)
+                if name:
+                    created.append(name)
+    return created
+
+
+def _copy_out(cur, partition: str, path: str):
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wb") as f:
+        cur.copy_expert(f"COPY {partition} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def archive_partitions(before: date, out_dir: str) -> list[str]:
+    """Dump and drop every monthly partition whose month starts before `before`. Returns written files.
+
+    Each partition is its own transaction: the file is fully written before
+    the partition is detached and dropped.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    with DB() as cur:
+        months = sorted({m for table, _ in TABLES for m in monthly_partitions(cur, table) if m < month_start(before)})
+    for month in months:
+        for table, _ in reversed(TABLES):  # 결과 먼저 (FK)
+            with DB() as cur:
+                name = monthly_partitions(cur, table).get(month)
+                if name is None:
+                    continue
+                path = os.path.join(out_dir, f"{name}.csv.gz")
+                _copy_out(cur, name, path)
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                cur.execute(f"DROP TABLE {name}")
+            written.append(path)
+    return written
+
+
+def restore_archive(path: str) -> str:
+    """Load `<table>_pYYYYMM.csv.gz` back into its monthly partition. Restore submissions before results."""
+    base = os.path.basename(path).removesuffix(".csv.gz")
+    m = _MONTH_SUFFIX.search(base)
+    table = base[: m.start()] if m else None
+    keys = dict(TABLES)
+    if table not in keys:
+        raise ValueError(f"not an archive file name: {path}")
+    month = date(int(m.group(1)), int(m.group(2)), 1)
+    with DB() as cur:
+        name = monthly_partitions(cur, table).get(month) or _create_month(cur, table, keys[table], month)
+        if name is None:
+            raise RuntimeError(f"{table}_default already holds rows for {month:%Y-%m}")
+        with gzip.open(path, "rb") as f:
+            header = f.readline().decode("utf-8").strip()
+            f.seek(0)
+            cur.copy_expert(f"COPY {name} ({header}) FROM STDIN WITH (FORMAT csv, HEADER)", f)
+    return name
+
+
+def migrate_to_partitioned(months_ahead: int = 3) -> int:
+    """Convert plain submissions / submission_results tables in place. Returns rows copied.
+
+    Runs in one transaction holding ACCESS EXCLUSIVE locks on both tables, so
+    stop the API and workers first. Indexes and the default partitions are
+    recreated by re-running init.sql at the end.
+    """
+    with DB() as cur:
+        if is_partitioned(cur):
+            return 0
+        cur.execute("LOCK TABLE submissions, submission_results IN ACCESS EXCLUSIVE MODE")
+        for table, _ in TABLES:
+            cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        for table, key in TABLES:
+            cur.execute(f"""
+                CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                PARTITION BY RANGE ({key})
+            """)
+            cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+            # 시퀀스 소유권을 새 테이블로 옮겨야 예전 테이블을 지울 때 같이 지워지지 않는다
+            cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (f"{table}_old",))
+            cur.execute(f"ALTER SEQUENCE {cur.fetchone()[0]} OWNED BY {table}.id")
+
+        cur.execute("SELECT MIN(created_at), MAX(created_at) FROM submissions_old")
+        lo, hi = cur.fetchone()
+        if lo is not None:
+            month, last = month_start(lo.date()), add_months(month_start(date.today()), months_ahead)
+            while month <= max(last, month_start(hi.date())):
+                for table, key in TABLES:
+                    _create_month(cur, table, key, month)
+                month = add_months(month, 1)
+
+        cur.execute("INSERT INTO submissions SELECT * FROM submissions_old")
+        copied = cur.rowcount
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'submission_results_old' AND table_schema = 'public'
+            ORDER BY ordinal_position
+        """)
+        cols = [r[0] for r in cur.fetchall()]
+        select = ", ".join("s.created_at" if c == "submission_created_at" else f"r.{c}" for c in cols)
+        cur.execute(f"""
+            INSERT INTO submission_results ({", ".join(cols)})
+            SELECT {select}
+            FROM submission_results_old r JOIN submissions_old s ON s.id = r.submission_id
+        """)
+        copied += cur.rowcount
+
+        cur.execute("DROP TABLE submission_results_old, submissions_old")
+        cur.execute("""
+            ALTER TABLE submissions
+              ADD PRIMARY KEY (id, created_at),
+              ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+              ADD FOREIGN KEY (problem_id) REFERENCES problems(id) ON DELETE CASCADE
+        """)
+        cur.execute("""
+            ALTER TABLE submission_results
+              ALTER COLUMN submission_created_at SET NOT NULL,
+              ADD PRIMARY KEY (id, submission_created_at),
+              ADD FOREIGN KEY (testcase_id) REFERENCES testcases(id),
+              ADD FOREIGN KEY (submission_id, submission_created_at)
+                  REFERENCES submissions(id, created_at) ON DELETE CASCADE
+        """)
+        cur.execute(INIT_SQL.read_text(encoding="utf-8"))  # 인덱스 재생성 (IF NOT EXISTS)
+    return copied
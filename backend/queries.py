@@ -0,0 +1,142 @@
+"""Hot statements as server-side prepared statements.
+
+psycopg2 interpolates parameters on the client and sends plain SQL text, so
+Postgres parses, analyses and plans the submission status lookup (and the
+access facts, the login user lookup, ...) again on every poll. For these
+short queries that is a good part of their cost. Statements registered here
+are PREPAREd on a connection the first time they run on it and then run with
+EXECUTE, which skips parsing and lets Postgres reuse the plan.
+
+    SUBMISSION_STATUS = queries.register("submission_status", "SELECT ... WHERE id=%s")
+    queries.execute(cur, SUBMISSION_STATUS, (sid,))
+
+SQL uses psycopg2 placeholders (all %s, or all %(name)s), so the same text runs
+unprepared with OJ_PREPARED_STATEMENTS=0 (needed behind a transaction-pooling
+pgbouncer, where the session that prepared a statement is not the one that
+executes it). Parameter types are inferred by Postgres; add casts where they
+cannot be (`%(langs)s::text[] IS NULL`).
+
+Calls and time per statement are counted per API process (GET /admin/queries)
+and, with OJ_INSTRUMENT=1, exported as oj_db_statement_seconds.
+"""
+import os
+import re
+import threading
+import time
+import weakref
+
+PREPARE = os.getenv("OJ_PREPARED_STATEMENTS", "1") == "1"
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+class Statement:
+    __slots__ = ("name", "sql", "prepare_sql", "execute_sql", "params")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.params: list[str] | None = None  # 이름 있는 자리표시자면 $n 순서대로의 이름
+        count = 0
+
+        def number(m):
+            nonlocal count
+            if m.group(0) == "%%":
+                return "%"
+            if m.group(1) is None:
+                count += 1
+                return f"${count}"
+            if self.params is None:
+                self.params = []
+            if m.group(1) not in self.params:
+                self.params.append(m.group(1))
+            return f"${self.params.index(m.group(1)) + 1}"
+
+        body = _PLACEHOLDER.sub(number, sql)
+        if count and self.params:
+            raise ValueError(f"statement {name}: mixes %s and %(name)s placeholders")
+        n = len(self.params) if self.params else count
+        self.prepare_sql = f"PREPARE oj_{name} AS {body}"
+        self.execute_sql = f"EXECUTE oj_{name}" + (f"({', '.join(['%s'] * n)})" if n else "")
+
+
+_registry: dict[str, Statement] = {}
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()  # connection -> 준비된 이름들
+_prepared_lock = threading.Lock()
+_stats: dict[str, list] = {}  # name -> [calls, seconds, max_seconds, prepares]
+_stats_lock = threading.Lock()
+_metrics = None
+
+
+def register(name: str, sql: str) -> Statement:
+    if name in _registry:
+        raise ValueError(f"statement {name} is already registered")
+    stmt = _registry[name] = Statement(name, sql)
+    _stats[name] = [0, 0.0, 0.0, 0]
+    return stmt
+
+
+def _get_metrics():
+    global _metrics
+    if _metrics is None:
+        from backend import instrumentation
+
+        _metrics = False
+        if instrumentation.ENABLED:
+            from prometheus_client import Counter, Histogram
+
+            _metrics = (
+                Histogram("oj_db_statement_seconds", "Registered statement execution time", ["statement"],
+                          buckets=(0.0005, 0.001, 0.0025, 0.005) + instrumentation.LATENCY_BUCKETS),
+                Counter("oj_db_statement_prepares_total", "PREPAREs issued (new connection or statement)",
+                        ["statement"]),
+            )
+    return _metrics
+
+
+def execute(cur, stmt: Statement, params=()):
+    """Run stmt on cur (PREPAREing it on cur's connection first if needed)."""
+    prepared = False
+    if PREPARE:
+        conn = cur.connection
+        names = _prepared.get(conn)
+        if names is None:
+            with _prepared_lock:
+                names = _prepared.setdefault(conn, set())
+        if stmt.name not in names:
+            # PREPARE는 트랜잭션과 무관하게 세션 끝까지 남는다 (롤백돼도)
+            cur.execute(stmt.prepare_sql)
+            names.add(stmt.name)
+            prepared = True
+        sql = stmt.execute_sql
+        args = [params[p] for p in stmt.params] if stmt.params else params
+    else:
+        sql, args = stmt.sql, params
+    start = time.perf_counter()
+    try:
+        cur.execute(sql, args)
+    finally:
+        seconds = time.perf_counter() - start
+        with _stats_lock:
+            s = _stats[stmt.name]
+            s[0] += 1
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+            s[3] += prepared
+        metrics = _get_metrics()
+        if metrics:
+            metrics[0].labels(statement=stmt.name).observe(seconds)
+            if prepared:
+                metrics[1].labels(statement=stmt.name).inc()
+
+
+def stats() -> list[dict]:
+    """Per-statement totals for this process, most total time first."""
+    with _stats_lock:
+        rows = [(name, *s) for name, s in _stats.items()]
+    return sorted((
+        {"statement": name, "calls": calls, "total_ms": round(seconds * 1000, 3),
+         "mean_ms": round(seconds * 1000 / calls, 3) if calls else None,
+         "max_ms": round(max_s * 1000, 3), "prepares": prepares}
+        for name, calls, seconds, max_s, prepares in rows
+    ), key=lambda r: -r["total_ms"])
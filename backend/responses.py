@@ -0,0 +1,134 @@
+"""JSON encoding and compression for API responses.
+
+FastJSONResponse is the app's default response class: it renders with orjson
+(several times faster than json.dumps on large lists) and falls back to the
+standard library when orjson is not installed. FastAPI still runs handler
+return values through jsonable_encoder and the route's response_model first;
+handlers that build large lists of plain dicts/str/int/datetime values return
+json_response(...) instead, which skips both.
+
+CompressionMiddleware compresses complete JSON/text bodies of at least
+OJ_COMPRESS_MIN_BYTES (0 = off) with brotli when the client accepts it and
+the brotli package is installed, gzip otherwise. Streaming responses pass
+through untouched. ETags of compressed responses become weak (the bytes
+differ from the uncompressed representation).
+
+This module must not import backend.db (bench/serialize_bench.py uses it
+without a database).
+"""
+import gzip
+import json
+import os
+from decimal import Decimal
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성: 없으면 표준 json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성: 없으면 gzip만
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("OJ_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("OJ_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("OJ_BROTLI_QUALITY", "4"))
+_THREAD_BYTES = 64 * 1024  # 이보다 크면 이벤트 루프 밖에서 압축 (zlib/brotli는 GIL을 놓는다)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if hasattr(value, "isoformat"):  # 표준 json 경로의 date/datetime
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, status_code: int = 200, headers: dict | None = None) -> FastJSONResponse:
+    """Serialize a trusted internal value as is: no jsonable_encoder pass, no response_model check."""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or "json" in content_type or "javascript" in content_type
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Pure ASGI, like InstrumentationMiddleware: holds the response start until the body is known."""
+
+    def __init__(self, app, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.min_bytes <= 0:
+            return await self.app(scope, receive, send)
+        encoding = _pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+            held, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(held["headers"]))
+            if (message.get("more_body", False) or len(body) < self.min_bytes
+                    or "content-encoding" in headers or not _compressible(headers.get("content-type", ""))):
+                await send(held)
+                return await send(message)
+            if len(body) >= _THREAD_BYTES:
+                body = await anyio.to_thread.run_sync(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send({**held, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,5 +1,74 @@
-from pydantic import BaseModel, Field
-from typing import List
+import traceback
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Annotated, List
+
+# judge/languages.py 의 LANGUAGES 와 submissions.language CHECK 제약과 일치해야 함
+LANGUAGE_PATTERN = "^(python|pypy|c|cpp|java)$"
+Language = Annotated[str, Field(pattern=LANGUAGE_PATTERN)]
+# judge/languages.py 의 Python 실행 티어 (TIERS)
+PYTHON_TIER_PATTERN = "^(cpython|cpython-fast|pypy)$"
+# judge/checkers.py 의 채점기 종류
+CHECKER_PATTERN = "^(exact|tokens|float|unordered|special)$"
+# idx: 모든 케이스를 idx 순서로, failfast: 실패하기 쉬운 케이스부터 돌리고 첫 실패에서 중단
+SCHEDULE_PATTERN = "^(idx|failfast)$"
+# icpc: 맞힌 문제 수 -> 패널티, score: 문제별 최고 점수 합 -> 그 점수를 받은 시각 합
+CONTEST_SCORING_PATTERN = "^(icpc|score)$"
+
+
+# 파서를 터뜨리는 입력: '-'*200000+'1' 은 MemoryError, 'f'+'()'*100000 은 RecursionError
+_PARSE_ERRORS = (SyntaxError, ValueError, MemoryError, RecursionError)  # ValueError: NUL 바이트
+# 제출 소스 상한 (문자 수)
+MAX_SOURCE_CHARS = 64 * 1024
+
+
+def _check_python(source: str, field: str):
+    try:
+        compile(source, f"{field}.py", "exec")
+    except _PARSE_ERRORS as e:
+        raise ValueError(f"{field} has a syntax error: {e}")
+
+
+def python_syntax_error(source: str) -> str | None:
+    """Compiler-style message if a Python submission does not parse, else None."""
+    try:
+        compile(source, "Main.py", "exec", dont_inherit=True)
+    except _PARSE_ERRORS as e:
+        if isinstance(e, (MemoryError, RecursionError)):
+            return f"{type(e).__name__}: source is too deeply nested to compile\n"
+        return "".join(traceback.format_exception_only(type(e), e))
+    return None
+
+
+def check_checker_source(source: str | None) -> str | None:
+    """Special judge source must be Python defining check(input, expected, output)."""
+    if source is None:
+        return None
+    _check_python(source, "checker_source")
+    if "def check" not in source:
+        raise ValueError("checker_source must define check(input, expected, output)")
+    return source
+
+
+def normalize_tags(tags: list[str] | None) -> list[str] | None:
+    """Catalog tags: lowercase, trimmed, unique, in the given order."""
+    if tags is None:
+        return None
+    out: list[str] = []
+    for tag in tags:
+        tag = tag.strip().lower()
+        if not tag or len(tag) > 40:
+            raise ValueError("tags must be 1-40 characters")
+        if tag not in out:
+            out.append(tag)
+    return out
+
+
+def check_interactor_source(source: str | None) -> str | None:
+    """Interactor: Python run as `interactor.py <input> <expected>`, exit 0 = ok / 1 = wa."""
+    if source:
+        _check_python(source, "interactor_source")
+    return source
 
 class ProblemCreate(BaseModel):
     slug: str
@@ -7,6 +76,25 @@ class ProblemCreate(BaseModel):
     difficulty: str = Field(pattern="^(easy|medium|hard)$")
     statement_md: str
     starter_code: str | None = None
+    languages: List[Language] | None = Field(default=None, min_length=1)  # 기본값: ['python']
+    python_tier: str | None = Field(default=None, pattern=PYTHON_TIER_PATTERN)  # 기본값: cpython
+    checker: str | None = Field(default=None, pattern=CHECKER_PATTERN)  # 기본값: exact
+    checker_args: dict | None = None  # float: {"abs": 1e-6, "rel": 1e-6}
+    checker_source: str | None = None  # special 채점기 코드
+    interactor_source: str | None = None  # 있으면 인터랙티브 문제 (judge/interactive.py)
+    turn_timeout_ms: int | None = Field(default=None, gt=0)  # 인터랙티브: 한 턴 응답 제한
+    schedule: str | None = Field(default=None, pattern=SCHEDULE_PATTERN)  # 기본값: idx
+    tags: list[str] | None = Field(default=None, max_length=20)  # 카탈로그 검색 패싯
+
+    _check_source = field_validator("checker_source")(check_checker_source)
+    _check_interactor = field_validator("interactor_source")(check_interactor_source)
+    _normalize_tags = field_validator("tags")(normalize_tags)
+
+    @model_validator(mode="after")
+    def special_needs_source(self):
+        if self.checker == "special" and not self.checker_source:
+            raise ValueError("checker 'special' requires checker_source")
+        return self
 
 class TestcaseCreate(BaseModel):
     problem_id: int
@@ -16,7 +104,63 @@ class TestcaseCreate(BaseModel):
     timeout_ms: int = 2000
     points: int = 1
     is_public: bool = False
+    group: int | None = None  # testcase_groups.idx
+
+class TestcaseGroup(BaseModel):
+    idx: int
+    name: str | None = None
+    points: int = Field(default=0, ge=0)
+    scoring: str = Field(default="min", pattern="^(min|sum)$")  # min: 전부 맞아야 points, sum: 케이스 points 합
+    depends_on: List[int] = []
+
+class TestcaseGroupsIn(BaseModel):
+    groups: List[TestcaseGroup]
+
+    @model_validator(mode="after")
+    def check_dependencies(self):
+        seen = set()
+        for group in sorted(self.groups, key=lambda g: g.idx):
+            if group.idx in seen:
+                raise ValueError(f"duplicate group idx {group.idx}")
+            # 앞 번호 그룹에만 의존 가능 -> 순환 없음, idx 순서대로 채점하면 됨
+            missing = [d for d in group.depends_on if d not in seen]
+            if missing:
+                raise ValueError(f"group {group.idx} may only depend on earlier groups (got {missing})")
+            seen.add(group.idx)
+        return self
+
+class ContestCreate(BaseModel):
+    title: str = Field(min_length=1, max_length=200)
+    starts_at: datetime
+    ends_at: datetime
+    freeze_at: datetime | None = None  # 이후 제출은 학생 스코어보드에 결과가 안 보임
+    scoring: str = Field(default="icpc", pattern=CONTEST_SCORING_PATTERN)
+    penalty_minutes: int = Field(default=20, ge=0, le=1440)
+    problems: List[int] = Field(min_length=1, max_length=26)  # 순서대로 A, B, ...
+
+    @field_validator("starts_at", "ends_at", "freeze_at")
+    @classmethod
+    def assume_utc(cls, v: datetime | None):
+        # 오프셋 없는 시각은 UTC로 (app._to_iso와 같게). 섞여 오면 비교가 TypeError(500)가 된다
+        if v is not None and v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v
+
+    @model_validator(mode="after")
+    def check_times(self):
+        if self.ends_at <= self.starts_at:
+            raise ValueError("ends_at must be after starts_at")
+        if self.freeze_at is not None and not (self.starts_at <= self.freeze_at <= self.ends_at):
+            raise ValueError("freeze_at must be between starts_at and ends_at")
+        if len(set(self.problems)) != len(self.problems):
+            raise ValueError("duplicate problem in contest")
+        return self
 
 class SubmissionCreate(BaseModel):
     problem_id: int
-    source_code: str  # Python only for MVP
+    source_code: str = Field(max_length=MAX_SOURCE_CHARS)
+    language: Language = "python"  # problems.languages 중 하나
+    python_tier: str | None = Field(default=None, pattern=PYTHON_TIER_PATTERN)  # 없으면 문제 설정을 따름
+
+class RunCreate(SubmissionCreate):
+    stdin: str | None = Field(default=None, max_length=1024 * 1024)  # 없으면 공개 샘플로 실행
@@ -0,0 +1,119 @@
+"""Contest scoreboards served from cached snapshots.
+
+The worker keeps contest_scores (one row per contest, student and problem)
+current when it finalizes a submission and bumps contests.version. A request
+then costs one primary-key read of the contest row: while the version is the
+one a snapshot was built for, the cached JSON bytes (and their ETag) are
+returned as they are, or 304 when the client already has them. A new
+snapshot is built at most once per OJ_SCOREBOARD_MIN_REFRESH_S per contest
+and view, so a burst of verdicts does not turn every poll into a rebuild.
+
+Snapshots are per API process. Two views exist: live, and frozen (student
+view between freeze_at and the teacher's unfreeze), which ranks on the f_*
+columns and only shows how many attempts were made after the freeze.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from backend import logic
+from backend.db import DB
+from backend.responses import dumps
+
+MIN_REFRESH_S = float(os.getenv("OJ_SCOREBOARD_MIN_REFRESH_S", "1"))
+
+_snapshots: dict[tuple[int, bool], tuple[int, float, str, bytes]] = {}  # (contest, frozen) -> (version, built, etag, body)
+_locks: dict[tuple[int, bool], threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def is_frozen(contest: dict, now: datetime | None = None) -> bool:
+    """Whether students currently see the frozen view."""
+    now = now or datetime.now(timezone.utc)
+    return contest["freeze_at"] is not None and now >= contest["freeze_at"] and not contest["unfrozen"]
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _minutes(start, at):
+    return int((at - start).total_seconds() // 60)
+
+
+def build(contest: dict, problems: list[dict], frozen: bool, cur) -> dict:
+    """Rank the class's students from contest_scores."""
+    p = "f_" if frozen else ""
+    cur.execute(f"""
+        SELECT u.id, u.username, cs.problem_id, cs.{p}attempts, cs.{p}wrong, cs.{p}solved_at,
+               cs.{p}best_score, cs.{p}best_at, cs.attempts - cs.f_attempts
+        FROM class_students st
+        JOIN users u ON u.id = st.student_id
+        LEFT JOIN contest_scores cs ON cs.contest_id = %s AND cs.user_id = st.student_id
+        WHERE st.class_id = %s
+    """, (contest["id"], contest["class_id"]))
+    labels = {pr["problem_id"]: pr["label"] for pr in problems}
+    start, icpc = contest["starts_at"], contest["scoring"] == "icpc"
+    users: dict[int, dict] = {}
+    for uid, username, pid, attempts, wrong, solved_at, best_score, best_at, after_freeze in cur.fetchall():
+        row = users.setdefault(uid, {"user_id": uid, "username": username, "solved": 0, "score": 0,
+                                     "penalty": 0, "cells": {}})
+        if pid not in labels:
+            continue
+        cell = {"attempts": attempts}
+        if icpc:
+            cell["solved"] = solved_at is not None
+            if solved_at is not None:
+                cell["minute"] = _minutes(start, solved_at)
+                row["solved"] += 1
+                row["penalty"] += cell["minute"] + wrong * contest["penalty_minutes"]
+        else:
+            cell["score"] = best_score
+            if best_at is not None:
+                cell["minute"] = _minutes(start, best_at)
+                row["score"] += best_score
+                row["penalty"] += cell["minute"]
+        if frozen and after_freeze:
+            cell["pending"] = after_freeze  # 프리즈 뒤 시도 (결과 비공개)
+        row["cells"][labels[pid]] = cell
+
+    def key(r):
+        return (-r["solved"], r["penalty"]) if icpc else (-r["score"], r["penalty"])
+
+    rows = sorted(users.values(), key=lambda r: (key(r), r["username"] or ""))
+    for i, r in enumerate(rows):
+        r["rank"] = rows[i - 1]["rank"] if i and key(rows[i - 1]) == key(r) else i + 1
+    return {
+        "contest": {
+            "id": contest["id"], "title": contest["title"], "scoring": contest["scoring"],
+            "penalty_minutes": contest["penalty_minutes"], "starts_at": _iso(contest["starts_at"]),
+            "ends_at": _iso(contest["ends_at"]), "freeze_at": _iso(contest["freeze_at"]),
+        },
+        "frozen": frozen,
+        "problems": problems,
+        "rows": rows,
+        "version": contest["version"],
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def snapshot(contest: dict, frozen: bool, cur=None) -> tuple[str, bytes]:
+    """(etag, JSON body) of the scoreboard, rebuilt only when contests.version moved on."""
+    key = (contest["id"], frozen)
+    cached = _snapshots.get(key)
+    if cached and (cached[0] == contest["version"] or time.monotonic() - cached[1] < MIN_REFRESH_S):
+        return cached[2], cached[3]
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:  # 같은 스코어보드를 여러 스레드가 동시에 다시 만들지 않도록
+        cached = _snapshots.get(key)
+        if cached and cached[0] >= contest["version"]:
+            return cached[2], cached[3]
+        with DB(cur) as cur:
+            problems = logic.list_contest_problems(contest["id"], cur=cur)
+            board = build(contest, problems, frozen, cur)
+        body = dumps(board)
+        etag = f'"{contest["id"]}-{contest["version"]}-{"f" if frozen else "l"}"'
+        _snapshots[key] = (contest["version"], time.monotonic(), etag, body)
+        return etag, body
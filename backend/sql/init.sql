@@ -20,9 +20,24 @@ CREATE TABLE IF NOT EXISTS problems (
   statement_md TEXT NOT NULL,
   starter_code TEXT,
   languages    TEXT[] NOT NULL DEFAULT ARRAY['python'],
+  python_tier  TEXT NOT NULL DEFAULT 'cpython' CHECK (python_tier IN ('cpython','cpython-fast','pypy')),
+  checker      TEXT NOT NULL DEFAULT 'exact' CHECK (checker IN ('exact','tokens','float','unordered','special')),
+  checker_args JSONB NOT NULL DEFAULT '{}',  -- float: {"abs": 1e-6, "rel": 1e-6}
+  checker_source TEXT,                       -- special 채점기 (Python, check(input, expected, output))
+  interactor_source TEXT,                    -- 인터랙티브 문제의 인터랙터 (Python, exit 0=ok / 1=wa)
+  turn_timeout_ms INT,                       -- 인터랙티브: 한 턴 응답 제한 (NULL이면 testcase timeout_ms)
+  schedule     TEXT NOT NULL DEFAULT 'idx' CHECK (schedule IN ('idx','failfast')),  -- failfast: 실패율 높은 케이스부터, 첫 실패에서 중단
   created_by   BIGINT REFERENCES users(id) ON DELETE CASCADE,
   created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-  updated_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  deleted_at   TIMESTAMPTZ,                -- 지연 삭제 표시 (OJ_DEFERRED_DELETES)
+  tags         TEXT[] NOT NULL DEFAULT '{}', -- 카탈로그 검색 패싯 (소문자)
+  -- 카탈로그 검색: 'simple' 설정 (한국어/영어 섞인 지문이라 형태소 분석 없이 단어 그대로)
+  search_tsv   tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', title), 'A')
+    || setweight(to_tsvector('simple', replace(slug, '-', ' ')), 'B')
+    || setweight(to_tsvector('simple', statement_md), 'C')
+  ) STORED
 );
 
 CREATE TABLE IF NOT EXISTS teacher_students (
@@ -38,7 +53,8 @@ CREATE TABLE IF NOT EXISTS classes (
   name        TEXT NOT NULL,
   description TEXT,
   created_by  BIGINT REFERENCES users(id) ON DELETE CASCADE,
-  created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  deleted_at  TIMESTAMPTZ                  -- 지연 삭제 표시 (OJ_DEFERRED_DELETES)
 );
 
 CREATE TABLE IF NOT EXISTS class_teachers (
@@ -71,31 +87,251 @@ CREATE TABLE IF NOT EXISTS testcases (
   expected_text TEXT NOT NULL,
   timeout_ms    INT NOT NULL DEFAULT 2000,
   points        INT NOT NULL DEFAULT 1,
-  is_public     BOOLEAN NOT NULL DEFAULT FALSE
+  is_public     BOOLEAN NOT NULL DEFAULT FALSE,
+  group_idx     INT               -- testcase_groups.idx (NULL이면 그룹 없음)
+);
+
+-- 워커가 채점 끝날 때마다 누적 (problems.schedule = 'failfast' 정렬용)
+CREATE TABLE IF NOT EXISTS testcase_stats (
+  testcase_id BIGINT PRIMARY KEY REFERENCES testcases(id) ON DELETE CASCADE,
+  runs        INT NOT NULL DEFAULT 0,
+  fails       INT NOT NULL DEFAULT 0,   -- ok가 아닌 판정 (skipped/se 제외)
+  total_ms    BIGINT NOT NULL DEFAULT 0
+);
+
+-- 서브태스크: 그룹 단위 채점, depends_on 그룹이 만점이 아니면 건너뜀
+CREATE TABLE IF NOT EXISTS testcase_groups (
+  problem_id BIGINT NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+  idx        INT NOT NULL,
+  name       TEXT,
+  points     INT NOT NULL DEFAULT 0,
+  scoring    TEXT NOT NULL DEFAULT 'min' CHECK (scoring IN ('min','sum')),  -- min: 전부 맞아야 points, sum: 케이스 points 합
+  depends_on INT[] NOT NULL DEFAULT '{}',  -- 먼저 만점이어야 하는 그룹 idx
+  PRIMARY KEY (problem_id, idx)
+);
+
+-- 제출 토큰 버킷 (backend/admission.py). key = 'user:<id>' | 'class:<id>'
+CREATE TABLE IF NOT EXISTS rate_buckets (
+  key        TEXT PRIMARY KEY,
+  tokens     DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- read-your-writes (backend/db.py): 사용자별 마지막 쓰기 직후의 primary WAL 위치. 모든 API 프로세스가 공유하고,
+-- 복제본이 그 위치를 재생하면 그 사용자의 다음 읽기가 (나머지는 maintenance prune-write-positions가) 지운다. UNLOGGED: primary에서만 읽으니 WAL/복제가 필요 없다 (크래시 후 비어도 잠깐 오래된 읽기일 뿐)
+CREATE UNLOGGED TABLE IF NOT EXISTS write_positions (
+  user_id BIGINT PRIMARY KEY,
+  lsn     PG_LSN NOT NULL
 );
 
+-- submissions / submission_results 는 created_at 월 단위 파티션 (backend/partitions.py).
+-- 파티션 테이블의 PK/FK는 파티션 키를 포함해야 해서 (id, created_at) 복합 키를 쓴다.
 CREATE TABLE IF NOT EXISTS submissions (
-  id          BIGSERIAL PRIMARY KEY,
+  id          BIGSERIAL,
   user_id     BIGINT REFERENCES users(id) ON DELETE CASCADE,
   problem_id  BIGINT NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
-  language    TEXT NOT NULL CHECK (language = 'python'),
+  language    TEXT NOT NULL CHECK (language IN ('python','pypy','c','cpp','java')),
   source_code TEXT NOT NULL,
   status      TEXT NOT NULL DEFAULT 'queued', -- queued|running|accepted|wrong_answer|tle|runtime_error|system_error|compile_error
   score       INT DEFAULT 0,
   time_ms     INT DEFAULT 0,
   created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-  finished_at TIMESTAMPTZ
-);
+  started_at  TIMESTAMPTZ,                    -- 워커가 집어간 시각 (queue wait = started_at - created_at)
+  finished_at TIMESTAMPTZ,
+  compile_output TEXT,                      -- compile_error 일 때 컴파일러 메시지
+  python_tier TEXT CHECK (python_tier IN ('cpython','cpython-fast','pypy')),  -- NULL이면 problems.python_tier
+  claimed_by  TEXT,                         -- 채점 중인 워커 (workers.id)
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 CREATE TABLE IF NOT EXISTS submission_results (
-  id             BIGSERIAL PRIMARY KEY,
-  submission_id  BIGINT NOT NULL REFERENCES submissions(id) ON DELETE CASCADE,
+  id             BIGSERIAL,
+  submission_id  BIGINT NOT NULL,
+  submission_created_at TIMESTAMPTZ NOT NULL,  -- submissions.created_at 복사 (파티션 키)
   testcase_id    BIGINT NOT NULL REFERENCES testcases(id),
-  verdict        TEXT NOT NULL,     -- ok|wa|tle|re
+  verdict        TEXT NOT NULL,     -- ok|wa|tle|re|se|skipped
   time_ms        INT DEFAULT 0,
-  stdout         TEXT,
-  stderr         TEXT
+  stdout         TEXT,              -- 앞부분만 (JUDGE_OUTPUT_PREVIEW_CHARS)
+  stderr         TEXT,
+  tier           TEXT,              -- 실제 실행 티어 (cpython|cpython-fast|pypy|c|cpp|java)
+  full_output    BYTEA,             -- 첫 실패 케이스의 전체 출력: zlib(JSON {"stdout","stderr"}), 잘렸을 때만
+  PRIMARY KEY (id, submission_created_at),
+  FOREIGN KEY (submission_id, submission_created_at) REFERENCES submissions(id, created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (submission_created_at);
+
+-- 월 파티션 밖의 행을 받는 기본 파티션 (월 파티션은 maintenance ensure-partitions 가 미리 만든다).
+-- partition-tables 로 옮기기 전의 기존 DB(일반 테이블)에서는 건너뜀
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'submissions' AND relkind = 'p') THEN
+    CREATE TABLE IF NOT EXISTS submissions_default PARTITION OF submissions DEFAULT;
+    CREATE TABLE IF NOT EXISTS submission_results_default PARTITION OF submission_results DEFAULT;
+  END IF;
+END $$;
+
+-- 대회: 반 학생들의 [starts_at, ends_at) 제출로 순위를 매긴다
+CREATE TABLE IF NOT EXISTS contests (
+  id              BIGSERIAL PRIMARY KEY,
+  class_id        BIGINT NOT NULL REFERENCES classes(id) ON DELETE CASCADE,
+  title           TEXT NOT NULL,
+  starts_at       TIMESTAMPTZ NOT NULL,
+  ends_at         TIMESTAMPTZ NOT NULL,
+  freeze_at       TIMESTAMPTZ,              -- 이후 제출은 학생 화면에 시도 수만 보임 (NULL = 프리즈 없음)
+  unfrozen        BOOLEAN NOT NULL DEFAULT FALSE,  -- 교사가 최종 결과 공개
+  scoring         TEXT NOT NULL DEFAULT 'icpc' CHECK (scoring IN ('icpc','score')),
+  penalty_minutes INT NOT NULL DEFAULT 20,  -- icpc: 맞힌 문제의 첫 accepted 전 오답 1회당
+  version         BIGINT NOT NULL DEFAULT 0,  -- contest_scores가 바뀔 때마다 +1 (스코어보드 스냅샷/ETag)
+  created_by      BIGINT REFERENCES users(id) ON DELETE SET NULL,
+  created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  CHECK (ends_at > starts_at),
+  CHECK (freeze_at IS NULL OR (freeze_at >= starts_at AND freeze_at <= ends_at))
+);
+
+CREATE TABLE IF NOT EXISTS contest_problems (
+  contest_id BIGINT NOT NULL REFERENCES contests(id) ON DELETE CASCADE,
+  problem_id BIGINT NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+  label      TEXT NOT NULL,  -- A, B, ...
+  PRIMARY KEY (contest_id, problem_id)
+);
+
+-- (대회, 학생, 문제)별 스코어보드 칸. 워커가 채점을 끝낼 때 그 칸만 다시 계산 (refresh_contest_score).
+-- compile_error / system_error 는 시도로 치지 않는다. f_* 는 freeze_at 이전 제출만으로 계산한 값
+CREATE TABLE IF NOT EXISTS contest_scores (
+  contest_id   BIGINT NOT NULL REFERENCES contests(id) ON DELETE CASCADE,
+  user_id      BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  problem_id   BIGINT NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+  attempts     INT NOT NULL,
+  wrong        INT NOT NULL,      -- 첫 accepted 전 오답 수
+  solved_at    TIMESTAMPTZ,       -- 첫 accepted 제출 시각
+  best_score   INT NOT NULL,
+  best_at      TIMESTAMPTZ,       -- best_score를 처음 받은 제출 시각 (best_score > 0 일 때)
+  f_attempts   INT NOT NULL,
+  f_wrong      INT NOT NULL,
+  f_solved_at  TIMESTAMPTZ,
+  f_best_score INT NOT NULL,
+  f_best_at    TIMESTAMPTZ,
+  PRIMARY KEY (contest_id, user_id, problem_id)
+);
+
+-- 칸 하나를 그 학생의 그 문제 제출들로 다시 계산하고 contests.version 을 올린다.
+-- 채점 순서가 제출 순서와 달라도 결과가 같도록 누적 대신 재계산한다 (제출 수 만큼만 읽음)
+CREATE OR REPLACE FUNCTION refresh_contest_score(p_contest BIGINT, p_user BIGINT, p_problem BIGINT)
+RETURNS void LANGUAGE sql AS $$
+  -- 같은 칸을 두 워커가 동시에 계산하면 서로의 커밋 전 결과를 못 본다 -> 칸 단위로 커밋까지 직렬화
+  SELECT pg_advisory_xact_lock(hashtextextended(format('contest:%s:%s:%s', p_contest, p_user, p_problem), 0));
+  WITH c AS (
+    SELECT starts_at, ends_at, COALESCE(freeze_at, ends_at) AS freeze_at FROM contests WHERE id = p_contest
+  ),
+  att AS (
+    SELECT s.created_at, s.status = 'accepted' AS ok, COALESCE(s.score, 0) AS score,
+           s.created_at < c.freeze_at AS before_freeze
+    FROM c
+    JOIN submissions s ON s.user_id = p_user AND s.problem_id = p_problem
+     AND s.created_at >= c.starts_at AND s.created_at < c.ends_at
+    WHERE s.status NOT IN ('queued', 'running', 'compile_error', 'system_error')
+  ),
+  firsts AS (
+    SELECT MIN(created_at) FILTER (WHERE ok) AS solved_at,
+           MIN(created_at) FILTER (WHERE ok AND before_freeze) AS f_solved_at,
+           MAX(score) AS best_score,
+           COALESCE(MAX(score) FILTER (WHERE before_freeze), 0) AS f_best_score
+    FROM att
+  ),
+  cell AS (
+    SELECT COUNT(*) AS attempts,
+           COUNT(*) FILTER (WHERE NOT a.ok AND a.created_at < COALESCE(f.solved_at, 'infinity')) AS wrong,
+           f.solved_at, f.best_score,
+           MIN(a.created_at) FILTER (WHERE a.score = f.best_score AND f.best_score > 0) AS best_at,
+           COUNT(*) FILTER (WHERE a.before_freeze) AS f_attempts,
+           COUNT(*) FILTER (WHERE a.before_freeze AND NOT a.ok
+                              AND a.created_at < COALESCE(f.f_solved_at, 'infinity')) AS f_wrong,
+           f.f_solved_at, f.f_best_score,
+           MIN(a.created_at) FILTER (WHERE a.before_freeze AND a.score = f.f_best_score
+                                       AND f.f_best_score > 0) AS f_best_at
+    FROM att a CROSS JOIN firsts f
+    GROUP BY f.solved_at, f.best_score, f.f_solved_at, f.f_best_score
+  ),
+  gone AS (
+    DELETE FROM contest_scores
+    WHERE contest_id = p_contest AND user_id = p_user AND problem_id = p_problem
+      AND NOT EXISTS (SELECT 1 FROM cell)
+  )
+  INSERT INTO contest_scores (contest_id, user_id, problem_id, attempts, wrong, solved_at, best_score, best_at,
+                              f_attempts, f_wrong, f_solved_at, f_best_score, f_best_at)
+  SELECT p_contest, p_user, p_problem, attempts, wrong, solved_at, best_score, best_at,
+         f_attempts, f_wrong, f_solved_at, f_best_score, f_best_at
+  FROM cell
+  ON CONFLICT (contest_id, user_id, problem_id) DO UPDATE
+  SET attempts = EXCLUDED.attempts, wrong = EXCLUDED.wrong, solved_at = EXCLUDED.solved_at,
+      best_score = EXCLUDED.best_score, best_at = EXCLUDED.best_at,
+      f_attempts = EXCLUDED.f_attempts, f_wrong = EXCLUDED.f_wrong, f_solved_at = EXCLUDED.f_solved_at,
+      f_best_score = EXCLUDED.f_best_score, f_best_at = EXCLUDED.f_best_at;
+  UPDATE contests SET version = version + 1 WHERE id = p_contest;
+$$;
+
+-- 채점 워커 등록부: 하트비트가 끊긴 워커가 잡고 있던 제출은 다른 워커가 다시 큐에 넣는다
+CREATE TABLE IF NOT EXISTS workers (
+  id           TEXT PRIMARY KEY,              -- WORKER_ID (기본: 호스트 이름)
+  host         TEXT NOT NULL,
+  pid          INT NOT NULL,
+  slots        INT NOT NULL CHECK (slots > 0),
+  languages    TEXT[] NOT NULL,
+  state        TEXT NOT NULL DEFAULT 'active' CHECK (state IN ('active','draining','stopped')),
+  started_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- 채점 워커가 “경합 없이” 작업 집기 위한 인덱스
 CREATE INDEX IF NOT EXISTS idx_submissions_status ON submissions(status);
+CREATE INDEX IF NOT EXISTS idx_submissions_queued ON submissions(id) WHERE status = 'queued';
+
+-- 삭제 캐스케이드/FK 검사와 문제별 조회용 인덱스
+CREATE INDEX IF NOT EXISTS idx_submission_results_submission ON submission_results(submission_id);
+CREATE INDEX IF NOT EXISTS idx_submission_results_testcase ON submission_results(testcase_id);
+CREATE INDEX IF NOT EXISTS idx_testcases_problem ON testcases(problem_id, idx);
+CREATE INDEX IF NOT EXISTS idx_submissions_problem ON submissions(problem_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_problem ON submissions(user_id, problem_id, id);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_pending ON submissions(user_id) WHERE status IN ('queued','running');
+CREATE INDEX IF NOT EXISTS idx_class_problems_problem ON class_problems(problem_id);
+CREATE INDEX IF NOT EXISTS idx_contest_problems_problem ON contest_problems(problem_id);
+CREATE INDEX IF NOT EXISTS idx_contests_class ON contests(class_id);
+
+-- ---------- 기존 DB 업그레이드 (재실행 안전) ----------
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS started_at TIMESTAMPTZ;
+ALTER TABLE classes ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS compile_output TEXT;
+ALTER TABLE submissions DROP CONSTRAINT IF EXISTS submissions_language_check;
+ALTER TABLE submissions ADD CONSTRAINT submissions_language_check CHECK (language IN ('python','pypy','c','cpp','java'));
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS python_tier TEXT NOT NULL DEFAULT 'cpython' CHECK (python_tier IN ('cpython','cpython-fast','pypy'));
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS python_tier TEXT CHECK (python_tier IN ('cpython','cpython-fast','pypy'));
+ALTER TABLE submission_results ADD COLUMN IF NOT EXISTS tier TEXT;
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS checker TEXT NOT NULL DEFAULT 'exact' CHECK (checker IN ('exact','tokens','float','unordered','special'));
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS checker_args JSONB NOT NULL DEFAULT '{}';
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS checker_source TEXT;
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS interactor_source TEXT;
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS turn_timeout_ms INT;
+ALTER TABLE testcases ADD COLUMN IF NOT EXISTS group_idx INT;
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS schedule TEXT NOT NULL DEFAULT 'idx' CHECK (schedule IN ('idx','failfast'));
+ALTER TABLE submission_results ADD COLUMN IF NOT EXISTS full_output BYTEA;
+ALTER TABLE submission_results ADD COLUMN IF NOT EXISTS submission_created_at TIMESTAMPTZ;
+ALTER TABLE submissions ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+CREATE INDEX IF NOT EXISTS idx_submissions_running ON submissions(claimed_by) WHERE status = 'running';
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS tags TEXT[] NOT NULL DEFAULT '{}';
+ALTER TABLE problems ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', title), 'A')
+    || setweight(to_tsvector('simple', replace(slug, '-', ' ')), 'B')
+    || setweight(to_tsvector('simple', statement_md), 'C')
+  ) STORED;
+CREATE INDEX IF NOT EXISTS idx_problems_search ON problems USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_problems_tags ON problems USING GIN (tags);
+-- 제목/slug 부분 문자열 검색(ILIKE)용 트라이그램 인덱스. pg_trgm(contrib)이 없으면 건너뛴다 (검색은 되지만 인덱스 없이)
+DO $$
+BEGIN
+  CREATE EXTENSION IF NOT EXISTS pg_trgm;
+  EXECUTE 'CREATE INDEX IF NOT EXISTS idx_problems_title_trgm ON problems USING GIN (title gin_trgm_ops)';
+  EXECUTE 'CREATE INDEX IF NOT EXISTS idx_problems_slug_trgm ON problems USING GIN (slug gin_trgm_ops)';
+EXCEPTION WHEN OTHERS THEN
+  RAISE NOTICE 'pg_trgm unavailable (%), problem title/slug search runs without trigram indexes', SQLERRM;
+END
+$$;
@@ -0,0 +1,378 @@
+"""Judge throughput / latency benchmark.
+
+Seeds synthetic problems into a *dedicated* Postgres database, enqueues N
+submissions, drives M worker processes through `judge.worker.judge` and
+reports throughput, queue-wait / judge latency percentiles and a per-stage
+breakdown. Results are written as JSON so runs can be diffed across releases.
+
+    python bench/judge_bench.py --submissions 200 --workers 4 --out bench/results/latest.json
+    python bench/judge_bench.py --baseline bench/results/v1.json --max-regression 0.10
+
+Uses the same POSTGRES_* variables as the worker. Never point it at production:
+the workers claim *every* queued submission in the database.
+"""
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+JUDGE_DIR = ROOT_DIR / "judge"
+if str(JUDGE_DIR) not in sys.path:
+    sys.path.insert(0, str(JUDGE_DIR))
+
+import psycopg2  # noqa: E402
+
+import worker  # noqa: E402
+
+BENCH_EMAIL = "bench@oj.local"
+
+# ---------- 합성 문제 ----------
+# name -> (statement, testcases[(input_text, expected_text, timeout_ms)], solutions{label: source})
+_LARGE_N = 100_000
+_large_nums = list(range(1, _LARGE_N + 1))
+
+PROBLEMS = {
+    "stdin-small": (
+        "Read two integers and print their sum.",
+        [(f"{a} {b}", str(a + b), 2000) for a, b in [(1, 2), (10, 20), (-5, 5), (123456, 654321)]],
+        {
+            "ok": "a, b = map(int, input().split())\nprint(a + b)\n",
+            "wa": "a, b = map(int, input().split())\nprint(a - b)\n",
+        },
+    ),
+    "stdin-large": (
+        "Read N and then N integers; print their sum.",
+        [(f"{_LARGE_N}\n" + " ".join(map(str, _large_nums)), str(sum(_large_nums)), 4000)] * 3,
+        {
+            "ok": "import sys\nd = sys.stdin.buffer.read().split()\nprint(sum(map(int, d[1:])))\n",
+            "wa": "import sys\nd = sys.stdin.buffer.read().split()\nprint(sum(map(int, d[2:])))\n",
+        },
+    ),
+    "answer-small": (
+        "Implement answer(nums, target) returning indices i < j with nums[i] + nums[j] == target.",
+        [
+            (json.dumps({"args": [[2, 7, 11, 15], 9]}), json.dumps([0, 1]), 2000),
+            (json.dumps({"args": [[3, 2, 4], 6]}), json.dumps([1, 2]), 2000),
+            (json.dumps({"args": [[1, 5, 9, 3], 12]}), json.dumps([2, 3]), 2000),
+        ],
+        {
+            "ok": (
+                "def answer(nums, target):\n"
+                "    seen = {}\n"
+                "    for i, x in enumerate(nums):\n"
+                "        if target - x in seen:\n"
+                "            return (seen[target - x], i)\n"
+                "        seen[x] = i\n"
+            ),
+            "wa": "def answer(nums, target):\n    return (0, 0)\n",
+        },
+    ),
+    "answer-large": (
+        "Implement answer(nums) returning the list sorted in descending order.",
+        [(json.dumps([_large_nums]), json.dumps(_large_nums[::-1]), 4000)] * 2,
+        {
+            "ok": "def answer(nums):\n    return sorted(nums, reverse=True)\n",
+            "wa": "def answer(nums):\n    return nums\n",
+        },
+    ),
+    "tle": (
+        "Print the first input line. Reference solutions for this problem mostly time out.",
+        [("ping", "ping", 500)] * 3,
+        {
+            "ok": "print(input())\n",
+            "tle": "while True:\n    pass\n",
+        },
+    ),
+}
+
+# mix name -> [(problem, solution label, weight)]
+MIXES = {
+    "default": [
+        ("stdin-small", "ok", 30), ("stdin-small", "wa", 10),
+        ("answer-small", "ok", 30), ("answer-small", "wa", 10),
+        ("stdin-large", "ok", 5), ("answer-large", "ok", 5),
+        ("tle", "tle", 5), ("tle", "ok", 5),
+    ],
+    "small": [("stdin-small", "ok", 1), ("answer-small", "ok", 1)],
+    "large-io": [
+        ("stdin-large", "ok", 2), ("stdin-large", "wa", 1),
+        ("answer-large", "ok", 2), ("answer-large", "wa", 1),
+    ],
+    "tle-heavy": [("tle", "tle", 3), ("tle", "ok", 1), ("stdin-small", "ok", 1)],
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[k]
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+# ---------- DB seed / cleanup ----------
+def ensure_clean_queue(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM submissions WHERE status IN ('queued','running')")
+        pending = cur.fetchone()[0]
+    if pending:
+        raise SystemExit(
+            f"{pending} queued/running submissions already exist; run the benchmark against an idle, dedicated database."
+        )
+
+
+def seed(conn, run_id):
+    """Create the bench user and one problem per synthetic kind. Returns (user_id, {kind: problem_id})."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO users(email, pwd_hash, role, username, is_verified)
+            VALUES (%s, '!', 'student', 'bench', true)
+            ON CONFLICT (email) DO UPDATE SET username=EXCLUDED.username
+            RETURNING id
+        """, (BENCH_EMAIL,))
+        user_id = cur.fetchone()[0]
+        problem_ids = {}
+        for kind, (statement, cases, _) in PROBLEMS.items():
+            cur.execute("""
+                INSERT INTO problems(slug, title, difficulty, statement_md)
+                VALUES (%s, %s, 'easy', %s) RETURNING id
+            """, (f"bench-{run_id}-{kind}", f"[bench] {kind}", statement))
+            pid = cur.fetchone()[0]
+            for idx, (inp, exp, timeout_ms) in enumerate(cases, start=1):
+                cur.execute("""
+                    INSERT INTO testcases(problem_id, idx, input_text, expected_text, timeout_ms)
+                    VALUES (%s,%s,%s,%s,%s)
+                """, (pid, idx, inp, exp, timeout_ms))
+            problem_ids[kind] = pid
+    conn.commit()
+    return user_id, problem_ids
+
+
+def enqueue(conn, user_id, problem_ids, mix, n, rng):
+    plan = MIXES[mix]
+    weights = [w for _, _, w in plan]
+    picks = rng.choices(plan, weights=weights, k=n)
+    sids = []
+    with conn.cursor() as cur:
+        for kind, label, _ in picks:
+            cur.execute("""
+                INSERT INTO submissions(user_id, problem_id, language, source_code)
+                VALUES (%s,%s,'python',%s) RETURNING id
+            """, (user_id, problem_ids[kind], PROBLEMS[kind][2][label]))
+            sids.append((cur.fetchone()[0], kind, label))
+    conn.commit()
+    return sids
+
+
+def cleanup(conn, problem_ids):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM problems WHERE id = ANY(%s)", (list(problem_ids.values()),))
+    conn.commit()
+
+
+# ---------- 워커 프로세스 ----------
+def _worker_proc(idx, total, done_counter, out_q):
+    conn = psycopg2.connect(worker.DSN)
+    conn.autocommit = False
+    try:
+        while True:
+            with done_counter.get_lock():
+                if done_counter.value >= total:
+                    break
+            t0 = time.perf_counter()
+            claimed = worker.pick_one(conn)
+            claim_s = time.perf_counter() - t0
+            if not claimed:
+                time.sleep(0.05)
+                continue
+            sid, _ = claimed
+            claimed_at = time.time()
+            spans = {"claim": claim_s}
+            t1 = time.perf_counter()
+            status = worker.judge(conn, sid, spans)
+            judge_s = time.perf_counter() - t1
+            with done_counter.get_lock():
+                done_counter.value += 1
+            out_q.put({
+                "sid": sid, "worker": idx, "status": status,
+                "claimed_at": claimed_at, "judge_s": judge_s, "spans": spans,
+            })
+    finally:
+        conn.close()
+
+
+def drive(n_workers, total):
+    ctx = mp.get_context("fork")
+    done_counter = ctx.Value("i", 0)
+    out_q = ctx.Queue()
+    procs = [ctx.Process(target=_worker_proc, args=(i, total, done_counter, out_q)) for i in range(n_workers)]
+    start = time.time()
+    for p in procs:
+        p.start()
+    records = []
+    while len(records) < total:
+        records.append(out_q.get())
+    for p in procs:
+        p.join()
+    return start, time.time(), records
+
+
+def created_epochs(conn, sids):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT id, EXTRACT(EPOCH FROM created_at) FROM submissions WHERE id = ANY(%s)",
+            (sids,),
+        )
+        return {r[0]: float(r[1]) for r in cur.fetchall()}
+
+
+# ---------- 리포트 ----------
+def build_report(args, start, end, plan, records, created):
+    kinds = {sid: (kind, label) for sid, kind, label in plan}
+    queue_wait = [r["claimed_at"] - created[r["sid"]] for r in records]
+    judge_lat = [r["judge_s"] for r in records]
+
+    stages = {}
+    for r in records:
+        for name, secs in r["spans"].items():
+            stages.setdefault(name, []).append(secs)
+    # startup/user는 run의 세부 구간이므로 합계에서 제외
+    stage_total = sum(sum(v) for k, v in stages.items() if k not in ("startup", "user")) or 1.0
+
+    by_kind = {}
+    for r in records:
+        kind, label = kinds[r["sid"]]
+        by_kind.setdefault(f"{kind}/{label}", []).append(r["judge_s"])
+
+    statuses = {}
+    for r in records:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+
+    elapsed = end - start
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "submissions": args.submissions,
+            "workers": args.workers,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "throughput_per_s": len(records) / elapsed if elapsed > 0 else None,
+        "wall_s": elapsed,
+        "queue_wait_s": summarize(queue_wait),
+        "judge_latency_s": summarize(judge_lat),
+        "stages": {
+            name: {**summarize(vals), "total": sum(vals), "share": sum(vals) / stage_total}
+            for name, vals in sorted(stages.items())
+        },
+        "by_kind": {k: summarize(v) for k, v in sorted(by_kind.items())},
+        "statuses": statuses,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(rep):
+    print(f"throughput: {rep['throughput_per_s']:.2f} submissions/s over {rep['wall_s']:.1f}s")
+    for key in ("queue_wait_s", "judge_latency_s"):
+        s = rep[key]
+        print(f"{key:16s} p50={s['p50']*1000:8.1f}ms  p95={s['p95']*1000:8.1f}ms  p99={s['p99']*1000:8.1f}ms")
+    print("stages (share of judged wall time):")
+    for name, s in rep["stages"].items():
+        print(f"  {name:16s} {s['share']*100:5.1f}%  mean={s['mean']*1000:8.2f}ms  p95={s['p95']*1000:8.2f}ms")
+    print("statuses:", rep["statuses"])
+
+
+def compare(rep, baseline, max_regression):
+    """Return a list of regression messages vs a previous report."""
+    problems = []
+    old_tp, new_tp = baseline.get("throughput_per_s"), rep.get("throughput_per_s")
+    if old_tp and new_tp is not None and new_tp < old_tp * (1 - max_regression):
+        problems.append(f"throughput {new_tp:.2f}/s < baseline {old_tp:.2f}/s")
+    for key in ("judge_latency_s", "queue_wait_s"):
+        old = (baseline.get(key) or {}).get("p95")
+        new = (rep.get(key) or {}).get("p95")
+        if old and new is not None and new > old * (1 + max_regression):
+            problems.append(f"{key} p95 {new*1000:.1f}ms > baseline {old*1000:.1f}ms")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--submissions", "-n", type=int, default=100)
+    ap.add_argument("--workers", "-m", type=int, default=2)
+    ap.add_argument("--mix", choices=sorted(MIXES), default="default")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--baseline", help="previous JSON report to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.10, help="allowed relative slowdown vs baseline")
+    ap.add_argument("--keep", action="store_true", help="keep seeded problems/submissions after the run")
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+
+    conn = psycopg2.connect(worker.DSN)
+    ensure_clean_queue(conn)
+    user_id, problem_ids = seed(conn, run_id)
+    try:
+        plan = enqueue(conn, user_id, problem_ids, args.mix, args.submissions, rng)
+        start, end, records = drive(args.workers, len(plan))
+        created = created_epochs(conn, [sid for sid, _, _ in plan])
+        rep = build_report(args, start, end, plan, records, created)
+    finally:
+        if not args.keep:
+            cleanup(conn, problem_ids)
+        conn.close()
+
+    print_report(rep)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(rep, indent=2))
+        print(f"saved {args.out}")
+    if args.baseline:
+        regressions = compare(rep, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for msg in regressions:
+            print("REGRESSION:", msg)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
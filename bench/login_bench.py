@@ -0,0 +1,199 @@
+"""Login burst benchmark.
+
+Seeds verified users into a *dedicated* Postgres database, starts the API
+(uvicorn, one process) with the given hashing settings and fires a burst of
+POST /auth/login from many client threads, the way a class logs in at the
+start of a lab. While the burst runs, a probe thread keeps calling
+GET /problems to measure how much the logins slow down unrelated requests.
+
+    python bench/login_bench.py --logins 300 --concurrency 8 --hash-workers 2 --out bench/results/login.json
+    python bench/login_bench.py --hash-workers 0      # inline hashing, for comparison
+    python bench/login_bench.py --baseline bench/results/login.json --max-regression 0.10
+
+Uses the same POSTGRES_* variables as the API.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+import requests
+from passlib.context import CryptContext
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from judge_bench import ROOT_DIR, _git_rev, summarize  # noqa: E402
+
+EMAIL_PREFIX = "bench-login-"
+PASSWORD = "bench-password"
+
+
+def dsn():
+    return (f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} "
+            f"password={os.getenv('POSTGRES_PASSWORD')} host={os.getenv('POSTGRES_HOST')} port={os.getenv('POSTGRES_PORT')}")
+
+
+def seed(conn, n_users, rounds):
+    # 모든 사용자가 같은 비밀번호/솔트여도 검증 비용은 같다
+    pwd_hash = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=rounds).hash(PASSWORD)
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email LIKE %s", (EMAIL_PREFIX + "%",))
+        cur.executemany(
+            "INSERT INTO users(email, pwd_hash, role, username, is_verified) VALUES (%s, %s, 'student', %s, true)",
+            [(f"{EMAIL_PREFIX}{i}@example.com", pwd_hash, f"{EMAIL_PREFIX}{i}") for i in range(n_users)],
+        )
+    conn.commit()
+
+
+def cleanup(conn):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM users WHERE email LIKE %s", (EMAIL_PREFIX + "%",))
+    conn.commit()
+
+
+def start_api(port, hash_workers, rounds):
+    env = dict(os.environ, OJ_HASH_WORKERS=str(hash_workers), OJ_PWD_PBKDF2_ROUNDS=str(rounds))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base}/problems", timeout=1)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API did not start")
+
+
+def burst(base, n_users, n_logins, concurrency):
+    session = threading.local()
+
+    def login(i):
+        s = getattr(session, "s", None) or requests.Session()
+        session.s = s
+        t0 = time.perf_counter()
+        r = s.post(f"{base}/auth/login", json={"email": f"{EMAIL_PREFIX}{i % n_users}@example.com", "password": PASSWORD}, timeout=30)
+        return r.status_code, time.perf_counter() - t0
+
+    probe, stop = [], threading.Event()
+
+    def probe_loop():
+        with requests.Session() as s:
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                s.get(f"{base}/problems", timeout=30)
+                probe.append(time.perf_counter() - t0)
+                time.sleep(0.02)
+
+    # 버스트 전 기준 응답 시간
+    idle = []
+    with requests.Session() as s:
+        for _ in range(20):
+            t0 = time.perf_counter()
+            s.get(f"{base}/problems", timeout=30)
+            idle.append(time.perf_counter() - t0)
+
+    prober = threading.Thread(target=probe_loop, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        results = list(ex.map(login, range(n_logins)))
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return results, wall, idle, probe
+
+
+def build_report(args, results, wall, idle, probe):
+    ok = [t for code, t in results if code == 200]
+    codes = {}
+    for code, _ in results:
+        codes[str(code)] = codes.get(str(code), 0) + 1
+    return {
+        "bench": "login",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_rev(),
+        "params": {k: getattr(args, k) for k in ("users", "logins", "concurrency", "hash_workers", "rounds")},
+        "wall_s": wall,
+        "logins_per_s": len(ok) / wall if wall else None,
+        "status_codes": codes,
+        "login_latency_s": summarize(ok),
+        "probe_idle_s": summarize(idle),
+        "probe_during_burst_s": summarize(probe),
+    }
+
+
+def print_report(rep):
+    print(f"logins: {rep['logins_per_s']:.1f}/s over {rep['wall_s']:.2f}s  status codes: {rep['status_codes']}")
+    for key in ("login_latency_s", "probe_idle_s", "probe_during_burst_s"):
+        s = rep[key]
+        if s["count"]:
+            print(f"{key:22s} p50={s['p50']*1000:8.1f}ms  p95={s['p95']*1000:8.1f}ms  p99={s['p99']*1000:8.1f}ms")
+
+
+def compare(rep, baseline, max_regression):
+    problems = []
+    old_tp, new_tp = baseline.get("logins_per_s"), rep.get("logins_per_s")
+    if old_tp and new_tp is not None and new_tp < old_tp * (1 - max_regression):
+        problems.append(f"throughput {new_tp:.1f}/s < baseline {old_tp:.1f}/s")
+    for key in ("login_latency_s", "probe_during_burst_s"):
+        old = (baseline.get(key) or {}).get("p95")
+        new = (rep.get(key) or {}).get("p95")
+        if old and new is not None and new > old * (1 + max_regression):
+            problems.append(f"{key} p95 {new*1000:.1f}ms > baseline {old*1000:.1f}ms")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--logins", "-n", type=int, default=200)
+    ap.add_argument("--concurrency", "-c", type=int, default=8, help="client threads (keep below the API's DB pool size, 10)")
+    ap.add_argument("--hash-workers", type=int, default=2, help="OJ_HASH_WORKERS for the API (0 = inline)")
+    ap.add_argument("--rounds", type=int, default=29000, help="OJ_PWD_PBKDF2_ROUNDS for the API and seeded hashes")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--baseline", help="previous JSON report to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.10, help="allowed relative slowdown vs baseline")
+    ap.add_argument("--keep", action="store_true", help="keep the seeded users")
+    args = ap.parse_args(argv)
+
+    conn = psycopg2.connect(dsn())
+    seed(conn, args.users, args.rounds)
+    proc = None
+    try:
+        proc, base = start_api(args.port, args.hash_workers, args.rounds)
+        rep = build_report(args, *burst(base, args.users, args.logins, args.concurrency))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if not args.keep:
+            cleanup(conn)
+        conn.close()
+
+    print_report(rep)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(rep, indent=2))
+        print(f"saved {args.out}")
+    if args.baseline:
+        regressions = compare(rep, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for msg in regressions:
+            print("REGRESSION:", msg)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
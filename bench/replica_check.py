@@ -0,0 +1,170 @@
+"""Read-replica routing check with two API instances.
+
+Needs two local Postgres instances: the primary (POSTGRES_* as for the API)
+and a streaming replica of it (POSTGRES_REPLICA_DSN). The replica's user must
+be allowed to call pg_wal_replay_pause()/pg_wal_replay_resume() (superuser, or
+GRANT EXECUTE on both).
+
+Starts two API processes (uvicorn, one process each) and, with WAL replay on
+the replica paused:
+
+- a teacher adds a problem through instance A, then lists the class through
+  instance B: the new problem must be there (read-your-writes holds across
+  API processes);
+- a student who wrote nothing opens the same class through instance B: the
+  problem must be missing (the read was served by the paused replica);
+- after replay resumes, the student sees it too, and the teacher's write
+  position has been cleaned up.
+
+    POSTGRES_REPLICA_DSN="host=127.0.0.1 port=5433 dbname=oj user=oj password=..." python bench/replica_check.py
+
+Requires DEV_ECHO_VERIFY_TOKEN=1 (the default) to register its users. Exits 1
+on the first failed check.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from judge_bench import ROOT_DIR  # noqa: E402
+from login_bench import dsn  # noqa: E402
+
+EMAIL_PREFIX = "replica-check-"
+PASSWORD = "replica-check-pw"
+
+
+def sql(conn, query, params=None):
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall() if cur.description else None
+    conn.commit()
+    return rows
+
+
+def start_api(port):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR, env=dict(os.environ),
+    )
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base}/problems", timeout=1)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("API did not start")
+
+
+def call(method, url, token=None, expect=200, **kwargs):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    r = requests.request(method, url, headers=headers, timeout=10, **kwargs)
+    if r.status_code != expect:
+        raise RuntimeError(f"{method} {url}: {r.status_code} {r.text}")
+    return r.json()
+
+
+def make_user(primary, base, name, role):
+    email = f"{EMAIL_PREFIX}{name}@example.com"
+    reg = call("POST", f"{base}/auth/register", json={
+        "email": email, "username": f"{EMAIL_PREFIX}{name}", "password": PASSWORD, "password_confirm": PASSWORD,
+    })
+    call("GET", f"{base}/auth/verify", params={"token": reg["verify_token"]})
+    sql(primary, "UPDATE users SET role=%s WHERE email=%s", (role, email))
+    return email, call("POST", f"{base}/auth/login", json={"email": email, "password": PASSWORD})["access_token"]
+
+
+def wait_replayed(primary, replica, timeout_s=10.0):
+    lsn = sql(primary, "SELECT pg_current_wal_lsn()::text")[0][0]
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if sql(replica, "SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (lsn,))[0][0]:
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"replica did not replay {lsn} within {timeout_s}s")
+
+
+def cleanup(primary):
+    with primary.cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE email LIKE %s", (EMAIL_PREFIX + "%",))
+        ids = [r[0] for r in cur.fetchall()]
+        cur.execute("DELETE FROM write_positions WHERE user_id = ANY(%s)", (ids,))
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (ids,))
+    primary.commit()
+
+
+def run_checks(primary, replica, a, b):
+    _, teacher = make_user(primary, a, "teacher", "teacher")
+    student_email, student = make_user(primary, a, "student", "student")
+    class_id = call("POST", f"{a}/teacher/classes", teacher, json={"name": "replica check"})["class_id"]
+    try:
+        call("POST", f"{a}/teacher/classes/{class_id}/students", teacher, json={"student_email": student_email})
+        new_problem = {"title": "replica check", "difficulty": "easy", "statement_md": "x"}
+        call("POST", f"{a}/teacher/classes/{class_id}/problems", teacher,
+             json={"new_problem": dict(new_problem, slug=f"{EMAIL_PREFIX}{class_id}-1")})
+        wait_replayed(primary, replica)
+
+        sql(replica, "SELECT pg_wal_replay_pause()")
+        try:
+            call("POST", f"{a}/teacher/classes/{class_id}/problems", teacher,
+                 json={"new_problem": dict(new_problem, slug=f"{EMAIL_PREFIX}{class_id}-2")})
+            got = len(call("GET", f"{b}/teacher/classes/{class_id}/problems", teacher))
+            check(got == 2, f"writer reads its write through the other instance (saw {got} of 2 problems)")
+            got = len(call("GET", f"{b}/student/classes/{class_id}", student)["problems"])
+            check(got == 1, f"other user's read is served by the paused replica (saw {got}, expected 1)")
+        finally:
+            sql(replica, "SELECT pg_wal_replay_resume()")
+
+        wait_replayed(primary, replica)
+        got = len(call("GET", f"{b}/student/classes/{class_id}", student)["problems"])
+        check(got == 2, f"replica serves the write after replay (saw {got} of 2)")
+        call("GET", f"{b}/teacher/classes/{class_id}/problems", teacher)
+        left = sql(primary, """SELECT COUNT(*) FROM write_positions w JOIN users u ON u.id = w.user_id
+                               WHERE u.email LIKE %s""", (EMAIL_PREFIX + "%",))[0][0]
+        check(left == 0, f"replayed write positions are cleaned up ({left} left)")
+    finally:
+        call("DELETE", f"{a}/teacher/classes/{class_id}", teacher)
+
+
+def check(ok, what):
+    print(("ok    " if ok else "FAIL  ") + what)
+    if not ok:
+        raise SystemExit(1)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--ports", type=int, nargs=2, default=(8766, 8767), help="ports of API instances A and B")
+    args = ap.parse_args(argv)
+    replica_dsn = os.getenv("POSTGRES_REPLICA_DSN", "")
+    if not replica_dsn:
+        ap.error("set POSTGRES_REPLICA_DSN to the streaming replica")
+
+    primary, replica = psycopg2.connect(dsn()), psycopg2.connect(replica_dsn)
+    replica.autocommit = True
+    procs = []
+    try:
+        cleanup(primary)
+        for port in args.ports:
+            procs.append(start_api(port))
+        run_checks(primary, replica, procs[0][1], procs[1][1])
+    finally:
+        for proc, _ in procs:
+            proc.terminate()
+            proc.wait()
+        cleanup(primary)
+        primary.close()
+        replica.close()
+    print("replica routing OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
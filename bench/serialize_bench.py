@@ -0,0 +1,177 @@
+"""Response serialization benchmark for large class listings.
+
+Builds the payloads of the two heaviest class listings the way their
+handlers do (GET /teacher/classes/{id}/submissions and
+GET /teacher/classes/{id}/students/{sid}/submissions, which includes every
+submission's source code) for --rows synthetic rows, then times
+
+- before: what FastAPI does with a returned dict (jsonable_encoder, then
+  json.dumps in the stock JSONResponse),
+- after: backend.responses.json_response (orjson, no encoder pass),
+
+and the size/time of compressing the result with gzip and brotli (when
+installed) at the levels the API uses. No database is needed.
+
+    python bench/serialize_bench.py --rows 200 --out bench/results/serialize.json
+    python bench/serialize_bench.py --rows 200 --baseline bench/results/serialize.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from judge_bench import ROOT_DIR, _git_rev, summarize  # noqa: E402
+
+sys.path.insert(0, str(ROOT_DIR))
+from backend import responses  # noqa: E402
+
+
+def _to_iso(dt):  # backend/app.py 와 같은 변환
+    if not dt:
+        return None
+    if dt.tzinfo:
+        return dt.astimezone(timezone.utc).isoformat()
+    return dt.replace(tzinfo=timezone.utc).isoformat()
+
+
+def make_rows(n, seed):
+    rng = random.Random(seed)
+    kst = timezone(timedelta(hours=9))
+    start = datetime(2025, 3, 4, 9, 0, tzinfo=kst)
+    rows = []
+    for i in range(n):
+        created = start + timedelta(seconds=rng.randint(0, 90 * 86400), microseconds=rng.randint(0, 999999))
+        lines = [f"    total += solve(case_{j}, {rng.randint(0, 10**6)})  # 풀이 {j}" for j in range(rng.randint(20, 80))]
+        rows.append({
+            "id": 100000 + i, "submission_id": 100000 + i,
+            "status": rng.choice(["accepted", "wrong_answer", "time_limit_exceeded", "runtime_error"]),
+            "score": rng.randint(0, 10), "time_ms": rng.randint(1, 2000),
+            "created_at": created, "finished_at": created + timedelta(milliseconds=rng.randint(200, 5000)),
+            "student_id": 5000 + i % 40, "student_username": f"student{i % 40}", "student_email": f"s{i % 40}@example.com",
+            "problem_id": 300 + i % 25, "problem_title": f"문제 {i % 25}: 구간 합", "problem_slug": f"range-sum-{i % 25}",
+            "source_code": "def main():\n    total = 0\n" + "\n".join(lines) + "\n    print(total)\n",
+        })
+    return rows
+
+
+def class_submissions(rows):
+    return [
+        {
+            "submission_id": s["submission_id"], "status": s["status"], "score": s["score"], "time_ms": s["time_ms"],
+            "created_at": _to_iso(s["created_at"]), "finished_at": _to_iso(s["finished_at"]),
+            "student_id": s["student_id"], "student_username": s["student_username"], "student_email": s["student_email"],
+            "problem_id": s["problem_id"], "problem_title": s["problem_title"], "problem_slug": s["problem_slug"],
+        }
+        for s in rows
+    ]
+
+
+def student_submissions(rows):
+    return {
+        "student_id": 5000, "student_email": "s0@example.com", "student_username": "student0", "class_id": 7,
+        "submissions": [
+            {
+                "id": s["id"], "problem_id": s["problem_id"], "problem_title": s["problem_title"],
+                "problem_slug": s["problem_slug"], "status": s["status"], "score": s["score"], "time_ms": s["time_ms"],
+                "created_at": _to_iso(s["created_at"]), "finished_at": _to_iso(s["finished_at"]),
+                "source_code": s["source_code"],
+            }
+            for s in rows
+        ],
+    }
+
+
+def timed(fn, repeat):
+    out, times = None, []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, summarize(times)
+
+
+def bench_listing(name, build, rows, repeat):
+    payload, build_s = timed(lambda: build(rows), repeat)
+    before, before_s = timed(lambda: JSONResponse(jsonable_encoder(payload)).body, repeat)
+    after, after_s = timed(lambda: responses.json_response(payload).body, repeat)
+    assert json.loads(before) == json.loads(after), "encoders disagree"
+    rep = {"rows": len(rows), "bytes": len(after), "build_s": build_s, "before_s": before_s, "after_s": after_s,
+           "compression": {}}
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and responses.brotli is None:
+            continue
+        body, comp_s = timed(lambda: responses.compress(after, encoding), max(1, repeat // 4))
+        rep["compression"][encoding] = {"bytes": len(body), "ratio": len(body) / len(after), "time_s": comp_s}
+    return name, rep
+
+
+def print_report(rep):
+    print(f"orjson: {'yes' if rep['orjson'] else 'no (stdlib fallback)'}  brotli: {'yes' if rep['brotli'] else 'no'}")
+    for name, r in rep["listings"].items():
+        b, a = r["before_s"]["p50"], r["after_s"]["p50"]
+        print(f"{name} ({r['rows']} rows, {r['bytes'] / 1024:.1f} KiB)")
+        print(f"  build (handler dicts)   p50={r['build_s']['p50']*1000:7.2f}ms")
+        print(f"  before (encoder+json)   p50={b*1000:7.2f}ms  p95={r['before_s']['p95']*1000:7.2f}ms")
+        print(f"  after  (json_response)  p50={a*1000:7.2f}ms  p95={r['after_s']['p95']*1000:7.2f}ms  ({b / a:.1f}x)")
+        for enc, c in r["compression"].items():
+            print(f"  {enc:4s} {c['bytes'] / 1024:7.1f} KiB ({c['ratio']:.0%})  p50={c['time_s']['p50']*1000:7.2f}ms")
+
+
+def compare(rep, baseline, max_regression):
+    problems = []
+    for name, r in rep["listings"].items():
+        old = ((baseline.get("listings") or {}).get(name) or {}).get("after_s", {}).get("p50")
+        new = r["after_s"]["p50"]
+        if old and new > old * (1 + max_regression):
+            problems.append(f"{name} serialize p50 {new*1000:.2f}ms > baseline {old*1000:.2f}ms")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", "-n", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--baseline", help="previous JSON report to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.10, help="allowed relative slowdown vs baseline")
+    args = ap.parse_args(argv)
+
+    rows = make_rows(args.rows, args.seed)
+    rep = {
+        "bench": "serialize",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_rev(),
+        "params": {"rows": args.rows, "repeat": args.repeat, "seed": args.seed,
+                   "gzip_level": responses.GZIP_LEVEL, "brotli_quality": responses.BROTLI_QUALITY},
+        "orjson": responses.orjson is not None,
+        "brotli": responses.brotli is not None,
+        "listings": dict(
+            bench_listing(name, build, rows, args.repeat)
+            for name, build in (("class_submissions", class_submissions), ("student_submissions", student_submissions))
+        ),
+    }
+
+    print_report(rep)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(rep, indent=2))
+        print(f"saved {args.out}")
+    if args.baseline:
+        regressions = compare(rep, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for msg in regressions:
+            print("REGRESSION:", msg)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""JSON vs msgpack transport check for answer() testcases.
+
+Judges the same structured testcases twice through judge/worker.run_case:
+once with JUDGE_TRANSPORT=json, once with every input sent over the msgpack
+file transport (the size threshold forced to 0). The verdicts and the decoded
+results must be identical. The cases cover what msgpack cannot hold:
+integers outside 64 bits, in the input and in the result, and results with
+non-string dict keys (the harness replies in JSON then), plus a 64 KiB+
+input.
+
+    python bench/transport_check.py
+    python bench/transport_check.py --tier cpython-fast
+
+Needs msgpack importable by this interpreter and by the tier's interpreter
+(otherwise both runs take the JSON path and the check is skipped). No
+database is needed. Exits 1 on the first difference.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from judge_bench import ROOT_DIR  # noqa: E402
+
+sys.path.insert(0, str(ROOT_DIR / "judge"))
+import checkers  # noqa: E402
+import languages  # noqa: E402
+import transport  # noqa: E402
+import worker  # noqa: E402
+
+SOURCE = """\
+def answer(kind, data):
+    if kind == "sum":
+        return sum(data)
+    if kind == "int_keys":
+        return {int(k): v for k, v in data.items()}
+    if kind == "pair":
+        return (min(data), max(data))
+    if kind == "wrong":
+        return data[:-1]
+    return data
+"""
+
+BIG = [2**64, -2**63 - 1, 2**100, 7]
+LONG = list(range(20000))  # 64 KiB 이상: 운영과 같은 기본 임계값으로도 msgpack 경로
+
+CASES = [
+    # (이름, 입력 args, 기대 결과, 기대 판정)
+    ("big ints in input", ["sum", BIG], sum(BIG), "ok"),
+    ("big ints in input, echoed", ["echo", BIG], BIG, "ok"),
+    ("big ints in a 64 KiB+ input", ["sum", LONG + BIG], sum(LONG) + sum(BIG), "ok"),
+    ("big int result", ["sum", [2**63, 2**63]], 2**64, "ok"),
+    ("int dict keys in result", ["int_keys", {"1": 2, "10": 3}], {"1": 2, "10": 3}, "ok"),
+    ("int dict keys, 64 KiB+ input", ["int_keys", {str(i): i for i in range(8000)}], {str(i): i for i in range(8000)}, "ok"),
+    ("tuple result", ["pair", BIG], [min(BIG), max(BIG)], "ok"),
+    ("wrong answer", ["wrong", LONG], LONG, "wa"),
+]
+
+
+def judge(build, checker, tc, mode, min_bytes):
+    transport.MODE, transport.MSGPACK_MIN_BYTES = mode, min_bytes
+    verdict, _, _, err = worker.run_case(build, checker, None, tc)
+    return verdict, err
+
+
+def check(ok, what):
+    print(("ok    " if ok else "FAIL  ") + what)
+    if not ok:
+        raise SystemExit(1)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--tier", help="python tier (default: the language default)")
+    args = ap.parse_args(argv)
+
+    build = languages.prepare("python", SOURCE, args.tier)
+    if transport.msgpack is None or not transport.interpreter_has_msgpack(tuple(build._interpreter())):
+        print("msgpack is not importable here or by the tier's interpreter; nothing to compare")
+        return 0
+    checker = checkers.for_problem(None)
+    saved = transport.MODE, transport.MSGPACK_MIN_BYTES
+    try:
+        for name, call_args, expected, want in CASES:
+            tc = {"input_text": json.dumps({"args": call_args}), "expected_text": json.dumps(expected), "timeout_ms": 10000}
+            by_json, err_json = judge(build, checker, tc, "json", saved[1])
+            by_msgpack, err_msgpack = judge(build, checker, tc, "auto", 0)
+            check(by_json == by_msgpack == want,
+                  f"{name}: json={by_json} msgpack={by_msgpack} expected={want}"
+                  + (f"\n      {err_json or err_msgpack}" if by_json != want or by_msgpack != want else ""))
+    finally:
+        transport.MODE, transport.MSGPACK_MIN_BYTES = saved
+    print("transport OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
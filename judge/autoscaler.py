@@ -0,0 +1,224 @@
+"""Local worker autoscaler: runs between AUTOSCALE_MIN and AUTOSCALE_MAX worker.py processes.
+
+    python autoscaler.py      # instead of worker.py (systemd/autoscaler.service)
+
+Every AUTOSCALE_INTERVAL_S it samples the queue (queued count, oldest queued
+age) and host CPU (/proc/stat) and decides:
+
+- up: while there are more than AUTOSCALE_QUEUE_PER_SLOT queued submissions
+  per worker slot, or the oldest has waited longer than AUTOSCALE_MAX_AGE_S,
+  for at least AUTOSCALE_UP_AFTER_S, start up to AUTOSCALE_STEP workers
+  (enough to bring the backlog down to the target). Not while the host CPU is
+  busier than AUTOSCALE_CPU_MAX: more workers would only slow every
+  submission down (and skew time limits).
+- down: when nothing is queued and the workers could do with one fewer slot
+  for AUTOSCALE_DOWN_AFTER_S, retire the newest worker with SIGTERM. It
+  finishes what it is judging (worker.py drain) before it exits.
+
+Both timers restart after each change, so a short lull in a deadline spike
+does not retire workers that are needed again a minute later. Workers that
+die are replaced on the next tick if the fleet is below AUTOSCALE_MIN.
+
+Workers get WORKER_ID <AUTOSCALE_ID_PREFIX>-<n> (n reused) and WORKER_SLOTS
+from the environment. With WORKER_METRICS_PORT set, worker n exports its own
+metrics on WORKER_METRICS_PORT + n, so each scrape target stays tied to one
+worker id (scrape the range up to WORKER_METRICS_PORT + AUTOSCALE_MAX - 1).
+The autoscaler exports its decisions on AUTOSCALE_METRICS_PORT (unset = off).
+"""
+import math
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, start_http_server
+
+load_dotenv()
+DSN = f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} password={os.getenv('POSTGRES_PASSWORD')} host={os.getenv('POSTGRES_HOST')} port={os.getenv('POSTGRES_PORT')}"
+MIN_WORKERS = int(os.getenv("AUTOSCALE_MIN", "1"))
+MAX_WORKERS = int(os.getenv("AUTOSCALE_MAX", str(os.cpu_count() or 1)))
+INTERVAL_S = float(os.getenv("AUTOSCALE_INTERVAL_S", "5"))
+QUEUE_PER_SLOT = float(os.getenv("AUTOSCALE_QUEUE_PER_SLOT", "2"))
+MAX_AGE_S = float(os.getenv("AUTOSCALE_MAX_AGE_S", "15"))
+UP_AFTER_S = float(os.getenv("AUTOSCALE_UP_AFTER_S", "10"))
+DOWN_AFTER_S = float(os.getenv("AUTOSCALE_DOWN_AFTER_S", "300"))
+STEP = int(os.getenv("AUTOSCALE_STEP", "2"))
+CPU_MAX = float(os.getenv("AUTOSCALE_CPU_MAX", "0.85"))
+ID_PREFIX = os.getenv("AUTOSCALE_ID_PREFIX") or socket.gethostname()
+SLOTS = max(1, int(os.getenv("WORKER_SLOTS", "1")))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT") or 0)
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+
+WORKERS = Gauge("oj_autoscaler_workers", "Worker processes by state", ["state"])
+DESIRED = Gauge("oj_autoscaler_desired_workers", "Worker count the last decision asked for")
+DECISIONS = Counter("oj_autoscaler_decisions_total", "Scaling decisions", ["action", "reason"])
+QUEUED = Gauge("oj_autoscaler_queued", "Queued submissions (sampled)")
+OLDEST_QUEUED = Gauge("oj_autoscaler_oldest_queued_seconds", "Age of the oldest queued submission (sampled)")
+CPU_BUSY = Gauge("oj_autoscaler_cpu_busy_ratio", "Host CPU busy fraction over the last interval")
+
+
+def sample_queue(conn, worker_ids):
+    """(queued, oldest queued age in s, submissions our workers are running)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+          SELECT COUNT(*) FILTER (WHERE status='queued'),
+                 COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE status='queued')), 0),
+                 COUNT(*) FILTER (WHERE status='running' AND claimed_by = ANY(%s))
+          FROM submissions
+          WHERE status IN ('queued','running')
+        """, (worker_ids,))
+        queued, oldest, running = cur.fetchone()
+    conn.rollback()
+    return queued, float(oldest), running
+
+
+class CpuSampler:
+    """Busy fraction of all CPUs between calls, from /proc/stat."""
+
+    def __init__(self):
+        self.last = self._read()
+
+    @staticmethod
+    def _read():
+        with open("/proc/stat") as f:
+            fields = [int(x) for x in f.readline().split()[1:]]
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        return sum(fields), idle
+
+    def busy(self) -> float:
+        total, idle = self._read()
+        d_total, d_idle = total - self.last[0], idle - self.last[1]
+        self.last = (total, idle)
+        return 1.0 - d_idle / d_total if d_total > 0 else 0.0
+
+
+def decide(n, queued, oldest_s, running, cpu_busy):
+    """Target worker count and reason for this sample, before hysteresis."""
+    if n < MIN_WORKERS:
+        return MIN_WORKERS, "below_min"
+    if queued > QUEUE_PER_SLOT * SLOTS * n or (queued and oldest_s > MAX_AGE_S):
+        if n >= MAX_WORKERS:
+            return n, "at_max"
+        if cpu_busy >= CPU_MAX:
+            return n, "cpu_saturated"
+        want = math.ceil((running + queued) / (SLOTS * (1 + QUEUE_PER_SLOT)))
+        return min(MAX_WORKERS, n + STEP, max(n + 1, want)), "queue"
+    if n > MIN_WORKERS and queued == 0 and running <= SLOTS * (n - 1):
+        return n - 1, "idle"
+    return n, "steady"
+
+
+class Autoscaler:
+    def __init__(self):
+        self.procs: dict[int, subprocess.Popen] = {}  # n -> 실행 중인 워커
+        self.retiring: dict[int, subprocess.Popen] = {}  # SIGTERM 받고 채점 마무리 중
+        self.pressure_since = None
+        self.idle_since = None
+        self.stop = threading.Event()
+
+    def worker_id(self, n):
+        return f"{ID_PREFIX}-{n}"
+
+    def spawn(self):
+        n = next(i for i in range(len(self.procs) + len(self.retiring) + 1)
+                 if i not in self.procs and i not in self.retiring)
+        env = dict(os.environ, WORKER_ID=self.worker_id(n), WORKER_SLOTS=str(SLOTS))
+        if WORKER_METRICS_PORT:
+            # 워커마다 포트 하나: n을 id와 함께 재사용하니 scrape 대상도 같은 워커를 가리킨다
+            env["WORKER_METRICS_PORT"] = str(WORKER_METRICS_PORT + n)
+        self.procs[n] = subprocess.Popen([sys.executable, WORKER_SCRIPT], cwd=os.path.dirname(WORKER_SCRIPT), env=env)
+
+    def retire(self):
+        n = max(self.procs)
+        proc = self.procs.pop(n)
+        proc.send_signal(signal.SIGTERM)
+        self.retiring[n] = proc
+
+    def reap(self):
+        for group in (self.procs, self.retiring):
+            for n, proc in list(group.items()):
+                code = proc.poll()
+                if code is not None:
+                    del group[n]
+                    if group is self.procs:
+                        print(f"[autoscaler] {self.worker_id(n)} exited unexpectedly ({code})", flush=True)
+        WORKERS.labels(state="running").set(len(self.procs))
+        WORKERS.labels(state="retiring").set(len(self.retiring))
+
+    def tick(self, conn, cpu):
+        self.reap()
+        n = len(self.procs)
+        queued, oldest_s, running = sample_queue(conn, [self.worker_id(i) for i in self.procs])
+        busy = cpu.busy()
+        QUEUED.set(queued)
+        OLDEST_QUEUED.set(oldest_s)
+        CPU_BUSY.set(busy)
+        target, reason = decide(n, queued, oldest_s, running, busy)
+        DESIRED.set(target)
+
+        now = time.monotonic()
+        self.pressure_since = (self.pressure_since or now) if target > n else None
+        self.idle_since = (self.idle_since or now) if target < n else None
+        if target > n and (reason == "below_min" or now - self.pressure_since >= UP_AFTER_S):
+            action = "up"
+            for _ in range(target - n):
+                self.spawn()
+        elif target < n and now - self.idle_since >= DOWN_AFTER_S:
+            action = "down"
+            self.retire()
+        else:
+            action = "hold"
+        DECISIONS.labels(action=action, reason=reason).inc()
+        if action != "hold":
+            self.pressure_since = self.idle_since = None
+            print(f"[autoscaler] {action} ({reason}): {n} -> {len(self.procs)} workers; "
+                  f"queued={queued} oldest={oldest_s:.1f}s running={running} cpu={busy:.0%}", flush=True)
+
+    def shutdown(self):
+        """Retire every worker and wait for them to finish their submissions."""
+        for proc in self.procs.values():
+            proc.send_signal(signal.SIGTERM)
+        self.retiring.update(self.procs)
+        self.procs.clear()
+        for proc in self.retiring.values():
+            proc.wait()
+        self.retiring.clear()
+
+
+def main():
+    port = int(os.getenv("AUTOSCALE_METRICS_PORT") or 0)
+    if port:
+        start_http_server(port, addr=os.getenv("AUTOSCALE_METRICS_ADDR", "127.0.0.1"))
+    scaler = Autoscaler()
+    signal.signal(signal.SIGTERM, lambda *_: scaler.stop.set())
+    signal.signal(signal.SIGINT, lambda *_: scaler.stop.set())
+    print(f"[autoscaler] {MIN_WORKERS}..{MAX_WORKERS} workers x {SLOTS} slot(s)", flush=True)
+
+    conn = None
+    cpu = CpuSampler()
+    try:
+        while not scaler.stop.is_set():
+            try:
+                conn = conn or psycopg2.connect(DSN)
+                scaler.tick(conn, cpu)
+            except psycopg2.Error as e:
+                # DB가 잠깐 끊겨도 돌고 있는 워커는 그대로 두고 다음 주기에 다시 연결
+                print(f"[autoscaler] sample failed: {e}", flush=True)
+                if conn is not None:
+                    conn.close()
+                conn = None
+            scaler.stop.wait(INTERVAL_S)
+    finally:
+        scaler.shutdown()
+        if conn is not None:
+            conn.close()
+    print("[autoscaler] stopped", flush=True)
+
+
+if __name__ == "__main__":
+    main()
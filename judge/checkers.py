@@ -0,0 +1,248 @@
+"""Output checkers, selected per problem (problems.checker / checker_args / checker_source).
+
+    exact      stdout: out.strip() == expected.strip(); answer(): result == expected  (default)
+    tokens     whitespace-insensitive token compare
+    float      tokens, numbers compared with {"abs": 1e-6, "rel": 1e-6} tolerance (either passes)
+    unordered  stdout: lines as a multiset (whitespace-normalized, blank lines ignored);
+               answer(): a top-level list compared as a multiset
+    special    teacher-written Python `check(input, expected, output)` run in a warm process
+
+Token checkers walk both strings with a regex iterator and stop at the first
+mismatch; they never build token lists for the whole output.
+
+The special judge is started once per checker source and kept alive across
+testcases and submissions (per worker slot thread, since a process talks to
+one caller at a time); each case is one JSON line each way. check() returns
+a bool (or a tuple whose first item is the bool). A crash, bad reply or timeout
+(JUDGE_CHECKER_TIMEOUT_MS) raises CheckerError, which the worker reports as
+system_error rather than blaming the submission.
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import re
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import Counter
+
+CHECKER_TIMEOUT_MS = int(os.getenv("JUDGE_CHECKER_TIMEOUT_MS", "5000"))
+CHECKER_PYTHON = os.getenv("JUDGE_CHECKER_PYTHON", os.getenv("JUDGE_PYTHON", "python"))
+
+_TOKEN = re.compile(r"\S+")
+
+
+class CheckerError(Exception):
+    pass
+
+
+def _tokens(text: str):
+    return (m.group() for m in _TOKEN.finditer(text))
+
+
+class Checker:
+    name = "exact"
+
+    def __init__(self, args: dict | None = None):
+        self.args = args or {}
+
+    def text(self, output: str, expected: str, input_text: str) -> bool:
+        return output.strip() == expected.strip()
+
+    def structured(self, actual, expected, input_data) -> bool:
+        """Both sides come out of json/msgpack decoding (dicts, lists, scalars; the
+        harness already turned tuples/sets into lists), so == matches the old
+        recursive normalize() while comparing in C."""
+        return actual == expected
+
+
+class TokenChecker(Checker):
+    name = "tokens"
+
+    def same_token(self, a: str, b: str) -> bool:
+        return a == b
+
+    def text(self, output, expected, input_text):
+        missing = object()
+        for a, b in itertools.zip_longest(_tokens(output), _tokens(expected), fillvalue=missing):
+            if a is missing or b is missing or not self.same_token(a, b):
+                return False
+        return True
+
+
+class FloatChecker(TokenChecker):
+    name = "float"
+
+    def __init__(self, args=None):
+        super().__init__(args)
+        self.abs_eps = float(self.args.get("abs", 1e-6))
+        self.rel_eps = float(self.args.get("rel", 1e-6))
+
+    def near(self, a: float, b: float) -> bool:
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        diff = abs(a - b)
+        return diff <= self.abs_eps or diff <= self.rel_eps * abs(b)
+
+    def same_token(self, a, b):
+        if a == b:
+            return True
+        try:
+            return self.near(float(a), float(b))
+        except ValueError:
+            return False
+
+    def structured(self, actual, expected, input_data):
+        stack = [(actual, expected)]
+        while stack:
+            a, b = stack.pop()
+            if _is_number(a) and _is_number(b):
+                if not self.near(float(a), float(b)):
+                    return False
+            elif isinstance(a, list) and isinstance(b, list):
+                if len(a) != len(b):
+                    return False
+                stack.extend(zip(a, b))
+            elif isinstance(a, dict) and isinstance(b, dict):
+                if a.keys() != b.keys():
+                    return False
+                stack.extend((a[k], b[k]) for k in a)
+            elif a != b:
+                return False
+        return True
+
+
+def _is_number(x) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+class UnorderedChecker(Checker):
+    name = "unordered"
+
+    def text(self, output, expected, input_text):
+        def lines(text):
+            return Counter(" ".join(line.split()) for line in text.splitlines() if line.strip())
+        return lines(output) == lines(expected)
+
+    def structured(self, actual, expected, input_data):
+        if not (isinstance(actual, list) and isinstance(expected, list)):
+            return actual == expected
+        if len(actual) != len(expected):
+            return False
+        try:
+            return Counter(actual) == Counter(expected)
+        except TypeError:
+            # 리스트/딕셔너리 원소: 정규화한 JSON 문자열로 비교
+            def canon(xs):
+                return sorted(json.dumps(x, sort_keys=True, ensure_ascii=False) for x in xs)
+            return canon(actual) == canon(expected)
+
+
+# ---------- special judge ----------
+SPECIAL_HARNESS = """
+import json, sys, importlib.util
+
+spec = importlib.util.spec_from_file_location("checker", sys.argv[1])
+checker = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(checker)
+out = sys.stdout
+sys.stdout = sys.stderr  # check() 안의 print가 프로토콜을 깨지 않도록
+
+for line in sys.stdin:
+    case = json.loads(line)
+    verdict = checker.check(case["input"], case["expected"], case["output"])
+    if isinstance(verdict, tuple):
+        verdict = verdict[0]
+    out.write(json.dumps({"ok": bool(verdict)}) + "\\n")
+    out.flush()
+"""
+
+
+class SpecialJudge(Checker):
+    name = "special"
+
+    def __init__(self, source: str, args=None):
+        super().__init__(args)
+        self.source = source
+        self.proc = None
+        self.dir = None
+
+    def _start(self):
+        self.dir = tempfile.mkdtemp(prefix="oj-checker-")
+        checker_path = os.path.join(self.dir, "checker.py")
+        harness_path = os.path.join(self.dir, "harness.py")
+        with open(checker_path, "w", encoding="utf-8") as f:
+            f.write(self.source)
+        with open(harness_path, "w", encoding="utf-8") as f:
+            f.write(SPECIAL_HARNESS)
+        self.proc = subprocess.Popen(
+            [CHECKER_PYTHON, harness_path, checker_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            cwd=self.dir,
+        )
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+        if self.dir is not None:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.dir = None
+
+    def check(self, input_data, expected, output) -> bool:
+        if self.proc is None or self.proc.poll() is not None:
+            self.close()
+            self._start()
+        line = json.dumps({"input": input_data, "expected": expected, "output": output}, ensure_ascii=False)
+        try:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+            ready, _, _ = select.select([self.proc.stdout], [], [], CHECKER_TIMEOUT_MS / 1000.0)
+            if not ready:
+                raise CheckerError(f"checker timed out after {CHECKER_TIMEOUT_MS} ms")
+            reply = self.proc.stdout.readline()
+            if not reply:
+                raise CheckerError("checker exited")
+            return bool(json.loads(reply)["ok"])
+        except (OSError, ValueError, KeyError) as e:
+            self.close()
+            raise CheckerError(f"checker failed: {e}") from e
+        except CheckerError:
+            self.close()
+            raise
+
+    def text(self, output, expected, input_text):
+        return self.check(input_text, expected, output)
+
+    def structured(self, actual, expected, input_data):
+        return self.check(input_data, expected, actual)
+
+
+_CHECKERS = {cls.name: cls for cls in (Checker, TokenChecker, FloatChecker, UnorderedChecker)}
+_local = threading.local()
+MAX_SPECIAL_JUDGES = 8  # 슬롯당 유지할 warm 체커 프로세스 수
+
+
+def for_problem(kind: str | None, args: dict | None = None, source: str | None = None) -> Checker:
+    if kind == "special":
+        if not source:
+            raise CheckerError("special checker has no source")
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        judges = _local.__dict__.setdefault("judges", {})
+        judge = judges.pop(key, None)
+        if judge is None:
+            judge = SpecialJudge(source, args)
+            if len(judges) >= MAX_SPECIAL_JUDGES:
+                judges.pop(next(iter(judges))).close()
+        judges[key] = judge  # 최근 사용 순서 유지
+        return judge
+    return _CHECKERS.get(kind or "exact", Checker)(args)
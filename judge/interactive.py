@@ -0,0 +1,227 @@
+"""Interactive testcases: relay between the submission and a teacher's interactor.
+
+The worker sits between the two processes and forwards bytes with one
+`selectors` loop (no thread per pipe), which lets it enforce:
+
+- a total wall-clock limit (the testcase's timeout_ms), and
+- a per-turn limit: once the interactor has sent the submission something,
+  the submission must answer within turn_ms.
+
+The interactor is a Python program run as `interactor.py <input> <expected>`
+(files holding the testcase's input_text / expected_text). It talks to the
+submission on stdin/stdout and decides the verdict by exit code:
+0 = accepted, 1 = wrong answer, anything else = judge failure. Its stderr is
+kept as feedback.
+"""
+import fcntl
+import os
+import selectors
+import shutil
+import subprocess
+import tempfile
+import time
+
+from checkers import CHECKER_PYTHON
+
+OUTPUT_LIMIT = 64 * 1024  # 저장할 transcript / stderr 최대 크기
+
+
+class _Capture:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def add(self, data: bytes):
+        room = OUTPUT_LIMIT - self.size
+        if room > 0:
+            self.parts.append(data[:room])
+            self.size += min(len(data), room)
+
+    def text(self) -> str:
+        return b"".join(self.parts).decode("utf-8", "replace")
+
+
+def _nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+
+def run_interactive(user_cmd, interactor_cmd, timeout_ms: int, turn_ms: int | None = None, cwd=None):
+    """Run one interactive case. Returns (verdict, elapsed_ms, transcript, stderr).
+
+    verdict is ok | wa | tle | re | se; transcript is what the submission wrote.
+    """
+    user = subprocess.Popen(user_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    inter = subprocess.Popen(interactor_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    transcript, user_err, inter_err = _Capture(), _Capture(), _Capture()
+
+    # fd -> (읽은 데이터를 보낼 파이프 or None, 캡처)
+    sel = selectors.DefaultSelector()
+    routes = {
+        user.stdout: (inter.stdin, transcript),
+        inter.stdout: (user.stdin, None),
+        user.stderr: (None, user_err),
+        inter.stderr: (None, inter_err),
+    }
+    pending = {inter.stdin: bytearray(), user.stdin: bytearray()}
+    closing = set()  # 버퍼를 다 보내면 닫을 쓰기 파이프
+    for pipe in list(routes) + list(pending):
+        _nonblocking(pipe.fileno())
+    for pipe in routes:
+        sel.register(pipe, selectors.EVENT_READ)
+
+    start = time.monotonic()
+    deadline = start + timeout_ms / 1000.0
+    turn_s = (turn_ms or timeout_ms) / 1000.0
+    waiting_since = None  # 인터랙터가 보낸 뒤 제출 코드의 응답을 기다리기 시작한 시각
+    timed_out = False
+
+    def close_writer(pipe):
+        pending[pipe].clear()
+        closing.discard(pipe)
+        try:
+            sel.unregister(pipe)
+        except KeyError:
+            pass
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+    def flush(pipe):
+        buf = pending[pipe]
+        try:
+            n = os.write(pipe.fileno(), buf)
+        except BlockingIOError:
+            return
+        except (BrokenPipeError, ValueError, OSError):
+            close_writer(pipe)  # 상대가 이미 종료됨
+            return
+        del buf[:n]
+        if not buf:
+            sel.unregister(pipe)
+            if pipe in closing:
+                close_writer(pipe)
+
+    def send(pipe, data):
+        if pipe.closed:
+            return
+        buf = pending[pipe]
+        was_empty = not buf
+        buf += data
+        if was_empty:
+            sel.register(pipe, selectors.EVENT_WRITE)
+            flush(pipe)
+
+    def finish_writes(pipe):
+        if pipe.closed:
+            return
+        if pending[pipe]:
+            closing.add(pipe)
+        else:
+            close_writer(pipe)
+
+    try:
+        while any(p for p in routes if not p.closed):
+            now = time.monotonic()
+            limit = deadline
+            if waiting_since is not None:
+                limit = min(limit, waiting_since + turn_s)
+            if now >= limit:
+                timed_out = True
+                break
+            for key, _ in sel.select(timeout=limit - now):
+                pipe = key.fileobj
+                if pipe in pending:
+                    flush(pipe)
+                    continue
+                try:
+                    data = os.read(pipe.fileno(), 65536)
+                except BlockingIOError:
+                    continue
+                target, capture = routes[pipe]
+                if not data:  # EOF
+                    sel.unregister(pipe)
+                    pipe.close()
+                    if target is not None:
+                        finish_writes(target)
+                    if pipe is user.stdout:
+                        waiting_since = None
+                    continue
+                if capture is not None:
+                    capture.add(data)
+                if target is not None:
+                    send(target, data)
+                if pipe is user.stdout:
+                    waiting_since = None
+                elif pipe is inter.stdout and not user.stdout.closed:
+                    waiting_since = time.monotonic()
+    finally:
+        sel.close()
+        if timed_out:
+            user.kill()
+            inter.kill()
+        for p in (user, inter):
+            remaining = max(0.1, deadline - time.monotonic())
+            try:
+                p.wait(timeout=remaining)
+            except subprocess.TimeoutExpired:
+                p.kill()
+                p.wait()
+                if p is user:
+                    timed_out = True
+        for p in (user, inter):
+            for pipe in (p.stdin, p.stdout, p.stderr):
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+    elapsed = int((time.monotonic() - start) * 1000)
+    stderr = user_err.text()
+    feedback = inter_err.text().strip()
+    if feedback:
+        stderr = f"{stderr}\n[interactor] {feedback}".lstrip()
+
+    if timed_out:
+        verdict = "tle"
+    elif inter.returncode == 1:
+        verdict = "wa"
+    elif inter.returncode != 0:
+        verdict = "se"
+    elif user.returncode != 0:
+        verdict = "re"
+    else:
+        verdict = "ok"
+    return verdict, elapsed, transcript.text(), stderr
+
+
+class Interactor:
+    """A problem's interactor source, written once per submission and run for each testcase."""
+
+    def __init__(self, source: str, turn_ms: int | None = None):
+        self.dir = tempfile.mkdtemp(prefix="oj-interactor-")
+        self.path = os.path.join(self.dir, "interactor.py")
+        self.turn_ms = turn_ms
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(source)
+
+    def run(self, build, tc):
+        """Run testcase tc against a languages.Build. Same return value as run_interactive."""
+        # 정답 파일은 제출 코드의 작업 디렉터리(td)가 아닌 인터랙터 디렉터리에 둔다
+        input_path = os.path.join(self.dir, "input.txt")
+        expected_path = os.path.join(self.dir, "expected.txt")
+        with tempfile.TemporaryDirectory() as td:
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write(tc["input_text"])
+            with open(expected_path, "w", encoding="utf-8") as f:
+                f.write(tc["expected_text"])
+            return run_interactive(
+                build.command(),
+                [CHECKER_PYTHON, self.path, input_path, expected_path],
+                build.tier.timeout_ms(tc["timeout_ms"]),
+                build.tier.timeout_ms(self.turn_ms) if self.turn_ms else None,
+                cwd=td,
+            )
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,397 @@
+"""Language registry and compiled-artifact cache for the judge worker.
+
+Each submission is prepared once (`prepare`) before its testcase loop: the
+source is written into a cache directory keyed by sha256(language toolchain
++ source) and, for compiled languages, built there. The resulting `Build` is
+reused for every testcase, and an identical resubmission (same language and
+source) skips the compile entirely. Compile failures are cached too, so a
+broken program resubmitted as-is fails fast with the same message.
+
+Toolchains are configured by env (JUDGE_PYTHON, JUDGE_PYPY, JUDGE_CC,
+JUDGE_CXX, JUDGE_JAVAC, JUDGE_JAVA). Java sources must declare `public class
+Main`.
+
+Execution tiers: a Build runs under one tier, which picks the interpreter for
+Python sources and scales every testcase's timeout_ms by the tier's time
+factor (JUDGE_TIER_TIME_FACTORS, e.g. "cpython=1.5,pypy=1"):
+
+- cpython       plain `python`
+- cpython-fast  `python -I -S -X frozen_modules=on`: isolated mode, no site
+                import (no site-packages!), frozen stdlib; ~2x faster startup
+- pypy          `pypy3` (JIT; best for loop-heavy solutions)
+
+Compiled languages have a single tier named after the language.
+
+Python bytecode: prepare() also byte-compiles Main.py (and the answer()
+harness) with the tier's interpreter into `<name>.<interpreter>.pyc` in the
+build directory, so testcases run the code object instead of re-parsing the
+source on every launch. The first build doubles as a syntax check: a
+SyntaxError becomes a cached CompileError. If the interpreter is missing the
+build falls back to running the source. JUDGE_PYTHON_BYTECODE=0 disables it.
+
+A toolchain that is not installed on this machine raises ToolchainMissing, not
+CompileError: it is the judge's fault, not the submission's. available() lists
+the languages whose default tier can run here (the worker's default
+WORKER_LANGUAGES).
+"""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import transport
+from runner_py import HARNESS_CODE, run_process
+
+CACHE_DIR = os.getenv("JUDGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "oj-judge-cache"))
+CACHE_MAX_ENTRIES = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", "512"))
+COMPILE_TIMEOUT_MS = int(os.getenv("JUDGE_COMPILE_TIMEOUT_MS", "10000"))
+COMPILE_OUTPUT_LIMIT = 8000  # 컴파일 에러 메시지는 앞부분만 저장
+BYTECODE = os.getenv("JUDGE_PYTHON_BYTECODE", "1") == "1"
+
+def _parse_factors(spec: str) -> dict[str, float]:
+    factors = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            factors[name.strip()] = float(value)
+    return factors
+
+
+TIME_FACTORS = _parse_factors(os.getenv("JUDGE_TIER_TIME_FACTORS", ""))
+
+# run_server.py 가 warm.WarmPool 을 설정하면 Python stdin 실행은 미리 띄운 인터프리터를 쓴다 (채점 워커는 None)
+warm_pool = None
+
+HARNESS_NAME = "invoke_answer.py"
+ERROR_NAME = "compile_error.txt"
+
+# argv: <source> <pyc> <dfile>; 문법 에러면 traceback 형식 메시지를 stderr로, exit 3
+PY_COMPILE_CODE = """
+import py_compile, sys
+try:
+    py_compile.compile(sys.argv[1], cfile=sys.argv[2], dfile=sys.argv[3], doraise=True)
+except py_compile.PyCompileError as e:
+    sys.stderr.write(e.msg)
+    sys.exit(3)
+"""
+SYNTAX_ERROR_EXIT = 3
+
+
+class CompileError(Exception):
+    def __init__(self, output: str, elapsed_ms: int = 0):
+        super().__init__(output)
+        self.output = output
+        self.elapsed_ms = elapsed_ms
+
+
+class ToolchainMissing(Exception):
+    """The compiler/interpreter a build needs is not installed on this judge."""
+
+
+class Tier:
+    """Interpreter (argv prefix replacing run[0]; None = run as-is) and timeout multiplier."""
+
+    def __init__(self, name, interpreter=None):
+        self.name = name
+        self.interpreter = interpreter
+        self.time_factor = TIME_FACTORS.get(name, 1.0)
+
+    def timeout_ms(self, timeout_ms: int) -> int:
+        return max(1, int(timeout_ms * self.time_factor))
+
+
+_PYTHON = os.getenv("JUDGE_PYTHON", "python")
+_PYPY = os.getenv("JUDGE_PYPY", "pypy3")
+
+TIERS = {
+    tier.name: tier
+    for tier in (
+        Tier("cpython", [_PYTHON]),
+        Tier("cpython-fast", [_PYTHON, "-I", "-S", "-X", "frozen_modules=on"]),
+        Tier("pypy", [_PYPY]),
+        Tier("c"),
+        Tier("cpp"),
+        Tier("java"),
+    )
+}
+
+
+class Language:
+    """How to build and run one language.
+
+    `compile` runs inside the build directory (relative paths keep temp dirs out
+    of compiler messages); `{dir}` in `run` is replaced with the build directory.
+    `tiers` lists the allowed execution tiers, default first.
+    """
+
+    def __init__(self, name, source_name, run, compile=None, answer_harness=False, tiers=None, bytecode=False):
+        self.name = name
+        self.source_name = source_name
+        self.run = run
+        self.compile = compile
+        self.answer_harness = answer_harness  # answer(...) 형식의 JSON 테스트케이스 지원 여부
+        self.tiers = tiers or (name,)
+        self.bytecode = bytecode  # Python 소스: 티어 인터프리터로 .pyc를 미리 만든다
+
+    def resolve_tier(self, requested: str | None) -> Tier:
+        """Requested tier if this language supports it, the language default otherwise."""
+        return TIERS[requested if requested in self.tiers else self.tiers[0]]
+
+    def tools(self, tier: Tier) -> list[str]:
+        """Executables a build under `tier` needs on this machine."""
+        tools = [self.compile[0]] if self.compile else []
+        program = (tier.interpreter or self.run)[0]
+        if "{dir}" not in program:  # 빌드 산출물이 아니라 설치된 실행 파일
+            tools.append(program)
+        return tools
+
+    def cache_key(self, source_code: str) -> str:
+        h = hashlib.sha256()
+        h.update(json.dumps([self.name, self.compile, self.run]).encode())
+        h.update(b"\0")
+        h.update(source_code.encode("utf-8"))
+        return h.hexdigest()
+
+
+LANGUAGES = {
+    lang.name: lang
+    for lang in (
+        Language(
+            "python", "Main.py",
+            run=[_PYTHON, "{dir}/Main.py"],
+            answer_harness=True,
+            tiers=("cpython", "cpython-fast", "pypy"),
+            bytecode=True,
+        ),
+        Language(
+            "pypy", "Main.py",
+            run=[_PYPY, "{dir}/Main.py"],
+            answer_harness=True,
+            tiers=("pypy",),
+            bytecode=True,
+        ),
+        Language(
+            "c", "Main.c",
+            compile=[os.getenv("JUDGE_CC", "gcc"), "-O2", "-std=gnu11", "-o", "main", "Main.c", "-lm"],
+            run=["{dir}/main"],
+        ),
+        Language(
+            "cpp", "Main.cpp",
+            compile=[os.getenv("JUDGE_CXX", "g++"), "-O2", "-std=gnu++17", "-o", "main", "Main.cpp"],
+            run=["{dir}/main"],
+        ),
+        Language(
+            "java", "Main.java",
+            compile=[os.getenv("JUDGE_JAVAC", "javac"), "-encoding", "UTF-8", "-d", ".", "Main.java"],
+            run=[os.getenv("JUDGE_JAVA", "java"), "-Xss64m", "-cp", "{dir}", "Main"],
+        ),
+    )
+}
+
+
+def available() -> list[str]:
+    """Languages whose default tier has its toolchain installed here."""
+    return [
+        name for name, language in LANGUAGES.items()
+        if all(shutil.which(tool) for tool in language.tools(language.resolve_tier(None)))
+    ]
+
+
+def _fill(cmd, build_dir):
+    return [part.replace("{dir}", build_dir) for part in cmd]
+
+
+class Build:
+    """A prepared submission: source (and binary) in the cache, ready to run per testcase."""
+
+    def __init__(self, language: Language, build_dir: str, compile_ms: int, cached: bool, tier: Tier):
+        self.language = language
+        self.dir = build_dir
+        self.compile_ms = compile_ms
+        self.cached = cached
+        self.tier = tier
+
+    def _interpreter(self):
+        return self.tier.interpreter or self.language.run[:1]
+
+    def _script(self, name: str) -> str:
+        """Path to run for a Python file in the build: its .pyc for this interpreter if present."""
+        pyc = os.path.join(self.dir, _pyc_name(name, self._interpreter()))
+        return pyc if os.path.exists(pyc) else os.path.join(self.dir, name)
+
+    def command(self) -> list[str]:
+        """argv that runs the program on stdin/stdout."""
+        cmd = _fill(self.language.run, self.dir)
+        if self.tier.interpreter:
+            cmd = self.tier.interpreter + cmd[1:]
+        if self.language.bytecode:
+            cmd = cmd[:-1] + [self._script(self.language.source_name)]
+        return cmd
+
+    def run(self, stdin_data: str, timeout_ms: int):
+        """timeout_ms is the testcase limit; the tier's time factor is applied here."""
+        if warm_pool is not None and self.language.bytecode:
+            return warm_pool.run(
+                self._interpreter(), self._script(self.language.source_name), stdin_data, self.tier.timeout_ms(timeout_ms),
+            )
+        with tempfile.TemporaryDirectory() as td:
+            return run_process(self.command(), stdin_data, self.tier.timeout_ms(timeout_ms), cwd=td)
+
+    def run_answer(self, payload, timeout_ms: int, raw_input: str | None = None):
+        """Run answer(...) on payload. Returns (code, stdout, stderr, elapsed_ms, reply_blob).
+
+        raw_input is the testcase's JSON text, sent as-is on the JSON transport.
+        reply_blob is None unless the msgpack file transport was used; decode
+        the reply with transport.decode_reply(stdout, reply_blob).
+        """
+        interpreter = self._interpreter()
+        cmd = interpreter + [self._script(HARNESS_NAME), self._script(self.language.source_name)]
+        if raw_input is None:
+            raw_input = json.dumps(payload, ensure_ascii=False)
+        timeout_ms = self.tier.timeout_ms(timeout_ms)
+        with tempfile.TemporaryDirectory() as td:
+            paths = transport.write_input(td, payload) if transport.use_msgpack(interpreter, len(raw_input)) else None
+            if paths is None:
+                return run_process(cmd, raw_input, timeout_ms, cwd=td) + (None,)
+            code, out, err, elapsed = run_process(cmd + list(paths), "", timeout_ms, cwd=td)
+            return code, out, err, elapsed, transport.read_reply_blob(td)
+
+
+def prepare(language_name: str, source_code: str, tier: str | None = None) -> Build:
+    """Return a runnable Build, compiling at most once per (language, source).
+
+    Raises CompileError (the submission's fault) or ToolchainMissing (this judge's).
+    """
+    language = LANGUAGES.get(language_name)
+    if language is None:
+        raise ToolchainMissing(f"unsupported language on this judge: {language_name}")
+    run_tier = language.resolve_tier(tier)
+    missing = [tool for tool in language.tools(run_tier) if not shutil.which(tool)]
+    if missing:
+        raise ToolchainMissing(f"{language.name} ({run_tier.name}) needs {', '.join(missing)}, "
+                               "which is not installed on this judge")
+
+    build_dir = os.path.join(CACHE_DIR, language.cache_key(source_code))
+    if os.path.isdir(build_dir):
+        os.utime(build_dir)  # LRU 정리용
+        _raise_cached_error(build_dir)
+        compile_ms = _ensure_bytecode(language, build_dir, build_dir, run_tier)
+        return Build(language, build_dir, compile_ms, cached=True, tier=run_tier)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=CACHE_DIR)
+    try:
+        with open(os.path.join(tmp_dir, language.source_name), "w", encoding="utf-8") as f:
+            f.write(source_code)
+        if language.answer_harness:
+            with open(os.path.join(tmp_dir, HARNESS_NAME), "w", encoding="utf-8") as f:
+                f.write(HARNESS_CODE)
+        compile_ms = 0
+        if language.compile:
+            # 산출물에 빌드 경로가 박히지 않으니 임시 디렉터리에서 빌드 후 rename 해도 된다
+            compile_ms = _compile(language, tmp_dir)
+        # .pyc에는 traceback용으로 최종 경로(build_dir)를 기록한다
+        compile_ms += _ensure_bytecode(language, tmp_dir, build_dir, run_tier, syntax_check=True)
+        try:
+            os.rename(tmp_dir, build_dir)
+        except OSError:
+            # 다른 워커가 같은 소스를 먼저 빌드함
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            _prune()
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _raise_cached_error(build_dir, compile_ms)
+    return Build(language, build_dir, compile_ms, cached=False, tier=run_tier)
+
+
+def _compile(language: Language, build_dir: str) -> int:
+    start = time.time()
+    try:
+        proc = subprocess.run(
+            _fill(language.compile, build_dir),
+            capture_output=True,
+            text=True,
+            timeout=COMPILE_TIMEOUT_MS / 1000.0,
+            cwd=build_dir,
+        )
+    except FileNotFoundError:
+        # 툴체인이 없는 워커: 캐시하지 않는다 (설치 후 다시 채점 가능하도록)
+        raise ToolchainMissing(f"{language.name} toolchain is not installed on this judge ({language.compile[0]})")
+    except subprocess.TimeoutExpired:
+        output = f"compilation timed out after {COMPILE_TIMEOUT_MS} ms"
+        returncode = -1
+    else:
+        output = (proc.stderr or proc.stdout)
+        returncode = proc.returncode
+    elapsed = int((time.time() - start) * 1000)
+    if returncode != 0:
+        with open(os.path.join(build_dir, ERROR_NAME), "w", encoding="utf-8") as f:
+            f.write(output[:COMPILE_OUTPUT_LIMIT] or f"compiler exited with {returncode}")
+    return elapsed
+
+
+def _pyc_name(name: str, interpreter: list[str]) -> str:
+    # 인터프리터마다 bytecode 형식(magic)이 다르다; cpython / cpython-fast 는 같은 파일을 쓴다
+    tag = hashlib.sha256(interpreter[0].encode()).hexdigest()[:12]
+    return f"{name}.{tag}.pyc"
+
+
+def _ensure_bytecode(language: Language, work_dir: str, final_dir: str, tier: Tier, syntax_check=False) -> int:
+    """Byte-compile the Python files in work_dir for tier's interpreter (once). Returns elapsed ms.
+
+    With syntax_check, a SyntaxError is written to ERROR_NAME like a compiler
+    error; otherwise any failure just leaves the build running from source.
+    """
+    if not (BYTECODE and language.bytecode):
+        return 0
+    interpreter = tier.interpreter or language.run[:1]
+    names = [language.source_name] + ([HARNESS_NAME] if language.answer_harness else [])
+    start = time.time()
+    for name in names:
+        pyc_path = os.path.join(work_dir, _pyc_name(name, interpreter))
+        if os.path.exists(pyc_path):
+            continue
+        # 동시에 같은 빌드를 쓰는 워커가 있으니 임시 이름으로 만든 뒤 replace
+        tmp_path = f"{pyc_path}.{os.getpid()}.tmp"
+        try:
+            proc = subprocess.run(
+                interpreter + ["-c", PY_COMPILE_CODE, os.path.join(work_dir, name), tmp_path,
+                               os.path.join(final_dir, name)],
+                capture_output=True,
+                text=True,
+                timeout=COMPILE_TIMEOUT_MS / 1000.0,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return int((time.time() - start) * 1000)  # 인터프리터 없음 등: 소스로 실행
+        if proc.returncode != 0:
+            if syntax_check and name == language.source_name and proc.returncode == SYNTAX_ERROR_EXIT:
+                with open(os.path.join(work_dir, ERROR_NAME), "w", encoding="utf-8") as f:
+                    f.write(proc.stderr.replace(final_dir + os.sep, "")[:COMPILE_OUTPUT_LIMIT])
+            break
+        os.replace(tmp_path, pyc_path)
+    return int((time.time() - start) * 1000)
+
+
+def _raise_cached_error(build_dir: str, elapsed_ms: int = 0):
+    path = os.path.join(build_dir, ERROR_NAME)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            raise CompileError(f.read(), elapsed_ms)
+
+
+def _prune():
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.is_dir() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return
+    if len(entries) <= CACHE_MAX_ENTRIES:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for e in entries[: len(entries) - CACHE_MAX_ENTRIES]:
+        shutil.rmtree(e.path, ignore_errors=True)
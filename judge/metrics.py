@@ -0,0 +1,66 @@
+"""Prometheus metrics for the judge worker.
+
+The exporter is started by `worker.main()` when WORKER_METRICS_PORT is set
+(e.g. 9101) and serves the default registry on http://<addr>:<port>/metrics.
+Recording is cheap (in-process counters), so it can stay on in production.
+"""
+import os
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# 채점 단계는 수 ms ~ 수 초 범위라 기본 버킷보다 촘촘하게 잡는다
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUEUE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+CLAIMS = Counter("oj_judge_claims_total", "Submissions claimed by this worker")
+EMPTY_POLLS = Counter("oj_judge_empty_polls_total", "Claim attempts that found no queued submission")
+SUBMISSIONS = Counter("oj_judge_submissions_total", "Judged submissions by final status", ["status"])
+VERDICTS = Counter("oj_judge_testcase_verdicts_total", "Per-testcase verdicts", ["verdict"])
+
+STAGE_SECONDS = Histogram(
+    "oj_judge_stage_seconds", "Time spent per judge stage", ["stage"], buckets=STAGE_BUCKETS,
+)
+JUDGE_SECONDS = Histogram(
+    "oj_judge_submission_seconds", "Claim-to-finalize time per submission", buckets=STAGE_BUCKETS,
+)
+QUEUE_AGE = Histogram(
+    "oj_judge_queue_age_seconds", "Age of a submission (created_at -> claim) when claimed", buckets=QUEUE_BUCKETS,
+)
+
+QUEUE_DEPTH = Gauge("oj_judge_queue_depth", "Submissions per pending status (sampled)", ["status"])
+OLDEST_QUEUED = Gauge("oj_judge_oldest_queued_seconds", "Age of the oldest queued submission (sampled)")
+RUNNER_PROCESSES = Gauge("oj_judge_runner_processes", "Solution processes currently running")
+
+
+def start(port: int | None = None, addr: str | None = None) -> bool:
+    """Start the /metrics HTTP exporter. Returns False when no port is configured."""
+    port = port if port is not None else int(os.getenv("WORKER_METRICS_PORT") or 0)
+    if not port:
+        return False
+    start_http_server(port, addr=addr or os.getenv("WORKER_METRICS_ADDR", "0.0.0.0"))
+    return True
+
+
+@contextmanager
+def runner_process():
+    RUNNER_PROCESSES.inc()
+    try:
+        yield
+    finally:
+        RUNNER_PROCESSES.dec()
+
+
+def observe_submission(status: str, spans: dict, queue_age_s: float | None):
+    SUBMISSIONS.labels(status=status).inc()
+    for stage, secs in spans.items():
+        STAGE_SECONDS.labels(stage=stage).observe(secs)
+    JUDGE_SECONDS.observe(sum(v for k, v in spans.items() if k not in ("claim", "startup", "user")))
+    if queue_age_s is not None:
+        QUEUE_AGE.observe(queue_age_s)
+
+
+def set_queue_stats(queued: int, running: int, oldest_s: float | None):
+    QUEUE_DEPTH.labels(status="queued").set(queued)
+    QUEUE_DEPTH.labels(status="running").set(running)
+    OLDEST_QUEUED.set(oldest_s or 0)
@@ -0,0 +1,143 @@
+"""Run lane: execute code on public samples or custom stdin without grading or storing anything.
+
+    python run_server.py      # listens on JUDGE_RUN_ADDR:JUDGE_RUN_PORT (127.0.0.1:8100)
+
+The backend's POST /run forwards here; graded submissions keep going
+through the queue and worker.py. This process keeps the compile/bytecode
+cache and a pool of warm Python interpreters (warm.py) hot, and runs at most
+JUDGE_RUN_CONCURRENCY requests at once. Extra requests get 503 right away
+instead of queueing, so the lane stays low-latency.
+
+POST /run
+    {"language", "python_tier", "source_code",
+     "checker", "checker_args", "checker_source",            # for samples
+     "cases": [{"input_text", "expected_text" (null = custom input), "timeout_ms"}]}
+ -> {"status": "ok" | "compile_error", "compile_output",
+     "results": [{"verdict" (null for custom input), "time_ms", "stdout", "stderr"}]}
+
+Limits: at most JUDGE_RUN_MAX_CASES cases, each capped at JUDGE_RUN_TIMEOUT_MS,
+and stdout/stderr cut to JUDGE_RUN_OUTPUT_CHARS. When JUDGE_RUN_TOKEN is set,
+requests must send it in X-Run-Token.
+"""
+import hmac
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import checkers
+import languages
+import warm
+from worker import run_case
+
+load_dotenv()
+RUN_ADDR = os.getenv("JUDGE_RUN_ADDR", "127.0.0.1")
+RUN_PORT = int(os.getenv("JUDGE_RUN_PORT", "8100"))
+RUN_TOKEN = os.getenv("JUDGE_RUN_TOKEN", "")
+RUN_CONCURRENCY = int(os.getenv("JUDGE_RUN_CONCURRENCY", "4"))
+RUN_WARM = int(os.getenv("JUDGE_RUN_WARM", "2"))  # 인터프리터(티어)별로 미리 띄워 둘 프로세스 수
+RUN_MAX_CASES = int(os.getenv("JUDGE_RUN_MAX_CASES", "5"))
+RUN_TIMEOUT_MS = int(os.getenv("JUDGE_RUN_TIMEOUT_MS", "2000"))
+RUN_OUTPUT_CHARS = int(os.getenv("JUDGE_RUN_OUTPUT_CHARS", "8192"))
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+slots = threading.BoundedSemaphore(RUN_CONCURRENCY)
+
+
+def _cut(text):
+    if text is None or len(text) <= RUN_OUTPUT_CHARS:
+        return text
+    return f"{text[:RUN_OUTPUT_CHARS]}\n... [{len(text) - RUN_OUTPUT_CHARS} more characters]"
+
+
+def _checker(req):
+    # special 채점기는 요청마다 따로 띄운다 (warm 프로세스 하나를 여러 스레드가 공유하지 않도록)
+    if req.get("checker") == "special":
+        return checkers.SpecialJudge(req.get("checker_source") or "", req.get("checker_args"))
+    return checkers.for_problem(req.get("checker"), req.get("checker_args"))
+
+
+def execute(req: dict) -> dict:
+    try:
+        build = languages.prepare(req["language"], req["source_code"], req.get("python_tier"))
+    except languages.CompileError as e:
+        return {"status": "compile_error", "compile_output": e.output, "results": []}
+    except languages.ToolchainMissing as e:
+        return {"status": "system_error", "compile_output": str(e), "results": []}
+
+    checker = _checker(req)
+    results = []
+    try:
+        for case in req["cases"][:RUN_MAX_CASES]:
+            tc = {
+                "input_text": case.get("input_text") or "",
+                "expected_text": case.get("expected_text"),
+                "timeout_ms": min(int(case.get("timeout_ms") or RUN_TIMEOUT_MS), RUN_TIMEOUT_MS),
+            }
+            if tc["expected_text"] is None:
+                code, out, err, elapsed = build.run(tc["input_text"], tc["timeout_ms"])
+                verdict = None if code == 0 else ("tle" if code == 124 else "re")
+            else:
+                verdict, elapsed, out, err = run_case(build, checker, None, tc)
+            results.append({"verdict": verdict, "time_ms": elapsed, "stdout": _cut(out), "stderr": _cut(err)})
+    finally:
+        if isinstance(checker, checkers.SpecialJudge):
+            checker.close()
+    return {"status": "ok", "compile_output": None, "results": results}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _reply(self, code: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/run":
+            return self._reply(404, {"detail": "not found"})
+        if RUN_TOKEN and not hmac.compare_digest(self.headers.get("X-Run-Token", ""), RUN_TOKEN):
+            return self._reply(403, {"detail": "bad token"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._reply(413, {"detail": "request too large"})
+        try:
+            req = json.loads(self.rfile.read(length))
+        except ValueError:
+            req = None
+        if not isinstance(req, dict) or not isinstance(req.get("cases"), list) or not req.get("language") \
+                or not isinstance(req.get("source_code"), str):
+            return self._reply(400, {"detail": "bad request"})
+        if not slots.acquire(blocking=False):
+            return self._reply(503, {"detail": "busy"})
+        try:
+            return self._reply(200, execute(req))
+        except Exception as e:  # 실행기 오류는 요청 하나만 실패시킨다
+            print(f"[run] error: {e!r}", flush=True)
+            return self._reply(500, {"detail": "run failed"})
+        finally:
+            slots.release()
+
+    def log_message(self, fmt, *args):
+        pass  # 요청마다 stderr 로그를 남기지 않는다
+
+
+def main():
+    languages.warm_pool = warm.WarmPool(RUN_WARM)
+    default_python = languages.TIERS["cpython"].interpreter
+    languages.warm_pool.fill(default_python)
+    server = ThreadingHTTPServer((RUN_ADDR, RUN_PORT), Handler)
+    server.daemon_threads = True
+    print(f"[run] listening on {RUN_ADDR}:{RUN_PORT} (concurrency {RUN_CONCURRENCY}, warm {RUN_WARM})", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        languages.warm_pool.close()
+
+
+if __name__ == "__main__":
+    main()
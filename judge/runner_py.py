@@ -1,9 +1,14 @@
 import subprocess, tempfile, os, time, json, textwrap
 
 HARNESS_CODE = """
-import json, sys, importlib.util, contextlib, io
+import json, sys, importlib.util, contextlib, io, time
+
+_SCALARS = (int, float, str, bool, type(None))
 
 def convert(obj):
+    # 큰 평탄 리스트(수십만 개 정수 등)는 원소별 재귀 호출 없이 그대로 반환
+    if type(obj) is list and all(type(x) in _SCALARS for x in obj):
+        return obj
     if isinstance(obj, tuple):
         return [convert(x) for x in obj]
     if isinstance(obj, set):
@@ -15,13 +20,51 @@ def convert(obj):
     return obj
 
 def load_module():
-    spec = importlib.util.spec_from_file_location("user_main", "Main.py")
+    path = sys.argv[1] if len(sys.argv) > 1 else "Main.py"
+    spec = importlib.util.spec_from_file_location("user_main", path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
     return module
 
+def read_input():
+    # argv: Main.py [input.msgpack reply.bin] (see judge/transport.py)
+    if len(sys.argv) > 3:
+        import msgpack
+        with open(sys.argv[2], "rb") as f:
+            return msgpack.unpackb(f.read())
+    return json.loads(sys.stdin.read())
+
+def str_keys_only(obj):
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            if any(type(k) is not str for k in cur):
+                return False
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(x for x in cur if isinstance(x, (list, dict)))
+    return True
+
+def write_reply(payload):
+    if len(sys.argv) <= 3:
+        json.dump(payload, sys.stdout, ensure_ascii=False)
+        return
+    import msgpack
+    blob = None
+    # JSON은 dict 키를 문자열로 바꾸므로 그런 결과는 JSON으로 보내야 채점 결과가 같다
+    if str_keys_only(payload["result"]):
+        try:
+            blob = msgpack.packb(payload)
+        except (OverflowError, TypeError, ValueError):
+            blob = None
+    if blob is None:
+        blob = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    with open(sys.argv[3], "wb") as f:
+        f.write(blob)
+
 def main():
-    data = json.loads(sys.stdin.read())
+    data = read_input()
     if isinstance(data, dict):
         args = data.get("args", [])
         kwargs = data.get("kwargs", {})
@@ -32,6 +75,7 @@ def main():
         args = [data]
         kwargs = {}
 
+    start = time.perf_counter()
     module = load_module()
     if not hasattr(module, "answer"):
         raise AttributeError("answer function not found")
@@ -39,37 +83,42 @@ def main():
     buf = io.StringIO()
     with contextlib.redirect_stdout(buf):
         result = module.answer(*args, **kwargs)
+    user_ms = (time.perf_counter() - start) * 1000
 
-    payload = {"result": convert(result), "stdout": buf.getvalue()}
-    json.dump(payload, sys.stdout, ensure_ascii=False)
+    payload = {"result": convert(result), "stdout": buf.getvalue(), "user_ms": user_ms}
+    write_reply(payload)
 
 if __name__ == "__main__":
     main()
 """
 
-def run_python(source_code: str, stdin_data: str, timeout_ms: int):
+def run_process(cmd: list[str], stdin_data: str, timeout_ms: int, cwd: str | None = None):
+    """Run one solution process. Returns (returncode, stdout, stderr, elapsed_ms); 124 on timeout."""
+    start = time.time()
+    try:
+        proc = subprocess.run(
+            cmd,
+            input=stdin_data,
+            capture_output=True,
+            text=True,
+            timeout=timeout_ms / 1000.0,
+            cwd=cwd,
+        )
+        elapsed = int((time.time() - start) * 1000)
+        return proc.returncode, proc.stdout, proc.stderr, elapsed
+    except subprocess.TimeoutExpired:
+        elapsed = int((time.time() - start) * 1000)
+        return 124, "", "TIMEOUT", elapsed
+
+def run_python(source_code: str, stdin_data: str, timeout_ms: int, python: str = "python"):
     """개발용 실행기: 보안 없음. 나중에 Docker runner로 교체."""
     with tempfile.TemporaryDirectory() as td:
         main_path = os.path.join(td, "Main.py")
         with open(main_path, "w", encoding="utf-8") as f:
             f.write(source_code)
+        return run_process([python, main_path], stdin_data, timeout_ms)
 
-        start = time.time()
-        try:
-            proc = subprocess.run(
-                ["python", main_path],
-                input=stdin_data,
-                capture_output=True,
-                text=True,
-                timeout=timeout_ms/1000.0
-            )
-            elapsed = int((time.time() - start) * 1000)
-            return proc.returncode, proc.stdout, proc.stderr, elapsed
-        except subprocess.TimeoutExpired:
-            elapsed = int((time.time() - start) * 1000)
-            return 124, "", "TIMEOUT", elapsed
-
-def run_python_answer(source_code: str, payload: dict | list, timeout_ms: int):
+def run_python_answer(source_code: str, payload: dict | list, timeout_ms: int, python: str = "python"):
     with tempfile.TemporaryDirectory() as td:
         main_path = os.path.join(td, "Main.py")
         with open(main_path, "w", encoding="utf-8") as f:
@@ -79,18 +128,4 @@ def run_python_answer(source_code: str, payload: dict | list, timeout_ms: int):
         with open(harness_path, "w", encoding="utf-8") as f:
             f.write(HARNESS_CODE)
 
-        start = time.time()
-        try:
-            proc = subprocess.run(
-                ["python", harness_path],
-                input=json.dumps(payload, ensure_ascii=False),
-                capture_output=True,
-                text=True,
-                timeout=timeout_ms / 1000.0,
-                cwd=td,  # ← 이 줄 추가!
-            )
-            elapsed = int((time.time() - start) * 1000)
-            return proc.returncode, proc.stdout, proc.stderr, elapsed
-        except subprocess.TimeoutExpired:
-            elapsed = int((time.time() - start) * 1000)
-            return 124, "", "TIMEOUT", elapsed
+        return run_process([python, harness_path], json.dumps(payload, ensure_ascii=False), timeout_ms, cwd=td)
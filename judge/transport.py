@@ -0,0 +1,90 @@
+"""Worker <-> answer() harness transport for structured testcases.
+
+Default (JSON): the testcase's input_text goes to the harness stdin as-is (it
+is already JSON, so no re-encode), and the harness prints one JSON object.
+
+Large inputs (>= JUDGE_MSGPACK_MIN_BYTES) switch to msgpack files when both
+the worker and the tier's interpreter can import msgpack: the worker writes
+`input.msgpack` into the run directory, the harness writes its reply to
+`reply.bin` (msgpack, or JSON when the result has non-string dict keys or
+values msgpack cannot hold). Inputs msgpack cannot hold (integers outside
+64 bits) stay on the JSON path. Either way the decoded reply is the same value
+the JSON path would produce, so verdicts do not change.
+
+JUDGE_TRANSPORT=json disables msgpack entirely.
+"""
+import functools
+import json
+import os
+import subprocess
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성: 없으면 항상 JSON
+    msgpack = None
+
+MODE = os.getenv("JUDGE_TRANSPORT", "auto")  # auto|json
+MSGPACK_MIN_BYTES = int(os.getenv("JUDGE_MSGPACK_MIN_BYTES", str(64 * 1024)))
+
+INPUT_NAME = "input.msgpack"
+REPLY_NAME = "reply.bin"
+_JSON_WS = " \t\n\r"
+
+
+@functools.lru_cache(maxsize=None)
+def interpreter_has_msgpack(interpreter: tuple) -> bool:
+    """Probe once per interpreter argv (cpython-fast runs with -S and has no site-packages)."""
+    try:
+        proc = subprocess.run(list(interpreter) + ["-c", "import msgpack"], capture_output=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return proc.returncode == 0
+
+
+def use_msgpack(interpreter: list[str], input_size: int) -> bool:
+    if MODE == "json" or msgpack is None or input_size < MSGPACK_MIN_BYTES:
+        return False
+    return interpreter_has_msgpack(tuple(interpreter))
+
+
+def write_input(run_dir: str, data) -> tuple[str, str] | None:
+    """Write the msgpack input file. Returns (input_path, reply_path) for the harness argv,
+    or None when msgpack cannot hold the input (ints outside 64 bits): send it as JSON then."""
+    try:
+        blob = msgpack.packb(data)
+    except (OverflowError, TypeError, ValueError):
+        return None
+    input_path = os.path.join(run_dir, INPUT_NAME)
+    with open(input_path, "wb") as f:
+        f.write(blob)
+    return input_path, os.path.join(run_dir, REPLY_NAME)
+
+
+def read_reply_blob(run_dir: str) -> bytes | None:
+    try:
+        with open(os.path.join(run_dir, REPLY_NAME), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def decode_reply(stdout: str, blob: bytes | None):
+    """Decode the harness reply ({"result", "stdout", "user_ms"}); None if it is unreadable.
+
+    blob is None for the JSON transport (reply on stdout). With the file
+    transport, stray non-whitespace stdout (e.g. a print at module level) is
+    treated as unreadable, just as it breaks json.loads on the stdout path.
+    """
+    if blob is None:
+        try:
+            return json.loads(stdout)
+        except json.JSONDecodeError:
+            return None
+    if stdout.strip(_JSON_WS):
+        return None
+    try:
+        if blob[:1] == b"{":
+            return json.loads(blob.decode("utf-8"))
+        return msgpack.unpackb(blob, strict_map_key=False)
+    except ValueError:  # JSONDecodeError, UnicodeDecodeError, msgpack ExtraData/FormatError/StackError
+        return None
@@ -0,0 +1,100 @@
+"""Pre-started Python interpreters for the run lane (judge/run_server.py).
+
+Interpreter startup is most of the wall time of a small Python run. A warm
+process is started ahead of time with a tiny bootstrap that blocks on stdin;
+a run writes the script path as the first line, followed by the program's
+stdin. The bootstrap reads that line byte by byte (so sys.stdin and
+sys.stdin.buffer are untouched) and runs the script (source or .pyc) as
+__main__. Each process runs exactly one program and is replaced in the
+background.
+"""
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+BOOT_CODE = r"""
+import os, runpy, sys
+line = b""
+while not line.endswith(b"\n"):
+    ch = os.read(0, 1)
+    if not ch:
+        sys.exit(0)
+    line += ch
+path = line.decode("utf-8").rstrip("\n")
+sys.argv = [path]
+if not sys.flags.isolated:
+    sys.path[0] = os.path.dirname(path)  # 스크립트로 실행한 것과 같게
+del line, ch
+runpy.run_path(path, run_name="__main__")
+"""
+
+
+class WarmPool:
+    """Up to `size` idle interpreters per interpreter argv."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def _spawn(self, interpreter):
+        work_dir = tempfile.mkdtemp(prefix="oj-warm-")
+        proc = subprocess.Popen(
+            list(interpreter) + ["-c", BOOT_CODE],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=work_dir,
+        )
+        return proc, work_dir
+
+    def _take(self, interpreter):
+        with self.lock:
+            idle = self.idle.setdefault(tuple(interpreter), [])
+            while idle:
+                proc, work_dir = idle.pop()
+                if proc.poll() is None:
+                    return proc, work_dir
+                shutil.rmtree(work_dir, ignore_errors=True)
+        return self._spawn(interpreter)  # 풀이 비었으면 그냥 새로 띄운다
+
+    def fill(self, interpreter):
+        """Top the pool up to `size` (called in the background after each run)."""
+        key = tuple(interpreter)
+        while True:
+            with self.lock:
+                if len(self.idle.setdefault(key, [])) >= self.size:
+                    return
+            try:
+                warm = self._spawn(interpreter)
+            except OSError:
+                return  # 인터프리터 없음
+            with self.lock:
+                self.idle[key].append(warm)
+
+    def run(self, interpreter, script: str, stdin_data: str, timeout_ms: int):
+        """Same contract as runner_py.run_process: (returncode, stdout, stderr, elapsed_ms); 124 on timeout."""
+        proc, work_dir = self._take(interpreter)
+        threading.Thread(target=self.fill, args=(interpreter,), daemon=True).start()
+        start = time.time()
+        try:
+            out, err = proc.communicate(f"{script}\n{stdin_data}", timeout=timeout_ms / 1000.0)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return 124, "", "TIMEOUT", int((time.time() - start) * 1000)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return proc.returncode, out, err, int((time.time() - start) * 1000)
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                for proc, work_dir in idle:
+                    proc.kill()
+                    proc.wait()
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            self.idle.clear()
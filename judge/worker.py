@@ -1,57 +1,251 @@
-import os, time, json
+import os, time, json, zlib, signal, socket, threading, traceback, weakref
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import DictCursor
 from dotenv import load_dotenv
-from runner_py import run_python, run_python_answer
+import checkers
+import interactive
+import languages
+import metrics
+import transport
 
 load_dotenv()
 DSN = f"dbname={os.getenv('POSTGRES_DB')} user={os.getenv('POSTGRES_USER')} password={os.getenv('POSTGRES_PASSWORD')} host={os.getenv('POSTGRES_HOST')} port={os.getenv('POSTGRES_PORT')}"
+SPAN_LOG = os.getenv("WORKER_SPAN_LOG", "1") == "1"  # 제출별 단계 시간을 JSON 한 줄로 출력
+QUEUE_SAMPLE_S = float(os.getenv("WORKER_QUEUE_SAMPLE_S", "5"))
+# submission_results.stdout/stderr 에는 앞부분만 저장; 첫 실패 케이스만 전체 출력을 압축해 full_output 에 보관
+OUTPUT_PREVIEW_CHARS = int(os.getenv("JUDGE_OUTPUT_PREVIEW_CHARS", "4096"))
+OUTPUT_FULL_LIMIT = int(os.getenv("JUDGE_OUTPUT_FULL_LIMIT", str(1024 * 1024)))
+# 워커 등록부 (workers 테이블): 노드 하나 = 워커 하나, 슬롯 수만큼 동시에 채점
+# 기본값에 pid를 붙인다: 한 호스트의 두 worker.py가 같은 id로 서로의 제출을 되돌리지 않도록
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+SLOTS = max(1, int(os.getenv("WORKER_SLOTS", "1")))
+# 기본값: 이 노드에 툴체인이 설치된 언어만 (javac/pypy가 없는 노드가 그 제출을 집어 가지 않도록)
+WORKER_LANGUAGES = sorted(
+    {lang.strip() for lang in os.getenv("WORKER_LANGUAGES", "").split(",") if lang.strip()} or set(languages.available())
+)
+HEARTBEAT_S = float(os.getenv("WORKER_HEARTBEAT_S", "5"))
+DEAD_AFTER_S = float(os.getenv("WORKER_DEAD_AFTER_S", "30"))
 
-def pick_one(conn):
+# 빈 큐 폴링까지 슬롯마다 0.5초에 한 번씩 도는 문장이라 연결마다 한 번 PREPARE 해 두고 EXECUTE 한다
+CLAIM_SQL = """
+  PREPARE claim_submission(text, text[]) AS
+  UPDATE submissions s
+  SET status='running', started_at=NOW(), claimed_by=$1
+  FROM (
+    SELECT id, created_at
+    FROM submissions
+    WHERE status = 'queued' AND ($2 IS NULL OR language = ANY($2))
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+  ) q
+  WHERE s.id = q.id AND s.created_at = q.created_at
+  RETURNING s.id, EXTRACT(EPOCH FROM NOW() - q.created_at) AS queue_age
+"""
+_claim_prepared = weakref.WeakSet()  # PREPARE를 마친 연결
+
+def pick_one(conn, worker_id=None, langs=None):
+    """Claim one queued submission (in one of `langs`, if given) for worker_id.
+
+    Returns (sid, queue_age_seconds) or None.
+    """
     with conn.cursor(cursor_factory=DictCursor) as cur:
+        if conn not in _claim_prepared:
+            cur.execute(CLAIM_SQL)
+            _claim_prepared.add(conn)
+        cur.execute("EXECUTE claim_submission(%s, %s)", (worker_id, langs))
+        row = cur.fetchone()
+    conn.commit()
+    return (row["id"], float(row["queue_age"])) if row else None
+
+def connect(stop=None):
+    """Open a connection. With `stop`, retry with backoff while the DB is unreachable
+    (returns None if stop is set first)."""
+    delay = 0.5
+    while True:
+        try:
+            conn = psycopg2.connect(DSN)
+            conn.autocommit = False
+            return conn
+        except psycopg2.OperationalError:
+            if stop is None:
+                raise
+            traceback.print_exc()
+            if stop.wait(delay):
+                return None
+            delay = min(delay * 2, 10.0)
+
+def register(conn):
+    """Upsert this worker's registry row and requeue whatever a previous run under the same id left running.
+
+    A worker an admin put in 'draining' stays draining across restarts.
+    """
+    state = upsert_worker(conn)
+    requeue(conn, "s.claimed_by = %(me)s")
+    return state
+
+def upsert_worker(conn):
+    """Insert or refresh this worker's registry row; returns its state."""
+    with conn.cursor() as cur:
         cur.execute("""
-          BEGIN;
-          SELECT id FROM submissions
-          WHERE status = 'queued'
-          FOR UPDATE SKIP LOCKED
-          LIMIT 1;
-        """)
+          INSERT INTO workers AS w (id, host, pid, slots, languages, state, started_at, heartbeat_at)
+          VALUES (%s, %s, %s, %s, %s, 'active', NOW(), NOW())
+          ON CONFLICT (id) DO UPDATE
+          SET host = EXCLUDED.host, pid = EXCLUDED.pid, slots = EXCLUDED.slots, languages = EXCLUDED.languages,
+              started_at = NOW(), heartbeat_at = NOW(),
+              state = CASE WHEN w.state = 'draining' THEN 'draining' ELSE 'active' END
+          RETURNING state
+        """, (WORKER_ID, socket.gethostname(), os.getpid(), SLOTS, WORKER_LANGUAGES))
+        state = cur.fetchone()[0]
+    conn.commit()
+    return state
+
+def heartbeat(conn):
+    """Refresh heartbeat_at; returns the state an admin may have changed ('active' / 'draining')."""
+    with conn.cursor() as cur:
+        cur.execute("UPDATE workers SET heartbeat_at=NOW() WHERE id=%s RETURNING state", (WORKER_ID,))
         row = cur.fetchone()
-        if not row:
-            conn.rollback()
-            return None
-        sid = row["id"]
-        cur.execute("UPDATE submissions SET status='running' WHERE id=%s", (sid,))
-        cur.execute("COMMIT;")
-        return sid
+    conn.commit()
+    # 행이 지워졌으면 다시 넣기만 한다. register()처럼 되돌리면 지금 채점 중인 제출이 두 번 채점된다
+    return row[0] if row else upsert_worker(conn)
+
+# 하트비트가 끊겼거나 멈춘(stopped) 워커가 잡고 있던 제출. claimed_by가 없는 건 예전 워커 몫이라 건드리지 않는다
+ORPHANED = """
+  s.claimed_by <> %(me)s AND NOT EXISTS (
+    SELECT 1 FROM workers w
+    WHERE w.id = s.claimed_by AND w.state <> 'stopped'
+      AND w.heartbeat_at > NOW() - make_interval(secs => %(dead)s)
+  )
+"""
+
+def requeue(conn, condition=ORPHANED, **params):
+    """Put running submissions matching `condition` back in the queue, dropping their partial results."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+          WITH orphans AS (
+            SELECT s.id, s.created_at FROM submissions s
+            WHERE s.status = 'running' AND s.claimed_by IS NOT NULL AND {condition}
+            FOR UPDATE OF s SKIP LOCKED
+          ), dropped AS (
+            DELETE FROM submission_results r USING orphans o
+            WHERE r.submission_id = o.id AND r.submission_created_at = o.created_at
+          )
+          UPDATE submissions s SET status='queued', started_at=NULL, claimed_by=NULL
+          FROM orphans o WHERE s.id = o.id AND s.created_at = o.created_at
+          RETURNING s.id
+        """, {"me": WORKER_ID, "dead": DEAD_AFTER_S, **params})
+        sids = [r[0] for r in cur.fetchall()]
+        # 하루 넘게 소식 없는 워커는 목록에서 지운다 (오토스케일로 사라진 노드)
+        cur.execute("DELETE FROM workers WHERE heartbeat_at < NOW() - interval '1 day'")
+    conn.commit()
+    if sids:
+        print(f"[worker] requeued {len(sids)} submission(s) left by stopped workers or a lost connection: {sids}",
+              flush=True)
+    return sids
+
+def sample_queue(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+          SELECT COUNT(*) FILTER (WHERE status='queued'),
+                 COUNT(*) FILTER (WHERE status='running'),
+                 EXTRACT(EPOCH FROM NOW() - MIN(created_at) FILTER (WHERE status='queued'))
+          FROM submissions
+          WHERE status IN ('queued','running')
+        """)
+        queued, running, oldest = cur.fetchone()
+    conn.rollback()
+    metrics.set_queue_stats(queued, running, float(oldest) if oldest is not None else None)
 
 def fetch_submission(conn, sid):
     with conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute("SELECT problem_id, language, source_code FROM submissions WHERE id=%s", (sid,))
+        cur.execute("""
+          SELECT s.problem_id, s.language, s.source_code, COALESCE(s.python_tier, p.python_tier) AS tier,
+                 p.checker, p.checker_args, p.checker_source, p.interactor_source, p.turn_timeout_ms,
+                 p.schedule
+          FROM submissions s JOIN problems p ON p.id = s.problem_id
+          WHERE s.id=%s
+        """, (sid,))
         return cur.fetchone()
 
-def load_testcases(conn, pid):
+# failfast: 실패 확률 / 평균 실행 시간이 큰 케이스부터 (첫 실패까지의 기대 시간 최소화).
+# 통계가 없는 케이스는 실패율 1/2 (+1/+2 보정)에 문제 평균 실행 시간, 10ms 아래 차이는 무시
+FAILFAST_ORDER = """
+  (COALESCE(s.fails, 0) + 1)::float8 / (COALESCE(s.runs, 0) + 2)
+  / (COALESCE(s.total_ms::float8 / NULLIF(s.runs, 0),
+              AVG(s.total_ms::float8 / NULLIF(s.runs, 0)) OVER (), 0) + 10) DESC, t.idx
+"""
+
+def load_testcases(conn, pid, schedule="idx"):
+    """Testcases in run order: idx, or most-likely-to-fail-per-ms first for schedule='failfast'."""
+    order = FAILFAST_ORDER if schedule == "failfast" else "t.idx"
+    with conn.cursor(cursor_factory=DictCursor) as cur:
+        cur.execute(f"""
+          SELECT t.id, t.idx, t.input_text, t.expected_text, t.timeout_ms, t.points, t.group_idx
+          FROM testcases t
+          LEFT JOIN testcase_stats s ON s.testcase_id = t.id
+          WHERE t.problem_id=%s
+          ORDER BY {order}
+        """, (pid,))
+        return cur.fetchall()
+
+def load_groups(conn, pid):
     with conn.cursor(cursor_factory=DictCursor) as cur:
         cur.execute("""
-          SELECT id, idx, input_text, expected_text, timeout_ms
-          FROM testcases WHERE problem_id=%s ORDER BY idx
+          SELECT idx, points, scoring, depends_on
+          FROM testcase_groups WHERE problem_id=%s ORDER BY idx
         """, (pid,))
         return cur.fetchall()
 
-def insert_result(conn, sid, tcid, verdict, t_ms, stdout, stderr):
+def preview(text):
+    if text is None or len(text) <= OUTPUT_PREVIEW_CHARS:
+        return text
+    return f"{text[:OUTPUT_PREVIEW_CHARS]}\n... [{len(text) - OUTPUT_PREVIEW_CHARS} more characters]"
+
+def compress_output(stdout, stderr):
+    """zlib(JSON {"stdout", "stderr"}) when a preview would lose something, else None."""
+    if preview(stdout) == stdout and preview(stderr) == stderr:
+        return None
+    full = {"stdout": (stdout or "")[:OUTPUT_FULL_LIMIT], "stderr": (stderr or "")[:OUTPUT_FULL_LIMIT]}
+    return zlib.compress(json.dumps(full, ensure_ascii=False).encode("utf-8"))
+
+def insert_result(conn, sid, tcid, verdict, t_ms, stdout, stderr, tier=None, keep_full=False):
+    """keep_full: also store the complete (compressed) output, for the case that decided the verdict."""
+    full_output = compress_output(stdout, stderr) if keep_full else None
+    # submission_created_at 은 파티션 키: 제출 행에서 그대로 복사
     with conn.cursor() as cur:
         cur.execute("""
-          INSERT INTO submission_results(submission_id, testcase_id, verdict, time_ms, stdout, stderr)
-          VALUES (%s,%s,%s,%s,%s,%s)
-        """, (sid, tcid, verdict, t_ms, stdout, stderr))
+          INSERT INTO submission_results(submission_id, submission_created_at, testcase_id, verdict, time_ms,
+                                         stdout, stderr, tier, full_output)
+          SELECT s.id, s.created_at, %s, %s, %s, %s, %s, %s, %s
+          FROM submissions s WHERE s.id=%s
+        """, (tcid, verdict, t_ms, preview(stdout), preview(stderr), tier,
+              psycopg2.Binary(full_output) if full_output is not None else None, sid))
 
-def finalize(conn, sid, status, score, max_time):
+def finalize(conn, sid, status, score, max_time, compile_output=None):
+    """Store the final status, fold this submission's results into testcase_stats and update contest scoreboards."""
     with conn.cursor() as cur:
         cur.execute("""
-          UPDATE submissions
-          SET status=%s, score=%s, time_ms=%s, finished_at=NOW()
-          WHERE id=%s
-        """, (status, score, max_time, sid))
+          WITH done AS (
+            UPDATE submissions
+            SET status=%(status)s, score=%(score)s, time_ms=%(time)s, compile_output=%(out)s, finished_at=NOW()
+            WHERE id=%(sid)s
+          )
+          INSERT INTO testcase_stats AS st (testcase_id, runs, fails, total_ms)
+          SELECT testcase_id, 1, (verdict <> 'ok')::int, COALESCE(time_ms, 0)
+          FROM submission_results
+          WHERE submission_id=%(sid)s AND verdict NOT IN ('skipped', 'se')
+          ON CONFLICT (testcase_id) DO UPDATE
+          SET runs = st.runs + 1, fails = st.fails + EXCLUDED.fails, total_ms = st.total_ms + EXCLUDED.total_ms
+        """, {"status": status, "score": score, "time": max_time, "out": compile_output, "sid": sid})
+        # 진행 중인 대회에 걸린 제출이면 그 학생/문제 칸만 다시 계산 (같은 트랜잭션)
+        cur.execute("""
+          SELECT refresh_contest_score(c.id, s.user_id, s.problem_id)
+          FROM submissions s
+          JOIN contest_problems cp ON cp.problem_id = s.problem_id
+          JOIN contests c ON c.id = cp.contest_id AND s.created_at >= c.starts_at AND s.created_at < c.ends_at
+          JOIN class_students st ON st.class_id = c.class_id AND st.student_id = s.user_id
+          WHERE s.id = %s AND s.status NOT IN ('compile_error', 'system_error')
+        """, (sid,))
     conn.commit()
 
 def try_parse_structured(tc):
@@ -64,88 +258,348 @@ def try_parse_structured(tc):
         pass
     return None, None
 
-def normalize(val):
-    if isinstance(val, dict):
-        return {k: normalize(v) for k, v in val.items()}
-    if isinstance(val, (list, tuple)):
-        return [normalize(v) for v in val]
-    if isinstance(val, set):
-        return sorted(normalize(v) for v in val)
-    return val
+@contextmanager
+def span(spans, name):
+    """Accumulate wall time of the enclosed block into spans[name] (seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(spans, name, time.perf_counter() - start)
 
-def main():
-    conn = psycopg2.connect(DSN)
-    conn.autocommit = False
-    print("[worker] started")
-    while True:
-        sid = pick_one(conn)
-        if not sid:
-            time.sleep(0.5)
-            continue
+def add_span(spans, name, secs):
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + secs
 
+def judge(conn, sid, spans=None):
+    """Judge one claimed submission end to end. Returns the final status."""
+    with span(spans, "fetch"):
         sub = fetch_submission(conn, sid)
-        pid, lang, src = sub["problem_id"], sub["language"], sub["source_code"]
-        tcs = load_testcases(conn, pid)
-
-        total_ok = 0
-        max_time = 0
-        final_status = "accepted"
-
-        for tc in tcs:
-            tcid = tc["id"]
-            structured_input, structured_expected = try_parse_structured(tc)
-
-            if structured_input is not None:
-                code, out, err, elapsed = run_python_answer(src, structured_input, tc["timeout_ms"])
-                max_time = max(max_time, elapsed)
-                if code == 124:
-                    verdict = "tle"; final_status = "tle"
-                    stdout_to_store = ""
-                elif code != 0:
-                    verdict = "re"; final_status = "runtime_error"
-                    stdout_to_store = out
-                else:
-                    try:
-                        payload = json.loads(out)
-                        actual = payload.get("result")
-                        captured_stdout = payload.get("stdout", "")
-                    except json.JSONDecodeError:
-                        payload = None
-                        actual = None
-                        captured_stdout = out
-                    if payload is None:
-                        verdict = "runtime_error"; final_status = "runtime_error"
-                    else:
-                        if normalize(actual) == normalize(structured_expected):
-                            verdict = "ok"
-                            total_ok += 1
-                        else:
-                            verdict = "wa"
-                            if final_status == "accepted":
-                                final_status = "wrong_answer"
-                    stdout_to_store = captured_stdout
-                insert_result(conn, sid, tcid, verdict, elapsed, stdout_to_store, err)
-                conn.commit()
-                continue
+    pid, lang, src = sub["problem_id"], sub["language"], sub["source_code"]
+    # 컴파일은 제출당 한 번 (같은 소스는 캐시 재사용), 실패하면 테스트 실행 없이 compile_error
+    with span(spans, "compile"):
+        try:
+            build = languages.prepare(lang, src, sub["tier"])
+        except languages.CompileError as e:
+            build, status, compile_output = None, "compile_error", e.output
+        except languages.ToolchainMissing as e:
+            # 학생 탓이 아니다 (WORKER_LANGUAGES가 설치된 것과 다르거나 티어 인터프리터가 없음)
+            print(f"[worker] sid={sid} {e}", flush=True)
+            build, status, compile_output = None, "system_error", str(e)
+    if build is None:
+        with span(spans, "finalize"):
+            finalize(conn, sid, status, 0, 0, compile_output)
+        return status
+    try:
+        checker = checkers.for_problem(sub["checker"], sub["checker_args"], sub["checker_source"])
+    except checkers.CheckerError as e:
+        print(f"[worker] sid={sid} checker error: {e}", flush=True)
+        with span(spans, "finalize"):
+            finalize(conn, sid, "system_error", 0, 0)
+        return "system_error"
+    with span(spans, "load_testcases"):
+        tcs = load_testcases(conn, pid, sub["schedule"])
+        groups = load_groups(conn, pid)
 
-            code, out, err, elapsed = run_python(src, tc["input_text"], tc["timeout_ms"])
-            max_time = max(max_time, elapsed)
+    interactor = None
+    if sub["interactor_source"]:
+        interactor = interactive.Interactor(sub["interactor_source"], sub["turn_timeout_ms"])
+    try:
+        return judge_testcases(
+            conn, sid, build, checker, interactor, tcs, groups, spans, failfast=sub["schedule"] == "failfast",
+        )
+    finally:
+        if interactor is not None:
+            interactor.close()
+
+# 테스트케이스 판정 -> 제출 상태: wa는 앞선 실패가 없을 때만, 나머지 실패는 나중 것이 덮어쓴다
+VERDICT_STATUS = {"tle": "tle", "re": "runtime_error", "runtime_error": "runtime_error", "se": "system_error"}
+
+def apply_verdict(final_status, verdict):
+    if verdict in ("ok", "skipped"):
+        return final_status
+    if verdict == "wa":
+        return "wrong_answer" if final_status == "accepted" else final_status
+    return VERDICT_STATUS[verdict]
 
+def run_case(build, checker, interactor, tc, spans=None):
+    """Run and check one testcase. Returns (verdict, elapsed_ms, stdout, stderr)."""
+    if interactor is not None:
+        with span(spans, "run"), metrics.runner_process():
+            return interactor.run(build, tc)
+
+    structured_input, structured_expected = None, None
+    if build.language.answer_harness:
+        # answer(...) 하네스가 없는 언어는 JSON 테스트케이스도 stdin/stdout 텍스트로 비교
+        structured_input, structured_expected = try_parse_structured(tc)
+
+    if structured_input is not None:
+        with span(spans, "run"), metrics.runner_process():
+            code, out, err, elapsed, reply_blob = build.run_answer(
+                structured_input, tc["timeout_ms"], raw_input=tc["input_text"],
+            )
+        with span(spans, "compare"):
             if code == 124:
-                verdict = "tle"; final_status = "tle"
-            elif code != 0:
-                verdict = "re"; final_status = "runtime_error"
-            else:
-                verdict = "ok" if out.strip() == tc["expected_text"].strip() else "wa"
-                if verdict == "wa" and final_status == "accepted":
-                    final_status = "wrong_answer"
-                if verdict == "ok":
-                    total_ok += 1
+                return "tle", elapsed, "", err
+            if code != 0:
+                return "re", elapsed, out, err
+            payload = transport.decode_reply(out, reply_blob)
+            if payload is None:
+                return "runtime_error", elapsed, out, err
+            user_s = payload.get("user_ms", elapsed) / 1000.0
+            add_span(spans, "user", user_s)
+            add_span(spans, "startup", max(0.0, elapsed / 1000.0 - user_s))
+            captured_stdout = payload.get("stdout", "")
+            try:
+                passed = checker.structured(payload.get("result"), structured_expected, structured_input)
+            except checkers.CheckerError as e:
+                return "se", elapsed, captured_stdout, f"{err}\n[checker] {e}".lstrip()
+            return ("ok" if passed else "wa"), elapsed, captured_stdout, err
+
+    with span(spans, "run"), metrics.runner_process():
+        code, out, err, elapsed = build.run(tc["input_text"], tc["timeout_ms"])
+    with span(spans, "compare"):
+        if code == 124:
+            return "tle", elapsed, out, err
+        if code != 0:
+            return "re", elapsed, out, err
+        try:
+            passed = checker.text(out, tc["expected_text"], tc["input_text"])
+        except checkers.CheckerError as e:
+            return "se", elapsed, out, f"{err}\n[checker] {e}".lstrip()
+        return ("ok" if passed else "wa"), elapsed, out, err
 
-            insert_result(conn, sid, tcid, verdict, elapsed, out, err)
-            conn.commit()
+def record_result(conn, sid, tcid, verdict, elapsed, out, err, tier, spans=None, keep_full=False):
+    metrics.VERDICTS.labels(verdict=verdict).inc()
+    with span(spans, "db_write"):
+        insert_result(conn, sid, tcid, verdict, elapsed, out, err, tier, keep_full)
+        conn.commit()
 
+def record_skipped(conn, sid, tcs, spans=None):
+    if not tcs:
+        return
+    metrics.VERDICTS.labels(verdict="skipped").inc(len(tcs))
+    with span(spans, "db_write"):
+        with conn.cursor() as cur:
+            cur.executemany("""
+              INSERT INTO submission_results(submission_id, submission_created_at, testcase_id, verdict, time_ms)
+              SELECT s.id, s.created_at, %s, 'skipped', 0
+              FROM submissions s WHERE s.id=%s
+            """, [(tc["id"], sid) for tc in tcs])
+        conn.commit()
+
+def judge_testcases(conn, sid, build, checker, interactor, tcs, groups=None, spans=None, failfast=False):
+    """failfast: stop at the first failing case and record the rest as skipped."""
+    if groups:
+        return judge_groups(conn, sid, build, checker, interactor, tcs, groups, spans)
+
+    total_ok = 0
+    max_time = 0
+    final_status = "accepted"
+    for i, tc in enumerate(tcs):
+        verdict, elapsed, out, err = run_case(build, checker, interactor, tc, spans)
+        max_time = max(max_time, elapsed)
+        if verdict == "ok":
+            total_ok += 1
+        first_failure = verdict != "ok" and final_status == "accepted"
+        final_status = apply_verdict(final_status, verdict)
+        record_result(conn, sid, tc["id"], verdict, elapsed, out, err, build.tier.name, spans, first_failure)
+        if failfast and verdict != "ok":
+            record_skipped(conn, sid, tcs[i + 1:], spans)
+            break
+
+    with span(spans, "finalize"):
         finalize(conn, sid, final_status, total_ok, max_time)
+    return final_status
+
+def judge_groups(conn, sid, build, checker, interactor, tcs, groups, spans=None):
+    """Subtask judging (testcase_groups). Score is the sum of group scores:
+
+    - min: all-or-nothing group.points; stops at the group's first failing case.
+    - sum: testcases.points of each passing case; runs every case.
+
+    A group whose depends_on groups did not fully pass is not run. Cases not
+    run get a 'skipped' result. Ungrouped cases (samples) run first as a sum
+    group that nothing depends on. Within a group, cases run in tcs order
+    (so failfast scheduling reorders min groups too).
+    """
+    group_ids = {g["idx"] for g in groups}
+    by_group = {}
+    for tc in tcs:
+        key = tc["group_idx"] if tc["group_idx"] in group_ids else None
+        by_group.setdefault(key, []).append(tc)
+
+    plan = [{"idx": None, "points": 0, "scoring": "sum", "depends_on": []}] + list(groups)
+    passed_groups = set()
+    score = 0
+    max_time = 0
+    final_status = "accepted"
+    for group in plan:
+        cases = by_group.get(group["idx"], [])
+        if any(dep not in passed_groups for dep in group["depends_on"]):
+            record_skipped(conn, sid, cases, spans)
+            continue
+        group_ok = True
+        case_points = 0
+        for i, tc in enumerate(cases):
+            verdict, elapsed, out, err = run_case(build, checker, interactor, tc, spans)
+            max_time = max(max_time, elapsed)
+            first_failure = verdict != "ok" and final_status == "accepted"
+            record_result(conn, sid, tc["id"], verdict, elapsed, out, err, build.tier.name, spans, first_failure)
+            if verdict == "ok":
+                case_points += tc["points"]
+                continue
+            group_ok = False
+            final_status = apply_verdict(final_status, verdict)
+            if group["scoring"] == "min":
+                record_skipped(conn, sid, cases[i + 1:], spans)
+                break
+        if group_ok:
+            passed_groups.add(group["idx"])
+        if group["scoring"] == "sum":
+            score += case_points
+        elif group_ok:
+            score += group["points"]
+
+    with span(spans, "finalize"):
+        finalize(conn, sid, final_status, score, max_time)
+    return final_status
+
+# 슬롯 -> 채점 중인 제출. 연결이 끊겼던 슬롯이 다른 슬롯의 제출까지 되돌리지 않도록 claim과 함께 _claim_lock 아래에서 갱신
+_judging: dict[int, int] = {}
+_claim_lock = threading.Lock()
+
+def release_lost(conn, slot):
+    """After a slot reconnects: requeue this worker's running submissions that no slot is judging
+    (the one the lost connection was judging, or a claim whose commit reply was lost)."""
+    with _claim_lock:
+        busy = [sid for s, sid in _judging.items() if s != slot]
+        return requeue(conn, "s.claimed_by = %(me)s AND s.id <> ALL(%(busy)s::bigint[])", busy=busy)
+
+def run_slot(slot, stop, accepting):
+    """One judging slot: claims only while the worker is accepting, finishes the current submission on stop.
+
+    If the DB connection drops, the slot reconnects (which also re-PREPAREs the claim) and puts
+    the submission it was judging back in the queue.
+    """
+    conn = connect()
+    while not stop.is_set():
+        if conn is None:
+            conn = connect(stop)
+            if conn is None:
+                break
+            try:
+                release_lost(conn, slot)
+            except psycopg2.Error:
+                traceback.print_exc()
+                conn.close()
+                conn = None
+                stop.wait(0.5)
+                continue
+        if not accepting.is_set():
+            accepting.wait(0.5)
+            continue
+        try:
+            t0 = time.perf_counter()
+            with _claim_lock:
+                claimed = pick_one(conn, WORKER_ID, WORKER_LANGUAGES)
+                if claimed:
+                    _judging[slot] = claimed[0]
+            claim_s = time.perf_counter() - t0
+            if not claimed:
+                metrics.EMPTY_POLLS.inc()
+                stop.wait(0.5)
+                continue
+            sid, queue_age = claimed
+            metrics.CLAIMS.inc()
+
+            spans = {"claim": claim_s}
+            try:
+                status = judge(conn, sid, spans)
+            except Exception:
+                if conn.closed:  # 연결이 끊겼다: 아래에서 다시 연결하고 큐로 되돌린다
+                    raise
+                # 슬롯 하나가 죽으면 제출이 running으로 남으니 system_error로 닫고 계속한다
+                traceback.print_exc()
+                conn.rollback()
+                status = "system_error"
+                finalize(conn, sid, status, 0, 0)
+        except psycopg2.Error:
+            print(f"[worker] slot {slot}: lost the DB connection, reconnecting", flush=True)
+            traceback.print_exc()
+            conn.close()
+            conn = None
+            with _claim_lock:
+                _judging.pop(slot, None)
+            continue
+        with _claim_lock:
+            _judging.pop(slot, None)
+        metrics.observe_submission(status, spans, queue_age)
+        if SPAN_LOG:
+            print(json.dumps({
+                "event": "judged",
+                "sid": sid,
+                "slot": slot,
+                "status": status,
+                "queue_age_ms": round(queue_age * 1000, 1),
+                "spans_ms": {k: round(v * 1000, 2) for k, v in spans.items()},
+            }), flush=True)
+    if conn is not None:
+        conn.close()
+
+def main():
+    conn = connect()
+    metrics_on = metrics.start()
+    stop, accepting = threading.Event(), threading.Event()
+    # SIGTERM (systemctl stop): 새로 집지 않고 채점 중인 제출만 끝낸 뒤 종료
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    state = register(conn)
+    print(f"[worker] {WORKER_ID} started: {SLOTS} slot(s), languages {','.join(WORKER_LANGUAGES)}, {state}"
+          + (" (metrics on :%s)" % os.getenv("WORKER_METRICS_PORT") if metrics_on else ""), flush=True)
+    slots = [threading.Thread(target=run_slot, args=(i, stop, accepting), name=f"slot-{i}") for i in range(SLOTS)]
+    for t in slots:
+        t.start()
+
+    next_sample = 0.0
+    while any(t.is_alive() for t in slots):
+        if state == "active" and not stop.is_set():
+            accepting.set()
+        else:
+            accepting.clear()
+        try:
+            if metrics_on and time.monotonic() >= next_sample:
+                sample_queue(conn)
+                next_sample = time.monotonic() + QUEUE_SAMPLE_S
+            if stop.is_set():
+                deadline = time.monotonic() + HEARTBEAT_S
+                for t in slots:
+                    t.join(max(0.0, deadline - time.monotonic()))
+            else:
+                requeue(conn)
+                stop.wait(HEARTBEAT_S)
+            new_state = heartbeat(conn)
+        except psycopg2.Error:
+            # 하트비트 연결이 끊겼다. 다시 붙을 때까지 하트비트가 멈춘다 (슬롯은 각자 다시 연결한다)
+            traceback.print_exc()
+            conn.close()
+            conn = connect(stop)
+            if conn is None:  # 종료 중: 슬롯이 끝나기만 기다린다
+                for t in slots:
+                    t.join()
+                break
+            continue
+        if new_state != state:
+            print(f"[worker] {WORKER_ID} is now {new_state}", flush=True)
+            state = new_state
+
+    if conn is not None:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE workers SET state='stopped' WHERE id=%s AND state='active'", (WORKER_ID,))
+        conn.commit()
+        conn.close()
+    print(f"[worker] {WORKER_ID} stopped", flush=True)
 
 if __name__ == "__main__":
     main()